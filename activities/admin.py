@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     ActivityType, StandardQuestion, MaintenanceActivity,
-    PartUsage, ActivityPhoto, ActivityAnswer
+    PartUsage, ActivityPhoto, ActivityAnswer, MaintenancePlan
 )
 
 
@@ -41,3 +41,11 @@ class MaintenanceActivityAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
     readonly_fields = ('created_at', 'updated_at')
     inlines = [PartUsageInline, ActivityPhotoInline, ActivityAnswerInline]
+
+
+@admin.register(MaintenancePlan)
+class MaintenancePlanAdmin(admin.ModelAdmin):
+    list_display = ('name', 'activity_type', 'location', 'location_type', 'technician',
+                    'interval_count', 'interval_unit', 'start_date', 'is_active')
+    list_filter = ('interval_unit', 'location_type', 'activity_type', 'is_active')
+    search_fields = ('name', 'description', 'location__name')
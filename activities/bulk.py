@@ -0,0 +1,153 @@
+"""
+Criação e alteração de atividades em lote
+
+As referências (tipos, locais e técnicos) são conferidas com uma consulta
+``IN`` por modelo, as atividades são inseridas com ``bulk_create`` e as
+alterações são um único ``UPDATE`` no conjunto. Como nada disso dispara
+sinais, contadores, cache e totais por local são atualizados aqui.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from locations.models import Location
+from .caching import bump_activities_version, bump_catalog_version
+from .counters import apply_counter_changes
+from .models import ActivityType, MaintenanceActivity
+from .rollups import refresh_location_rollups
+from .serializers import BulkActivityItemSerializer
+from .sync import record_reassignments
+from .transitions import TRANSITIONS
+
+
+# Reatribuir, repriorizar ou cancelar vale apenas para atividades em aberto
+BULK_UPDATE_STATUSES = TRANSITIONS['cancel']['from']
+
+
+def _existing_ids(queryset, ids):
+    if not ids:
+        return set()
+    return set(queryset.filter(id__in=ids).order_by().values_list('id', flat=True))
+
+
+def _activities_written(location_ids, catalog_changed=False):
+    bump_activities_version()
+    if catalog_changed:
+        bump_catalog_version()
+    transaction.on_commit(lambda: refresh_location_rollups(location_ids))
+
+
+def create_activities(items, technician, batch_size=500):
+    """
+    Cria atividades a partir de uma lista de dicionários
+
+    O técnico padrão é ``technician``; cada item pode informar outro.
+    Retorna um resultado por item, na ordem recebida:
+    ``{'index', 'id'}`` para criados ou ``{'index', 'errors'}``.
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, data in enumerate(items):
+        serializer = BulkActivityItemSerializer(data=data)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'errors': serializer.errors}
+
+    # Referências conferidas com uma consulta IN por modelo
+    type_ids = _existing_ids(
+        ActivityType.objects.all(), {data['activity_type'] for _, data in valid}
+    )
+    location_ids = _existing_ids(
+        Location.objects.all(), {data['location'] for _, data in valid}
+    )
+    technician_ids = _existing_ids(
+        get_user_model().objects.filter(is_active=True),
+        {data['technician'] for _, data in valid if 'technician' in data}
+    )
+
+    rows = []
+    for index, data in valid:
+        technician_id = data.get('technician', technician.id)
+        errors = {}
+        if data['activity_type'] not in type_ids:
+            errors['activity_type'] = ['Tipo de atividade não encontrado.']
+        if data['location'] not in location_ids:
+            errors['location'] = ['Local não encontrado.']
+        if 'technician' in data and technician_id not in technician_ids:
+            errors['technician'] = ['Técnico não encontrado.']
+        if errors:
+            results[index] = {'index': index, 'errors': errors}
+            continue
+
+        rows.append((index, MaintenanceActivity(
+            technician_id=technician_id,
+            activity_type_id=data['activity_type'],
+            location_id=data['location'],
+            title=data['title'],
+            description=data['description'],
+            priority=data['priority'],
+            scheduled_date=data.get('scheduled_date'),
+            estimated_duration=data.get('estimated_duration'),
+        )))
+
+    if rows:
+        activities = [activity for _, activity in rows]
+        with transaction.atomic():
+            MaintenanceActivity.objects.bulk_create(activities, batch_size=batch_size)
+            apply_counter_changes((None, activity.counter_fields()) for activity in activities)
+        _activities_written({activity.location_id for activity in activities}, catalog_changed=True)
+
+    for index, activity in rows:
+        results[index] = {'index': index, 'id': activity.pk}
+    return results
+
+
+def update_activities(ids, action, technician_id=None, priority=None):
+    """
+    Reatribui, muda a prioridade ou cancela atividades em aberto com um único UPDATE
+
+    Retorna ``{'updated': [ids], 'skipped': [ids]}``; são ignoradas as
+    atividades inexistentes ou já concluídas/canceladas.
+    """
+    values = {'updated_at': timezone.now()}
+    if action == 'reassign':
+        values['technician_id'] = technician_id
+    elif action == 'reprioritize':
+        values['priority'] = priority
+    elif action == 'cancel':
+        values['status'] = 'cancelled'
+
+    with transaction.atomic():
+        # Trava as linhas: a diferença dos contadores parte do estado lido
+        rows = list(MaintenanceActivity.objects.select_for_update().filter(
+            id__in=ids, status__in=BULK_UPDATE_STATUSES
+        ).order_by().values_list(
+            'id', 'location_id', 'technician_id', 'status', 'priority', 'created_at', 'completed_at'
+        ))
+        updated = [row[0] for row in rows]
+        if updated:
+            MaintenanceActivity.objects.filter(id__in=updated).update(
+                version=F('version') + 1, **values
+            )
+
+            changes = []
+            for _, _, old_technician, old_status, old_priority, created_at, completed_at in rows:
+                old_fields = (old_technician, old_status, old_priority, created_at, completed_at)
+                new_fields = (
+                    values.get('technician_id', old_technician),
+                    values.get('status', old_status),
+                    values.get('priority', old_priority),
+                    created_at,
+                    completed_at,
+                )
+                changes.append((old_fields, new_fields))
+            apply_counter_changes(changes)
+            if action == 'reassign':
+                record_reassignments([(row[0], row[2], technician_id) for row in rows])
+
+    if updated:
+        _activities_written({row[1] for row in rows})
+
+    return {'updated': sorted(updated), 'skipped': sorted(set(ids) - set(updated))}
@@ -0,0 +1,59 @@
+"""
+Cache versionado de dados derivados das atividades de manutenção
+
+O contador é incrementado a cada escrita em ``MaintenanceActivity``
+(via sinais ou explicitamente em atualizações em massa), invalidando de
+uma vez as estatísticas em cache.
+"""
+from django.core.cache import cache
+
+from maintenance_api.cache_versions import bump_version, get_version
+
+
+ACTIVITIES_VERSION_KEY = 'activities:version'
+STATS_CACHE_TIMEOUT = 60  # 1 minuto
+
+# Catálogo de tipos de atividade: muda pouco, invalidado por versão
+CATALOG_VERSION_KEY = 'activities:catalog:version'
+CATALOG_CACHE_TIMEOUT = 60 * 60  # 1 hora
+
+
+def get_activities_version():
+    """Retorna a versão atual dos dados de atividades"""
+    return get_version(ACTIVITIES_VERSION_KEY)
+
+
+def bump_activities_version():
+    """Invalida os dados em cache derivados das atividades"""
+    bump_version(ACTIVITIES_VERSION_KEY)
+
+
+def get_cached_activities(name, build, timeout=STATS_CACHE_TIMEOUT):
+    """
+    Retorna os dados em cache para a versão atual das atividades,
+    montando-os com ``build()`` quando ausentes.
+    """
+    key = f"activities:{name}:{get_activities_version()}"
+    return cache.get_or_set(key, build, timeout)
+
+
+def get_catalog_version():
+    """Retorna a versão atual do catálogo de tipos de atividade"""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """
+    Invalida o catálogo em cache (tipos, perguntas ou contagem de
+    atividades por tipo mudaram)
+    """
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def get_cached_catalog(name, build, timeout=CATALOG_CACHE_TIMEOUT):
+    """
+    Retorna o catálogo em cache para a versão atual, montando-o com
+    ``build()`` quando ausente.
+    """
+    key = f"activities:catalog:{name}:{get_catalog_version()}"
+    return cache.get_or_set(key, build, timeout)
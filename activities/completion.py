@@ -0,0 +1,70 @@
+"""
+Gravação dos dados de finalização de uma atividade
+
+Usado pela finalização online e pela reprodução do diário offline:
+respostas são um upsert em lote, peças um ``bulk_create`` e a baixa de
+estoque um único ``UPDATE``, com um número fixo de consultas.
+"""
+from django.db.models import Case, DecimalField, F, Value, When
+
+from parts.models import Part
+from .models import ActivityAnswer, PartUsage, StandardQuestion
+
+
+def missing_references(answers_data, parts_data):
+    """Perguntas e peças inexistentes, com uma consulta para cada"""
+    question_ids = {answer['question_id'] for answer in answers_data}
+    missing_questions = question_ids - set(
+        StandardQuestion.objects.filter(id__in=question_ids).values_list('id', flat=True)
+    )
+    part_ids = {part['part_id'] for part in parts_data}
+    missing_parts = part_ids - set(
+        Part.objects.filter(id__in=part_ids).values_list('id', flat=True)
+    )
+    return sorted(missing_questions), sorted(missing_parts)
+
+
+def save_answers(activity, answers_data):
+    """Upsert em lote das respostas; a última resposta de cada pergunta vale"""
+    answers = {
+        answer_data['question_id']: ActivityAnswer(
+            activity=activity,
+            question_id=answer_data['question_id'],
+            answer_text=answer_data.get('answer_text', ''),
+            answer_number=answer_data.get('answer_number'),
+            answer_boolean=answer_data.get('answer_boolean'),
+        )
+        for answer_data in answers_data
+    }
+    ActivityAnswer.objects.bulk_create(
+        answers.values(),
+        update_conflicts=True,
+        unique_fields=['activity', 'question'],
+        update_fields=['answer_text', 'answer_number', 'answer_boolean'],
+    )
+
+
+def save_parts_used(activity, parts_data):
+    """Grava as peças utilizadas e dá baixa no estoque"""
+    PartUsage.objects.bulk_create([
+        PartUsage(
+            activity=activity,
+            part_id=part_data['part_id'],
+            quantity_used=part_data['quantity_used'],
+            unit_cost=part_data.get('unit_cost'),
+            observations=part_data.get('observations', '')
+        )
+        for part_data in parts_data
+    ])
+
+    # Baixa de estoque no próprio UPDATE: sem leitura-modificação-escrita
+    if parts_data:
+        Part.objects.filter(id__in={part['part_id'] for part in parts_data}).update(
+            current_stock=F('current_stock') - Case(
+                *[
+                    When(id=part_data['part_id'], then=Value(part_data['quantity_used']))
+                    for part_data in parts_data
+                ],
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
@@ -0,0 +1,194 @@
+"""
+Contadores pré-agregados de atividades (``ActivityCounter``)
+
+Cada atividade contribui com +1 em ``created_count`` na linha
+(técnico, status, prioridade, mês de criação) e, se concluída, com +1 em
+``completed_count`` na linha do mês de conclusão. Os sinais aplicam apenas a
+diferença entre a contribuição anterior e a nova, na mesma transação da
+escrita; atualizações em massa (``QuerySet.update``/``bulk_create``) devem
+chamar ``apply_counter_change`` explicitamente ou reconstruir a tabela.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .caching import bump_activities_version
+from .models import ActivityCounter, MaintenanceActivity
+
+
+COUNTER_KEY_FIELDS = ('technician_id', 'status', 'priority', 'month')
+
+
+def month_of(value):
+    """Primeiro dia do mês (no fuso local) de uma data/hora"""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def load_counter_fields(activity_id, lock=False):
+    """
+    Lê do banco os campos dos contadores de uma atividade
+
+    Com ``lock``, trava a linha até o fim da transação (``select_for_update``).
+    """
+    activities = MaintenanceActivity.objects.filter(pk=activity_id)
+    if lock:
+        activities = activities.select_for_update()
+    activity = activities.order_by().only(
+        'technician', 'status', 'priority', 'created_at', 'completed_at'
+    ).first()
+    return activity.counter_fields() if activity else None
+
+
+def _contributions(fields):
+    if fields is None:
+        return []
+
+    technician_id, status, priority, created_at, completed_at = fields
+    result = [((technician_id, status, priority, month_of(created_at)), 'created_count')]
+    if status == 'completed' and completed_at:
+        result.append(((technician_id, status, priority, month_of(completed_at)), 'completed_count'))
+    return result
+
+
+def apply_counter_change(old_fields, new_fields):
+    """
+    Ajusta os contadores da contribuição ``old_fields`` para ``new_fields``
+
+    Os argumentos são tuplas de ``MaintenanceActivity.counter_fields()``;
+    ``None`` representa uma atividade inexistente (criação ou exclusão).
+    """
+    apply_counter_changes([(old_fields, new_fields)])
+
+
+def apply_counter_changes(changes):
+    """
+    Ajusta os contadores para vários pares ``(old_fields, new_fields)``,
+    com uma atualização por linha de contador afetada
+    """
+    deltas = {}
+    for old_fields, new_fields in changes:
+        for key, field in _contributions(old_fields):
+            deltas.setdefault(key, Counter())[field] -= 1
+        for key, field in _contributions(new_fields):
+            deltas.setdefault(key, Counter())[field] += 1
+
+    for key, delta in deltas.items():
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            _apply(key, delta)
+
+
+def _apply(key, delta):
+    lookup = dict(zip(COUNTER_KEY_FIELDS, key))
+    updates = {field: F(field) + value for field, value in delta.items()}
+    counters = ActivityCounter.objects.filter(**lookup)
+    if counters.update(**updates):
+        return
+
+    # Sem linha para decrementar: a tabela já estava fora de sincronia
+    # (ou o técnico está sendo excluído junto com seus contadores)
+    if not any(value > 0 for value in delta.values()):
+        return
+
+    try:
+        with transaction.atomic():
+            ActivityCounter.objects.create(**lookup, **delta)
+    except IntegrityError:
+        # Linha criada por outra transação ao mesmo tempo
+        counters.update(**updates)
+
+
+def compute_live_counts():
+    """
+    Conta as atividades diretamente na tabela de atividades
+
+    Retorna ``{(técnico, status, prioridade, mês): [criadas, concluídas]}``.
+    """
+    counts = {}
+    created = MaintenanceActivity.objects.order_by().annotate(
+        month=TruncMonth('created_at', output_field=DateField())
+    ).values(*COUNTER_KEY_FIELDS).annotate(total=Count('id'))
+    for row in created:
+        key = tuple(row[field] for field in COUNTER_KEY_FIELDS)
+        counts.setdefault(key, [0, 0])[0] = row['total']
+
+    completed = MaintenanceActivity.objects.filter(
+        status='completed', completed_at__isnull=False
+    ).order_by().annotate(
+        month=TruncMonth('completed_at', output_field=DateField())
+    ).values(*COUNTER_KEY_FIELDS).annotate(total=Count('id'))
+    for row in completed:
+        key = tuple(row[field] for field in COUNTER_KEY_FIELDS)
+        counts.setdefault(key, [0, 0])[1] = row['total']
+
+    return counts
+
+
+def stored_counts():
+    """Contadores gravados, no mesmo formato de ``compute_live_counts``"""
+    return {
+        tuple(row[:4]): [row[4], row[5]]
+        for row in ActivityCounter.objects.order_by().values_list(
+            *COUNTER_KEY_FIELDS, 'created_count', 'completed_count'
+        )
+        if row[4] or row[5]
+    }
+
+
+def rebuild_counters(batch_size=1000):
+    """Reconstrói a tabela de contadores a partir das atividades"""
+    with transaction.atomic():
+        counts = compute_live_counts()
+        ActivityCounter.objects.all().delete()
+        ActivityCounter.objects.bulk_create([
+            ActivityCounter(
+                **dict(zip(COUNTER_KEY_FIELDS, key)),
+                created_count=created_count,
+                completed_count=completed_count
+            )
+            for key, (created_count, completed_count) in counts.items()
+        ], batch_size=batch_size)
+    bump_activities_version()
+    return len(counts)
+
+
+def verify_counters():
+    """
+    Compara os contadores gravados com as contagens reais
+
+    Retorna ``[(chave, gravado, real)]`` para as linhas divergentes.
+    """
+    live = compute_live_counts()
+    stored = stored_counts()
+    return [
+        (key, stored.get(key, [0, 0]), live.get(key, [0, 0]))
+        for key in sorted(set(live) | set(stored), key=str)
+        if stored.get(key, [0, 0]) != live.get(key, [0, 0])
+    ]
+
+
+def counter_totals(technician_id=None):
+    """
+    Totais por status, prioridade e do mês atual lidos dos contadores,
+    em uma única consulta
+    """
+    current_month = month_of(timezone.now())
+    counters = ActivityCounter.objects.order_by()
+    if technician_id is not None:
+        counters = counters.filter(technician_id=technician_id)
+
+    def total(field='created_count', **filters):
+        return Coalesce(Sum(field, filter=Q(**filters) if filters else None), 0)
+
+    statuses = [choice[0] for choice in MaintenanceActivity.STATUS_CHOICES]
+    priorities = [choice[0] for choice in MaintenanceActivity.PRIORITY_CHOICES]
+    return counters.aggregate(
+        total=total(),
+        created_this_month=total(month=current_month),
+        completed_this_month=total('completed_count', month=current_month),
+        **{status: total(status=status) for status in statuses},
+        **{f'priority_{priority}': total(priority=priority) for priority in priorities}
+    )
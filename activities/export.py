@@ -0,0 +1,115 @@
+"""
+Exportação em fluxo das atividades (CSV ou NDJSON)
+
+As linhas vêm de uma projeção ``values()`` com os nomes do técnico, do
+tipo e do local já no mesmo SELECT e o custo de peças como subconsulta
+(sem GROUP BY sobre a tabela inteira). A leitura usa ``iterator()`` em
+blocos (cursor no servidor no PostgreSQL) e cada linha é formatada e
+entregue assim que lida, então a memória não cresce com o tamanho da
+exportação.
+"""
+import csv
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    CharField, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+)
+from django.db.models.functions import Concat, Trim
+from django.utils import timezone
+from django.utils.duration import duration_string
+
+from .models import PartUsage
+
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_CHUNK_SIZE = 2000
+
+# Coluna exportada -> campo da projeção
+EXPORT_COLUMNS = {
+    'id': 'id',
+    'title': 'title',
+    'status': 'status',
+    'priority': 'priority',
+    'technician': 'technician__username',
+    'technician_name': 'technician_name',
+    'activity_type': 'activity_type__name',
+    'location_code': 'location__code',
+    'location_name': 'location__name',
+    'scheduled_date': 'scheduled_date',
+    'started_at': 'started_at',
+    'completed_at': 'completed_at',
+    'estimated_duration': 'estimated_duration',
+    'actual_duration': 'actual_duration',
+    'parts_cost': 'parts_cost',
+    'created_at': 'created_at',
+}
+
+
+def parts_cost_subquery():
+    """Soma de quantidade x custo unitário das peças da atividade"""
+    cost = ExpressionWrapper(
+        F('quantity_used') * F('unit_cost'),
+        output_field=DecimalField(max_digits=20, decimal_places=4)
+    )
+    return Subquery(
+        PartUsage.objects.filter(activity=OuterRef('pk')).order_by().values(
+            'activity'
+        ).annotate(total=Sum(cost)).values('total'),
+        output_field=DecimalField(max_digits=20, decimal_places=4)
+    )
+
+
+def export_values(queryset):
+    """Projeção das colunas exportadas, em ordem de id"""
+    return queryset.annotate(
+        technician_name=Trim(Concat(
+            'technician__first_name', Value(' '), 'technician__last_name',
+            output_field=CharField()
+        )),
+        parts_cost=parts_cost_subquery(),
+    ).order_by('id').values(*EXPORT_COLUMNS.values())
+
+
+def format_value(value):
+    # Mesmos formatos das respostas da API
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, timedelta):
+        return duration_string(value)
+    if isinstance(value, Decimal):
+        return str(value.quantize(Decimal('0.01')))
+    return value
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Gera um dicionário por atividade com as colunas de ``EXPORT_COLUMNS``"""
+    for values in export_values(queryset).iterator(chunk_size=chunk_size):
+        yield {column: format_value(values[field]) for column, field in EXPORT_COLUMNS.items()}
+
+
+class EchoBuffer:
+    """Buffer do ``csv.writer`` que devolve a linha em vez de guardá-la"""
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(EXPORT_COLUMNS.keys())
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row.values()])
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def render_export(queryset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Gera os pedaços de texto da exportação no formato pedido"""
+    rows = export_rows(queryset, chunk_size=chunk_size)
+    if export_format == 'ndjson':
+        return render_ndjson(rows)
+    return render_csv(rows)
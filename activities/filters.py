@@ -0,0 +1,64 @@
+"""
+Filtros da listagem de atividades
+
+Compartilhados pela listagem paginada, pela exportação e pelo comando de
+exportação, para que os mesmos parâmetros selecionem as mesmas atividades.
+"""
+from functools import reduce
+from operator import and_, or_
+
+from django.db.models import Q
+
+from locations.models import Location
+
+
+ACTIVITY_SEARCH_FIELDS = ['title', 'description', 'location__name']
+
+
+def filter_activities(queryset, params, user=None):
+    """
+    Aplica os filtros ``status``, ``priority``, ``technician`` e
+    ``location_subtree`` de ``params``; com ``user``, técnicos veem apenas
+    as próprias atividades
+    """
+    status_filter = params.get('status')
+    priority_filter = params.get('priority')
+    technician_filter = params.get('technician')
+    location_subtree = params.get('location_subtree')
+
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+
+    if priority_filter:
+        queryset = queryset.filter(priority=priority_filter)
+
+    if technician_filter:
+        queryset = queryset.filter(technician_id=technician_filter)
+
+    if location_subtree:
+        # Prefixo constante do caminho materializado para usar o índice,
+        # sem expandir os IDs da subárvore
+        location_subtree = str(location_subtree)
+        subtree_path = Location.objects.filter(
+            id=location_subtree if location_subtree.isdigit() else None
+        ).order_by().values_list('path', flat=True).first()
+        if subtree_path is None:
+            return queryset.none()
+        queryset = queryset.filter(location__path__startswith=subtree_path)
+
+    # Se não for supervisor, mostra apenas suas atividades
+    if user is not None and not (user.is_supervisor or user.is_staff):
+        queryset = queryset.filter(technician=user)
+
+    return queryset
+
+
+def search_activities(queryset, search):
+    """Busca como o ``SearchFilter`` da listagem: todos os termos, em qualquer campo"""
+    terms = search.replace(',', ' ').split() if search else []
+    if not terms:
+        return queryset
+    return queryset.filter(reduce(and_, [
+        reduce(or_, [Q(**{f'{field}__icontains': term}) for field in ACTIVITY_SEARCH_FIELDS])
+        for term in terms
+    ]))
@@ -0,0 +1,137 @@
+"""
+Suporte ao cabeçalho ``Idempotency-Key`` nos endpoints que criam dados
+
+O aplicativo repete a requisição quando a rede cai antes da resposta; com
+a mesma chave, a repetição recebe a resposta guardada da primeira execução
+em vez de criar outra atividade, foto ou uso de peça.
+
+A chave é reservada antes de executar a view (linha com ``status_code``
+nulo, única por usuário e chave), então repetições simultâneas não correm
+em paralelo: recebem 409 até a original terminar. Respostas 5xx e
+exceções liberam a chave para uma nova tentativa; uma reserva sem resposta
+há mais de ``IDEMPOTENCY_LEASE`` (processo encerrado no meio da execução)
+é tratada como abandonada e pode ser retomada. As chaves valem por
+``IDEMPOTENCY_TTL``; as expiradas do usuário são removidas a cada nova
+reserva e ``prune_idempotency_keys`` limpa as demais.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = timedelta(hours=24)
+IDEMPOTENCY_LEASE = timedelta(minutes=2)
+
+
+def _jsonable(value):
+    if isinstance(value, UploadedFile):
+        # Arquivos entram pelo nome e tamanho: o conteúdo já foi consumido
+        return [value.name, value.size]
+    return str(value)
+
+
+def request_fingerprint(request):
+    """Hash do método, caminho e corpo: a mesma chave não vale para outra requisição"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists()}
+    body = json.dumps(data, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def prune_idempotency_keys(now=None):
+    """Remove as chaves expiradas"""
+    limit = (now or timezone.now()) - IDEMPOTENCY_TTL
+    deleted, _ = IdempotencyRecord.objects.filter(created_at__lt=limit).delete()
+    return deleted
+
+
+def _claim(user, key, fingerprint):
+    """Reserva a chave; retorna ``(registro, criado)``"""
+    now = timezone.now()
+    IdempotencyRecord.objects.filter(user=user, created_at__lt=now - IDEMPOTENCY_TTL).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(user=user, key=key, fingerprint=fingerprint), True
+    except IntegrityError:
+        pass
+
+    # Reserva abandonada: retomada por uma única requisição (UPDATE condicional)
+    reclaimed = IdempotencyRecord.objects.filter(
+        user=user, key=key, status_code__isnull=True, created_at__lt=now - IDEMPOTENCY_LEASE
+    ).update(fingerprint=fingerprint, created_at=now)
+    record = IdempotencyRecord.objects.filter(user=user, key=key).first()
+    return record, bool(reclaimed) and record is not None
+
+
+def run_idempotent(request, handler):
+    """
+    Executa ``handler()`` uma única vez por ``Idempotency-Key``
+
+    Sem o cabeçalho, apenas executa.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > 255:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} deve ter no máximo 255 caracteres.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fingerprint = request_fingerprint(request)
+    record, created = _claim(request.user, key, fingerprint)
+    if not created:
+        if record is None:
+            # Expirou e foi removida entre a reserva e a leitura
+            record, created = _claim(request.user, key, fingerprint)
+        if not created:
+            return _stored_response(record, fingerprint)
+
+    try:
+        response = handler()
+    except Exception:
+        record.delete()
+        raise
+
+    if response.status_code >= 500:
+        record.delete()
+    else:
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=['status_code', 'response'])
+    return response
+
+
+def _stored_response(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} já usada em outra requisição.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.status_code is None:
+        return Response(
+            {'error': 'Requisição com esta chave ainda em processamento. Tente novamente.'},
+            status=status.HTTP_409_CONFLICT
+        )
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """Decorador para views de função (aplicado abaixo de ``@api_view``)"""
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        return run_idempotent(request, lambda: view_func(request, *args, **kwargs))
+    return wrapper
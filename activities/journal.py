@@ -0,0 +1,171 @@
+"""
+Reprodução do diário de ações feitas offline
+
+O aplicativo acumula início, finalização, cancelamento, respostas e fotos
+enquanto está sem sinal e envia tudo em uma requisição. As ações são
+agrupadas por atividade (na ordem da primeira ocorrência) e cada grupo é
+aplicado, na ordem do diário, em uma transação com a atividade travada.
+
+Conflitos são resolvidos contra o estado atual do servidor, sempre da
+mesma forma:
+
+- transição cujo estado de destino já foi alcançado (ou ultrapassado,
+  como iniciar uma atividade concluída) é ``duplicate``: nada é gravado;
+- transição a partir de um estado que não a permite é ``conflict``;
+- respostas e fotos são aceitas enquanto a atividade não estiver cancelada;
+  entre respostas à mesma pergunta vale a última do diário;
+- ação com ``id`` já aplicado (``JournalAction``, por usuário e atividade)
+  é ``duplicate``: o reenvio do diário não grava fotos nem respostas de novo.
+"""
+from django.db import transaction
+
+from .completion import missing_references, save_answers, save_parts_used
+from .models import JournalAction, MaintenanceActivity
+from .serializers import ActivityCompleteSerializer, ActivityStartSerializer, PhotoUploadSerializer
+from .transitions import apply_transition, can_transition
+
+
+# Estados em que a transição já está aplicada (replay da mesma ação)
+APPLIED_STATES = {
+    'start': ('in_progress', 'completed'),
+    'complete': ('completed',),
+    'cancel': ('cancelled',),
+}
+
+
+def _transition(activity, name, data, files):
+    if activity.status in APPLIED_STATES[name]:
+        return {'status': 'duplicate'}
+    if not can_transition(activity, name):
+        return {
+            'status': 'conflict',
+            'error': f'Status atual: {activity.get_status_display()}'
+        }
+
+    serializer_class = ActivityCompleteSerializer if name == 'complete' else ActivityStartSerializer
+    serializer = serializer_class(data=data)
+    if not serializer.is_valid():
+        return {'status': 'invalid', 'errors': serializer.errors}
+
+    answers_data = serializer.validated_data.get('answers', [])
+    parts_data = serializer.validated_data.get('parts_used', [])
+    missing_questions, missing_parts = missing_references(answers_data, parts_data)
+    if missing_questions or missing_parts:
+        return {
+            'status': 'invalid',
+            'errors': {'questions': missing_questions, 'parts': missing_parts}
+        }
+
+    changes = {}
+    if serializer.validated_data.get('observations'):
+        changes['observations'] = serializer.validated_data['observations']
+    if not apply_transition(activity, name, **changes):
+        return {'status': 'conflict', 'error': 'Atividade alterada por outro dispositivo.'}
+
+    save_answers(activity, answers_data)
+    save_parts_used(activity, parts_data)
+    return {'status': 'applied'}
+
+
+def _answer(activity, name, data, files):
+    if activity.status == 'cancelled':
+        return {'status': 'conflict', 'error': 'Atividade cancelada.'}
+
+    serializer = ActivityCompleteSerializer(data={'answers': [data]})
+    if not serializer.is_valid():
+        return {'status': 'invalid', 'errors': serializer.errors}
+
+    answers_data = serializer.validated_data['answers']
+    missing_questions, _ = missing_references(answers_data, [])
+    if missing_questions:
+        return {'status': 'invalid', 'errors': {'questions': missing_questions}}
+
+    save_answers(activity, answers_data)
+    return {'status': 'applied'}
+
+
+def _photo(activity, name, data, files):
+    if activity.status == 'cancelled':
+        return {'status': 'conflict', 'error': 'Atividade cancelada.'}
+
+    # O arquivo vai no mesmo multipart; a ação informa o nome do campo
+    serializer = PhotoUploadSerializer(data={
+        'photo': files.get(data.get('file')),
+        'photo_type': data.get('photo_type'),
+        'description': data.get('description', ''),
+    })
+    if not serializer.is_valid():
+        return {'status': 'invalid', 'errors': serializer.errors}
+
+    photo = serializer.save(activity=activity)
+    return {'status': 'applied', 'photo': photo.pk}
+
+
+ACTION_HANDLERS = {
+    'start': _transition,
+    'complete': _transition,
+    'cancel': _transition,
+    'answer': _answer,
+    'photo': _photo,
+}
+
+
+def _replay_activity(user, activity_id, actions, files):
+    """Aplica as ações de uma atividade; retorna ``(resultados, estado final)``"""
+    with transaction.atomic():
+        activity = MaintenanceActivity.objects.select_for_update().filter(pk=activity_id).first()
+        if activity is None:
+            return [{'status': 'not_found', 'error': 'Atividade não encontrada.'}] * len(actions), None
+        if not (user.id == activity.technician_id or user.is_supervisor):
+            return [{
+                'status': 'forbidden',
+                'error': 'Você não tem permissão para alterar esta atividade.'
+            }] * len(actions), None
+
+        applied = set(JournalAction.objects.filter(
+            user=user, activity=activity,
+            action_id__in=[action['id'] for action in actions if action.get('id')]
+        ).values_list('action_id', flat=True))
+
+        results = []
+        for action in actions:
+            action_id = action.get('id')
+            if action_id and action_id in applied:
+                results.append({'status': 'duplicate'})
+                continue
+            result = ACTION_HANDLERS[action['type']](activity, action['type'], action['data'], files)
+            if action_id and result['status'] == 'applied':
+                applied.add(action_id)
+                JournalAction.objects.create(user=user, activity=activity, action_id=action_id)
+            results.append(result)
+    return results, {'id': activity.pk, 'status': activity.status, 'version': activity.version}
+
+
+def replay_journal(user, actions, files):
+    """
+    Reproduz o diário ``actions`` (já validado) do usuário
+
+    Retorna um resultado por ação, na ordem recebida, e o estado final de
+    cada atividade envolvida.
+    """
+    groups = {}
+    for index, action in enumerate(actions):
+        groups.setdefault(action['activity'], []).append((index, action))
+
+    results = [None] * len(actions)
+    activities = []
+    for activity_id, group in groups.items():
+        group_results, state = _replay_activity(
+            user, activity_id, [action for _, action in group], files
+        )
+        for (index, action), result in zip(group, group_results):
+            results[index] = {
+                'index': index,
+                'id': action.get('id'),
+                'type': action['type'],
+                'activity': activity_id,
+                **result,
+            }
+        if state:
+            activities.append(state)
+    return results, activities
@@ -0,0 +1,54 @@
+"""
+Comando Django para exportar as atividades em CSV ou NDJSON
+"""
+from django.core.management.base import BaseCommand
+
+from activities.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, render_export
+from activities.filters import filter_activities, search_activities
+from activities.models import MaintenanceActivity
+
+
+class Command(BaseCommand):
+    help = 'Exportar as atividades de manutenção (com os filtros da listagem) para um arquivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Arquivo de saída (padrão: saída padrão)'
+        )
+        parser.add_argument(
+            '--export-format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help='Formato da exportação'
+        )
+        parser.add_argument('--status', help='Filtra pelo status')
+        parser.add_argument('--priority', help='Filtra pela prioridade')
+        parser.add_argument('--technician', help='Filtra pelo ID do técnico')
+        parser.add_argument('--location-subtree', help='Filtra pela subárvore do local informado')
+        parser.add_argument('--search', help='Busca no título, descrição e nome do local')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Quantidade de linhas lidas do banco por vez'
+        )
+
+    def handle(self, *args, **options):
+        activities = filter_activities(MaintenanceActivity.objects.all(), options)
+        activities = search_activities(activities, options['search'])
+        chunks = render_export(activities, options['export_format'], chunk_size=options['chunk_size'])
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        rows = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                rows += 1
+        if options['export_format'] == 'csv':
+            rows -= 1  # Cabeçalho
+        self.stdout.write(self.style.SUCCESS(f"✅ {rows} atividades exportadas para {options['output']}"))
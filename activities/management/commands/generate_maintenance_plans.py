@@ -0,0 +1,49 @@
+"""
+Comando Django para gerar as atividades dos planos de manutenção preventiva
+"""
+from django.core.management.base import BaseCommand
+
+from activities.plans import generate_all_plans
+
+
+class Command(BaseCommand):
+    help = 'Gerar as atividades dos planos de manutenção ativos até o horizonte informado'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Horizonte de geração em dias a partir de agora'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Quantidade de atividades por INSERT'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas conta as atividades que seriam criadas'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"🔄 Gerando atividades dos planos para os próximos {options['days']} dias...")
+
+        results = generate_all_plans(
+            horizon_days=options['days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+
+        created_total = 0
+        for plan, expected, created in results:
+            created_total += created
+            self.stdout.write(f'📋 {plan.name}: {expected} ocorrências, {created} novas')
+
+        if options['dry_run']:
+            self.stdout.write(f'📋 {created_total} atividades seriam criadas')
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {created_total} atividades criadas'))
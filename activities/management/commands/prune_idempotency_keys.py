@@ -0,0 +1,18 @@
+"""
+Comando Django para remover chaves de idempotência expiradas
+"""
+from django.core.management.base import BaseCommand
+
+from activities.idempotency import IDEMPOTENCY_TTL, prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = (
+        'Remover as chaves de idempotência com mais de '
+        f'{int(IDEMPOTENCY_TTL.total_seconds() // 3600)} horas'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🧹 Removendo chaves de idempotência expiradas...')
+        deleted = prune_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted} chaves removidas'))
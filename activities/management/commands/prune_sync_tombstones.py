@@ -0,0 +1,17 @@
+"""
+Comando Django para remover exclusões antigas da sincronização
+"""
+from django.core.management.base import BaseCommand
+
+from activities.sync import SYNC_TOMBSTONE_RETENTION, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Remover registros de exclusão da sincronização fora do período de retenção'
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'🧹 Removendo exclusões com mais de {SYNC_TOMBSTONE_RETENTION.days} dias...'
+        )
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted} registros removidos'))
@@ -0,0 +1,37 @@
+"""
+Comando Django para reconstruir e verificar os contadores de atividades
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from activities.counters import rebuild_counters, verify_counters
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir a tabela de contadores de atividades e conferir com as contagens reais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Apenas compara os contadores com as atividades, sem reconstruir'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            self.stdout.write('🔄 Reconstruindo contadores de atividades...')
+            rows = rebuild_counters()
+            self.stdout.write(f'📋 {rows} linhas gravadas')
+
+        self.stdout.write('🔍 Conferindo contadores com as atividades...')
+        mismatches = verify_counters()
+        for key, stored, live in mismatches:
+            technician_id, status, priority, month = key
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Técnico {technician_id}, {status}/{priority}, {month:%m/%Y}: '
+                f'gravado {stored}, real {live}'
+            ))
+
+        if mismatches:
+            raise CommandError(f'❌ {len(mismatches)} contadores divergentes')
+
+        self.stdout.write(self.style.SUCCESS('✅ Contadores conferem com as atividades'))
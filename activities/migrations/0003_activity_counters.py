@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncMonth
+
+
+def populate_counters(apps, schema_editor):
+    """Preenche os contadores a partir das atividades existentes"""
+    MaintenanceActivity = apps.get_model('activities', 'MaintenanceActivity')
+    ActivityCounter = apps.get_model('activities', 'ActivityCounter')
+    key_fields = ('technician_id', 'status', 'priority', 'month')
+
+    counts = {}
+    for date_field, index, activities in [
+        ('created_at', 0, MaintenanceActivity.objects.all()),
+        ('completed_at', 1, MaintenanceActivity.objects.filter(
+            status='completed', completed_at__isnull=False
+        )),
+    ]:
+        rows = activities.order_by().annotate(
+            month=TruncMonth(date_field, output_field=DateField())
+        ).values(*key_fields).annotate(total=Count('id'))
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            counts.setdefault(key, [0, 0])[index] = row['total']
+
+    ActivityCounter.objects.bulk_create([
+        ActivityCounter(
+            **dict(zip(key_fields, key)),
+            created_count=created_count,
+            completed_count=completed_count
+        )
+        for key, (created_count, completed_count) in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('in_progress', 'Em Andamento'), ('completed', 'Concluída'), ('cancelled', 'Cancelada')], max_length=15, verbose_name='Status')),
+                ('priority', models.CharField(choices=[('low', 'Baixa'), ('medium', 'Média'), ('high', 'Alta'), ('critical', 'Crítica')], max_length=10, verbose_name='Prioridade')),
+                ('month', models.DateField(verbose_name='Mês')),
+                ('created_count', models.IntegerField(default=0, verbose_name='Criadas no Mês')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='Concluídas no Mês')),
+                ('technician', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Técnico')),
+            ],
+            options={
+                'verbose_name': 'Contador de Atividades',
+                'verbose_name_plural': 'Contadores de Atividades',
+                'unique_together': {('technician', 'status', 'priority', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0003_activity_counters'),
+        ('locations', '0002_location_path_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenanceactivity',
+            index=models.Index(fields=['created_at', 'id'], name='activity_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceactivity',
+            index=models.Index(fields=['scheduled_date', 'id'], name='activity_scheduled_id_idx'),
+        ),
+    ]
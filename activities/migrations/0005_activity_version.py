@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0004_activity_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenanceactivity',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versão'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0005_activity_version'),
+        ('locations', '0002_location_path_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenancePlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Nome do Plano')),
+                ('description', models.TextField(blank=True, verbose_name='Descrição')),
+                ('location_type', models.CharField(blank=True, choices=[('plant', 'Planta/Fábrica'), ('sector', 'Setor'), ('line', 'Linha de Produção'), ('equipment', 'Equipamento'), ('component', 'Componente'), ('area', 'Área')], max_length=10, verbose_name='Tipo de Local (vazio = todos)')),
+                ('priority', models.CharField(choices=[('low', 'Baixa'), ('medium', 'Média'), ('high', 'Alta'), ('critical', 'Crítica')], default='medium', max_length=10, verbose_name='Prioridade')),
+                ('interval_count', models.PositiveIntegerField(default=1, verbose_name='Repetir a Cada')),
+                ('interval_unit', models.CharField(choices=[('day', 'Dias'), ('week', 'Semanas'), ('month', 'Meses')], default='week', max_length=5, verbose_name='Unidade do Intervalo')),
+                ('start_date', models.DateTimeField(verbose_name='Primeira Ocorrência')),
+                ('end_date', models.DateTimeField(blank=True, null=True, verbose_name='Última Ocorrência')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activity_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plans', to='activities.activitytype', verbose_name='Tipo de Atividade')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_plans', to='locations.location', verbose_name='Local Raiz')),
+                ('technician', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Técnico Responsável')),
+            ],
+            options={
+                'verbose_name': 'Plano de Manutenção',
+                'verbose_name_plural': 'Planos de Manutenção',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='maintenanceactivity',
+            name='plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activities', to='activities.maintenanceplan', verbose_name='Plano de Manutenção'),
+        ),
+        migrations.AddConstraint(
+            model_name='maintenanceactivity',
+            constraint=models.UniqueConstraint(condition=models.Q(('plan__isnull', False)), fields=('plan', 'location', 'scheduled_date'), name='activity_plan_occurrence_unique'),
+        ),
+    ]
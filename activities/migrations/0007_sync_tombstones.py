@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0006_maintenance_plans'),
+        ('locations', '0003_location_updated_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('activity', 'Atividade'), ('location', 'Local'), ('activity_type', 'Tipo de Atividade'), ('question', 'Pergunta Padrão')], max_length=15, verbose_name='Modelo')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID do Objeto')),
+                ('owner_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID do Técnico')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Excluído em')),
+            ],
+            options={
+                'verbose_name': 'Exclusão Sincronizada',
+                'verbose_name_plural': 'Exclusões Sincronizadas',
+            },
+        ),
+        migrations.AddField(
+            model_name='activitytype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='standardquestion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceactivity',
+            index=models.Index(fields=['updated_at', 'id'], name='activity_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceactivity',
+            index=models.Index(fields=['technician', 'updated_at'], name='activity_tech_updated_idx'),
+        ),
+    ]
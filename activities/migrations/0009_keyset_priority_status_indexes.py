@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0008_idempotency_records'),
+        ('locations', '0003_location_updated_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenanceactivity',
+            index=models.Index(fields=['priority', 'id'], name='activity_priority_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceactivity',
+            index=models.Index(fields=['status', 'id'], name='activity_status_id_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from parts.models import Part
 from locations.models import Location
 
@@ -14,6 +15,7 @@ class ActivityType(models.Model):
     requires_parts = models.BooleanField(default=True, verbose_name="Requer Peças")
     is_active = models.BooleanField(default=True, verbose_name="Ativa")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = "Tipo de Atividade"
@@ -40,6 +42,7 @@ class StandardQuestion(models.Model):
     choices = models.JSONField(blank=True, null=True, verbose_name="Opções (para múltipla escolha)")
     is_required = models.BooleanField(default=True, verbose_name="Obrigatória")
     order = models.PositiveIntegerField(default=0, verbose_name="Ordem")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = "Pergunta Padrão"
@@ -81,6 +84,9 @@ class MaintenanceActivity(models.Model):
     estimated_duration = models.DurationField(null=True, blank=True, verbose_name="Duração Estimada")
     actual_duration = models.DurationField(null=True, blank=True, verbose_name="Duração Real")
     observations = models.TextField(blank=True, verbose_name="Observações")
+    plan = models.ForeignKey('MaintenancePlan', on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='activities', verbose_name="Plano de Manutenção")
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Versão")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -88,10 +94,197 @@ class MaintenanceActivity(models.Model):
         verbose_name = "Atividade de Manutenção"
         verbose_name_plural = "Atividades de Manutenção"
         ordering = ['-created_at']
+        indexes = [
+            # Posições da paginação por cursor (campo de ordenação, id)
+            models.Index(fields=['created_at', 'id'], name='activity_created_id_idx'),
+            models.Index(fields=['scheduled_date', 'id'], name='activity_scheduled_id_idx'),
+            models.Index(fields=['priority', 'id'], name='activity_priority_id_idx'),
+            models.Index(fields=['status', 'id'], name='activity_status_id_idx'),
+            # Varredura da sincronização incremental (geral e por técnico)
+            models.Index(fields=['updated_at', 'id'], name='activity_updated_id_idx'),
+            models.Index(fields=['technician', 'updated_at'], name='activity_tech_updated_idx'),
+        ]
+        constraints = [
+            # Uma ocorrência de plano por local e data: o gerador é idempotente
+            models.UniqueConstraint(
+                fields=['plan', 'location', 'scheduled_date'],
+                condition=models.Q(plan__isnull=False),
+                name='activity_plan_occurrence_unique'
+            ),
+        ]
         
     def __str__(self):
         return f"{self.title} - {self.location.name} ({self.get_status_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o local carregado para atualizar os totais do local anterior
+        instance._loaded_location_id = instance.__dict__.get('location_id')
+        # E o tipo carregado, para invalidar o catálogo quando a contagem muda
+        instance._loaded_activity_type_id = instance.__dict__.get('activity_type_id')
+        # E os campos dos contadores, para aplicar só a diferença ao salvar
+        instance._loaded_counter_fields = instance.counter_fields()
+        return instance
+
+    def counter_fields(self):
+        """Campos que definem a contribuição da atividade em ``ActivityCounter``"""
+        fields = ('technician_id', 'status', 'priority', 'created_at', 'completed_at')
+        if any(field not in self.__dict__ for field in fields):
+            return None  # Carregada com only()/defer(): recalculada no save
+        return tuple(self.__dict__[field] for field in fields)
+
+    def save(self, *args, **kwargs):
+        # Toda gravação incrementa a versão (controle de concorrência otimista)
+        self.version += 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        # Os contadores são ajustados no post_save, na mesma transação
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class ActivityCounter(models.Model):
+    """
+    Contadores pré-agregados de atividades por técnico, status, prioridade e mês
+
+    ``created_count`` conta as atividades criadas no mês que estão hoje com
+    esse status e prioridade; ``completed_count`` conta as concluídas no mês
+    (apenas nas linhas com status ``completed``).
+    """
+    technician = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Técnico")
+    status = models.CharField(max_length=15, choices=MaintenanceActivity.STATUS_CHOICES, verbose_name="Status")
+    priority = models.CharField(max_length=10, choices=MaintenanceActivity.PRIORITY_CHOICES, verbose_name="Prioridade")
+    month = models.DateField(verbose_name="Mês")
+    created_count = models.IntegerField(default=0, verbose_name="Criadas no Mês")
+    completed_count = models.IntegerField(default=0, verbose_name="Concluídas no Mês")
+    
+    class Meta:
+        verbose_name = "Contador de Atividades"
+        verbose_name_plural = "Contadores de Atividades"
+        unique_together = ['technician', 'status', 'priority', 'month']
+        
+    def __str__(self):
+        return f"{self.technician_id} - {self.status}/{self.priority} ({self.month:%m/%Y})"
+
+
+class MaintenancePlan(models.Model):
+    """
+    Plano de manutenção preventiva recorrente
+
+    Gera uma atividade do tipo informado para cada local da subárvore (do
+    tipo de local escolhido) a cada intervalo, a partir da data de início.
+    """
+    INTERVAL_UNITS = [
+        ('day', 'Dias'),
+        ('week', 'Semanas'),
+        ('month', 'Meses'),
+    ]
+    
+    name = models.CharField(max_length=200, verbose_name="Nome do Plano")
+    description = models.TextField(blank=True, verbose_name="Descrição")
+    activity_type = models.ForeignKey(ActivityType, on_delete=models.CASCADE, related_name='plans',
+                                      verbose_name="Tipo de Atividade")
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='maintenance_plans',
+                                 verbose_name="Local Raiz")
+    location_type = models.CharField(max_length=10, choices=Location.LOCATION_TYPES, blank=True,
+                                     verbose_name="Tipo de Local (vazio = todos)")
+    technician = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                   verbose_name="Técnico Responsável")
+    priority = models.CharField(max_length=10, choices=MaintenanceActivity.PRIORITY_CHOICES,
+                                default='medium', verbose_name="Prioridade")
+    interval_count = models.PositiveIntegerField(default=1, verbose_name="Repetir a Cada")
+    interval_unit = models.CharField(max_length=5, choices=INTERVAL_UNITS, default='week',
+                                     verbose_name="Unidade do Intervalo")
+    start_date = models.DateTimeField(verbose_name="Primeira Ocorrência")
+    end_date = models.DateTimeField(null=True, blank=True, verbose_name="Última Ocorrência")
+    is_active = models.BooleanField(default=True, verbose_name="Ativo")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Plano de Manutenção"
+        verbose_name_plural = "Planos de Manutenção"
+        ordering = ['name']
+        
+    def __str__(self):
+        return f"{self.name} - {self.location.name} (a cada {self.interval_count} {self.get_interval_unit_display().lower()})"
+
+
+class SyncTombstone(models.Model):
+    """
+    Registro de exclusão para a sincronização incremental
+
+    Guarda o id de cada linha sincronizável excluída (ou de cada atividade
+    reatribuída, para o técnico anterior) para que a exclusão chegue aos
+    dispositivos que já tinham a linha.
+    """
+    MODEL_CHOICES = [
+        ('activity', 'Atividade'),
+        ('location', 'Local'),
+        ('activity_type', 'Tipo de Atividade'),
+        ('question', 'Pergunta Padrão'),
+    ]
+    
+    model = models.CharField(max_length=15, choices=MODEL_CHOICES, verbose_name="Modelo")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID do Objeto")
+    # Sem chave estrangeira: o técnico pode ser excluído junto com as atividades
+    owner_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="ID do Técnico")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Excluído em")
+    
+    class Meta:
+        verbose_name = "Exclusão Sincronizada"
+        verbose_name_plural = "Exclusões Sincronizadas"
+        
+    def __str__(self):
+        return f"{self.model} {self.object_id} ({self.deleted_at:%d/%m/%Y %H:%M})"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Resposta guardada de uma requisição com ``Idempotency-Key``
+
+    Enquanto a requisição original executa, ``status_code`` fica nulo;
+    depois guarda a resposta, devolvida às repetições até expirar.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='+', verbose_name="Usuário")
+    key = models.CharField(max_length=255, verbose_name="Chave")
+    fingerprint = models.CharField(max_length=64, verbose_name="Impressão da Requisição")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Status HTTP")
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Resposta")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Chave de Idempotência"
+        verbose_name_plural = "Chaves de Idempotência"
+        unique_together = ['user', 'key']
+        
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+class JournalAction(models.Model):
+    """
+    Ação do diário offline já aplicada, pelo id gerado no aplicativo
+
+    Repetir o diário (reenvio após queda de conexão) não grava de novo
+    respostas e fotos: a ação com o mesmo id é ``duplicate``.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='+', verbose_name="Usuário")
+    activity = models.ForeignKey(MaintenanceActivity, on_delete=models.CASCADE,
+                                 related_name='+', verbose_name="Atividade")
+    action_id = models.CharField(max_length=100, verbose_name="Id da Ação")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Ação do Diário"
+        verbose_name_plural = "Ações do Diário"
+        unique_together = ['user', 'activity', 'action_id']
+        
+    def __str__(self):
+        return f"{self.activity_id} - {self.action_id}"
+
 
 class PartUsage(models.Model):
     """
@@ -0,0 +1,186 @@
+"""
+Paginação das listagens de atividades
+
+Além da paginação por página (com total), a listagem aceita paginação por
+cursor (keyset): a posição é o par (campo de ordenação, id) do último item,
+então cada página é uma busca no índice, sem ``COUNT(*)`` nem ``OFFSET``,
+e o resultado não se desloca quando novas atividades são criadas.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor sobre (campo de ordenação, id)
+
+    A ordenação vem do ``OrderingFilter`` da view; apenas o primeiro campo é
+    usado, com o ``id`` como desempate no mesmo sentido. Valores nulos contam
+    como maiores que todos (no fim da ordem crescente e no início da
+    decrescente), como no padrão do PostgreSQL: assim os dois sentidos
+    percorrem o mesmo índice (campo, id), para frente ou para trás.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+        self.model_field = queryset.model._meta.get_field(self.field)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if cursor:
+            queryset = queryset.filter(self._after(cursor['v'], cursor['id'], reverse))
+
+        # Um item a mais indica se existe outra página no mesmo sentido
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else cursor is not None
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        field = (ordering or getattr(view, 'ordering', None) or ['-created_at'])[0]
+        return field.lstrip('-'), field.startswith('-')
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            # Página vazia após o fim: volta ao início
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+    def _ordering_key(self):
+        return f"{'-' if self.descending else ''}{self.field}"
+
+    def _order_by(self, reverse):
+        descending = self.descending != reverse
+        order = F(self.field).desc if descending else F(self.field).asc
+        # Nulos como maiores valores: ASC NULLS LAST / DESC NULLS FIRST, o
+        # sentido direto ou inverso do índice; explícito porque o SQLite
+        # ordena nulos como menores
+        if not self.model_field.null:
+            expression = order()
+        elif descending:
+            expression = order(nulls_first=True)
+        else:
+            expression = order(nulls_last=True)
+        return [expression, '-id' if descending else 'id']
+
+    def _after(self, value, pk, reverse):
+        """Filtro das linhas estritamente depois da posição (valor, id)"""
+        descending = self.descending != reverse
+        lookup = 'lt' if descending else 'gt'
+        id_after = Q(**{f'id__{lookup}': pk})
+
+        if value is None:
+            position = Q(**{f'{self.field}__isnull': True}) & id_after
+            if descending:
+                position |= Q(**{f'{self.field}__isnull': False})
+            return position
+
+        position = Q(**{f'{self.field}__{lookup}': value}) | (Q(**{self.field: value}) & id_after)
+        if self.model_field.null and not descending:
+            position |= Q(**{f'{self.field}__isnull': True})
+        return position
+
+    def encode_cursor(self, item, reverse):
+        data = {
+            'o': self._ordering_key(),
+            'v': getattr(item, self.field),
+            'id': item.pk,
+            'r': int(reverse),
+        }
+        encoded = base64.urlsafe_b64encode(
+            # str() preserva os microssegundos das datas
+            json.dumps(data, default=str).encode()
+        ).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            # Cursor gerado para outra ordenação não vale para esta
+            if data['o'] != self._ordering_key():
+                raise ValueError
+            value = None if data['v'] is None else self.model_field.to_python(data['v'])
+            return {'v': value, 'id': int(data['id']), 'r': bool(data['r'])}
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ActivityPagination(BasePagination):
+    """
+    Paginação por página (padrão, com ``count``) ou por cursor
+
+    O modo cursor é escolhido com ``?pagination=cursor`` ou quando a
+    requisição já traz um ``cursor``.
+    """
+    mode_query_param = 'pagination'
+
+    def get_mode(self, request):
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            return KeysetPagination()
+        if KeysetPagination.cursor_query_param in request.query_params:
+            return KeysetPagination()
+        return PageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_mode(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageNumberPagination().get_paginated_response_schema(schema)
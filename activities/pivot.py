@@ -0,0 +1,137 @@
+"""
+Exportação das respostas do checklist em formato largo
+
+Para um tipo de atividade, gera uma linha por atividade e uma coluna
+tipada por pergunta padrão (número, sim/não ou texto), em CSV, no lugar da
+tabela entidade-atributo-valor ``ActivityAnswer``.
+
+Atividades e respostas são lidas uma única vez, ambas em ordem de
+atividade, e casadas como duas listas ordenadas. As respostas são
+acumuladas por coluna em blocos de atividades: ``array('d')`` para números
+(NaN quando sem resposta), ``array('b')`` para sim/não (-1 quando sem
+resposta) e listas para texto. Cada bloco é escrito e descartado antes do
+próximo, então a memória depende do tamanho do bloco e não do total.
+"""
+import csv
+import math
+from array import array
+
+from django.utils.text import slugify
+
+from .export import EchoBuffer, format_value
+from .models import ActivityAnswer
+
+
+PIVOT_BLOCK_SIZE = 1000
+PIVOT_CHUNK_SIZE = 2000
+
+# Colunas fixas da atividade -> campo da projeção
+ACTIVITY_COLUMNS = {
+    'activity_id': 'id',
+    'title': 'title',
+    'status': 'status',
+    'technician': 'technician__username',
+    'location_code': 'location__code',
+    'location_name': 'location__name',
+    'scheduled_date': 'scheduled_date',
+    'completed_at': 'completed_at',
+}
+
+# Tipo da pergunta -> tipo da coluna
+QUESTION_KINDS = {
+    'number': 'number',
+    'yes_no': 'boolean',
+    'text': 'text',
+    'multiple_choice': 'text',
+}
+
+
+def pivot_questions(activity_type):
+    """Perguntas do tipo em ordem, como ``(id, tipo da coluna, cabeçalho)``"""
+    return [
+        (question_id, QUESTION_KINDS.get(question_type, 'text'), f'q{question_id}_{slugify(text)[:40]}')
+        for question_id, text, question_type in activity_type.questions.order_by(
+            'order', 'id'
+        ).values_list('id', 'question', 'question_type')
+    ]
+
+
+def _new_column(kind, size):
+    if kind == 'number':
+        return array('d', [math.nan]) * size
+    if kind == 'boolean':
+        return array('b', [-1]) * size
+    return [''] * size
+
+
+def _cell(kind, column, position):
+    value = column[position]
+    if kind == 'number':
+        return '' if math.isnan(value) else f'{value:.2f}'
+    if kind == 'boolean':
+        return '' if value < 0 else ('true' if value else 'false')
+    return value
+
+
+def _blocks(iterator, size):
+    block = []
+    for item in iterator:
+        block.append(item)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def render_answer_pivot(activity_type, activities, block_size=PIVOT_BLOCK_SIZE):
+    """
+    Gera as linhas CSV do formato largo para as ``activities`` do tipo
+
+    ``activities`` já deve estar filtrado (visibilidade e filtros da listagem).
+    """
+    questions = pivot_questions(activity_type)
+    kinds = [kind for _, kind, _ in questions]
+    column_of = {question_id: index for index, (question_id, _, _) in enumerate(questions)}
+
+    activities = activities.filter(activity_type=activity_type)
+    activity_rows = activities.order_by('id').values_list(
+        *ACTIVITY_COLUMNS.values()
+    ).iterator(chunk_size=PIVOT_CHUNK_SIZE)
+    answers = ActivityAnswer.objects.filter(
+        activity__in=activities.order_by().values('id'), question_id__in=column_of
+    ).order_by('activity_id').values_list(
+        'activity_id', 'question_id', 'answer_text', 'answer_number', 'answer_boolean'
+    ).iterator(chunk_size=PIVOT_CHUNK_SIZE)
+
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow([*ACTIVITY_COLUMNS, *(header for _, _, header in questions)])
+
+    pending = next(answers, None)
+    for block in _blocks(activity_rows, block_size):
+        position_of = {row[0]: position for position, row in enumerate(block)}
+        columns = [_new_column(kind, len(block)) for kind in kinds]
+        last_id = block[-1][0]
+
+        # Respostas do bloco: avançam junto com as atividades, sem voltar
+        while pending is not None and pending[0] <= last_id:
+            activity_id, question_id, text, number, boolean = pending
+            position = position_of.get(activity_id)
+            if position is not None:
+                index = column_of[question_id]
+                kind = kinds[index]
+                if kind == 'number':
+                    if number is not None:
+                        columns[index][position] = float(number)
+                elif kind == 'boolean':
+                    if boolean is not None:
+                        columns[index][position] = int(boolean)
+                else:
+                    columns[index][position] = text
+            pending = next(answers, None)
+
+        for position, row in enumerate(block):
+            yield writer.writerow([
+                *('' if value is None else format_value(value) for value in row),
+                *(_cell(kind, column, position) for kind, column in zip(kinds, columns)),
+            ])
@@ -0,0 +1,159 @@
+"""
+Geração de atividades a partir dos planos de manutenção preventiva
+
+Para cada plano, as ocorrências do horizonte são expandidas para todos os
+locais da subárvore. As já geradas são descobertas com uma única consulta
+por plano (pares local/data em um ``set``) e só as ausentes são inseridas,
+em lotes com ``bulk_create``, cada lote na sua transação. A restrição
+única (plano, local, data) e o bloqueio do plano em cada lote tornam
+execuções repetidas ou simultâneas idempotentes.
+"""
+import calendar
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from locations.models import Location
+from .caching import bump_activities_version, bump_catalog_version
+from .counters import apply_counter_changes
+from .models import MaintenanceActivity, MaintenancePlan
+from .rollups import invalidate_location_rollups
+
+
+def add_months(value, months):
+    """Soma meses mantendo o dia (limitado ao último dia do mês)"""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def plan_occurrences(plan, start, end):
+    """Datas das ocorrências do plano no intervalo ``[start, end]``"""
+    end = min(end, plan.end_date) if plan.end_date else end
+    step = plan.interval_count
+
+    if plan.interval_unit == 'month':
+        def occurrence(index):
+            # Sempre a partir da data inicial: sem deriva do dia do mês
+            return add_months(plan.start_date, index * step)
+        elapsed = (start.year - plan.start_date.year) * 12 + start.month - plan.start_date.month
+        index = max(elapsed // step - 1, 0)
+    else:
+        delta = timedelta(days=step) if plan.interval_unit == 'day' else timedelta(weeks=step)
+
+        def occurrence(index):
+            return plan.start_date + index * delta
+        index = max((start - plan.start_date) // delta, 0)
+
+    occurrences = []
+    current = occurrence(index)
+    while current <= end:
+        if current >= start:
+            occurrences.append(current)
+        index += 1
+        current = occurrence(index)
+    return occurrences
+
+
+def plan_location_ids(plan):
+    """Locais ativos da subárvore do plano, filtrados pelo tipo de local"""
+    locations = Location.objects.filter(path__startswith=plan.location.path, is_active=True)
+    if plan.location_type:
+        locations = locations.filter(location_type=plan.location_type)
+    return list(locations.order_by('path').values_list('id', flat=True))
+
+
+def generate_plan_activities(plan, start, end, batch_size=1000, dry_run=False):
+    """
+    Cria as atividades ausentes de um plano entre ``start`` e ``end``
+
+    Retorna ``(ocorrências esperadas, atividades criadas)``.
+    """
+    occurrences = plan_occurrences(plan, start, end)
+    location_ids = plan_location_ids(plan)
+    expected = len(occurrences) * len(location_ids)
+    if not expected:
+        return expected, 0
+
+    # Ocorrências já geradas: uma consulta para o plano inteiro
+    existing = set(MaintenanceActivity.objects.filter(
+        plan=plan, scheduled_date__gte=occurrences[0], scheduled_date__lte=occurrences[-1]
+    ).order_by().values_list('location_id', 'scheduled_date'))
+
+    missing = [
+        (location_id, scheduled_date)
+        for scheduled_date in occurrences
+        for location_id in location_ids
+        if (location_id, scheduled_date) not in existing
+    ]
+    if dry_run or not missing:
+        return expected, len(missing) if dry_run else 0
+
+    description = plan.description or f"Gerada pelo plano de manutenção {plan.name}"
+    created = 0
+    try:
+        for offset in range(0, len(missing), batch_size):
+            created += _create_batch(plan, description, missing[offset:offset + batch_size])
+    finally:
+        if created:
+            # bulk_create não dispara sinais: invalida os dados derivados
+            bump_activities_version()
+            bump_catalog_version()
+            invalidate_location_rollups()
+    return expected, created
+
+
+def _create_batch(plan, description, pairs):
+    """
+    Insere um lote de pares ``(local, data)`` em transação própria
+
+    Cada lote confirma em bem menos que ``SYNC_OVERLAP``, então a
+    sincronização incremental não perde atividades de gerações longas.
+    """
+    with transaction.atomic():
+        # Serializa gerações simultâneas do mesmo plano; o que outra geração
+        # já confirmou é descartado do lote
+        MaintenancePlan.objects.select_for_update().filter(pk=plan.pk).exists()
+        dates = {scheduled_date for _, scheduled_date in pairs}
+        existing = set(MaintenanceActivity.objects.filter(
+            plan=plan, scheduled_date__in=dates
+        ).order_by().values_list('location_id', 'scheduled_date'))
+
+        activities = [
+            MaintenanceActivity(
+                technician_id=plan.technician_id,
+                activity_type_id=plan.activity_type_id,
+                location_id=location_id,
+                plan=plan,
+                title=plan.name,
+                description=description,
+                priority=plan.priority,
+                scheduled_date=scheduled_date,
+                estimated_duration=plan.activity_type.estimated_time,
+            )
+            for location_id, scheduled_date in pairs
+            if (location_id, scheduled_date) not in existing
+        ]
+        MaintenanceActivity.objects.bulk_create(activities)
+        apply_counter_changes((None, activity.counter_fields()) for activity in activities)
+    return len(activities)
+
+
+def generate_all_plans(horizon_days=90, batch_size=1000, dry_run=False):
+    """
+    Gera as atividades de todos os planos ativos de agora até o horizonte
+
+    Retorna ``[(plano, ocorrências esperadas, atividades criadas)]``.
+    """
+    start = timezone.now()
+    end = start + timedelta(days=horizon_days)
+    plans = MaintenancePlan.objects.filter(is_active=True).select_related(
+        'location', 'activity_type'
+    ).order_by('id')
+    return [
+        (plan, *generate_plan_activities(plan, start, end, batch_size=batch_size, dry_run=dry_run))
+        for plan in plans
+    ]
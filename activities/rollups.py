@@ -0,0 +1,189 @@
+"""
+Consolidação de atividades por subárvore de locais
+
+Os totais próprios de cada local saem de uma única consulta agregada
+agrupada por local; a soma por subárvore é feita de baixo para cima em
+memória, percorrendo os locais do nível mais profundo para a raiz.
+
+Só locais ativos entram nos totais, como nas demais visões da árvore.
+
+Em cache, cada local tem a sua chave com ``[totais próprios, totais da
+subárvore]``. Uma gravação de atividade relê só os totais próprios dos
+locais alterados e soma a diferença nas chaves deles e dos ancestrais, sob
+um lock (``cache.add``). Quem não consegue o lock, ou encontra alguma
+chave ausente, invalida tudo trocando a versão das chaves; o próximo
+acesso recalcula. Uma atualização em curso nunca sobrescreve a de outra
+nem grava sobre uma versão já invalidada.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+from locations.caching import get_hierarchy_version
+from maintenance_api.cache_versions import bump_version, get_version
+from locations.models import Location
+from .models import MaintenanceActivity
+
+
+OPEN_STATUSES = ('pending', 'in_progress')
+ROLLUP_FIELDS = ('pending', 'in_progress', 'critical', 'parts_cost')
+ROLLUP_CACHE_TIMEOUT = 10 * 60  # 10 minutos
+ROLLUP_VERSION_KEY = 'activities:location_rollups_version'
+ROLLUP_LOCK_TIMEOUT = 30
+
+
+def _zero():
+    return [0, 0, 0, Decimal('0')]
+
+
+def _add(total, values):
+    for index, value in enumerate(values):
+        total[index] += value
+
+
+def _own_rollups(location_ids=None):
+    """Totais próprios (sem descendentes) por local, em uma consulta"""
+    queryset = MaintenanceActivity.objects.order_by()
+    if location_ids is not None:
+        queryset = queryset.filter(location_id__in=location_ids)
+
+    rows = queryset.values('location_id').annotate(
+        pending=Count('id', filter=Q(status='pending'), distinct=True),
+        in_progress=Count('id', filter=Q(status='in_progress'), distinct=True),
+        critical=Count('id', filter=Q(status__in=OPEN_STATUSES, priority='critical'), distinct=True),
+        parts_cost=Sum(
+            F('parts_used__quantity_used') * F('parts_used__unit_cost'),
+            output_field=DecimalField(max_digits=16, decimal_places=4)
+        ),
+    )
+    return {
+        row['location_id']: [
+            row['pending'], row['in_progress'], row['critical'], row['parts_cost'] or Decimal('0')
+        ]
+        for row in rows
+    }
+
+
+def compute_location_rollups():
+    """
+    Calcula os totais de todas as subárvores
+
+    Retorna um snapshot com os totais próprios (``own``), os totais da
+    subárvore (``totals``) e o pai de cada local (``parents``).
+    """
+    own = _own_rollups()
+    totals = {}
+    parents = {}
+
+    # Do nível mais profundo para a raiz: os filhos já somaram no pai
+    nodes = Location.objects.filter(is_active=True).order_by('-depth').values_list('id', 'parent_id')
+    for pk, parent_id in nodes:
+        parents[pk] = parent_id
+        total = totals.setdefault(pk, _zero())
+        if pk in own:
+            _add(total, own[pk])
+        if parent_id:
+            _add(totals.setdefault(parent_id, _zero()), total)
+
+    # Pais inativos acumularam acima, mas não são publicados
+    totals = {pk: total for pk, total in totals.items() if pk in parents}
+    own = {pk: values for pk, values in own.items() if pk in parents}
+    return {'own': own, 'totals': totals, 'parents': parents}
+
+
+def _key_prefix():
+    # Mudanças na hierarquia trocam as chaves e forçam um recálculo completo
+    return (
+        f"activities:location_rollups:{get_hierarchy_version()}:"
+        f"{get_version(ROLLUP_VERSION_KEY)}"
+    )
+
+
+def _entry_key(prefix, pk):
+    return f"{prefix}:{pk}"
+
+
+def get_location_rollups(location_ids):
+    """
+    Totais da subárvore dos locais informados, pelas chaves em cache
+
+    Recalcula e grava todos os locais quando o cache está vazio ou
+    incompleto.
+    """
+    location_ids = list(location_ids)
+    prefix = _key_prefix()
+    if cache.get(f"{prefix}:ready"):
+        entries = cache.get_many([_entry_key(prefix, pk) for pk in location_ids])
+        if len(entries) == len(location_ids):
+            return {pk: entries[_entry_key(prefix, pk)][1] for pk in location_ids}
+
+    snapshot = compute_location_rollups()
+    cache.set_many({
+        _entry_key(prefix, pk): [snapshot['own'].get(pk, _zero()), total]
+        for pk, total in snapshot['totals'].items()
+    }, ROLLUP_CACHE_TIMEOUT)
+    cache.set(f"{prefix}:ready", True, ROLLUP_CACHE_TIMEOUT)
+    return {pk: snapshot['totals'].get(pk, _zero()) for pk in location_ids}
+
+
+def invalidate_location_rollups():
+    """Descarta os totais em cache (após cargas grandes, mais barato que atualizar)"""
+    bump_version(ROLLUP_VERSION_KEY)
+
+
+def refresh_location_rollups(location_ids):
+    """
+    Atualiza incrementalmente os totais em cache para os locais informados
+
+    Recalcula apenas os totais próprios desses locais e soma a diferença
+    nas chaves deles e dos ancestrais ativos. Sem totais em cache, apenas
+    invalida: um cálculo em andamento não chega a ser usado.
+    """
+    prefix = _key_prefix()
+    lock_key = f"{prefix}:lock"
+    if not cache.add(lock_key, True, ROLLUP_LOCK_TIMEOUT):
+        # Outra atualização em curso: sem o lock, descarta os totais
+        invalidate_location_rollups()
+        return
+
+    try:
+        if not cache.get(f"{prefix}:ready"):
+            invalidate_location_rollups()
+            return
+
+        locations = list(Location.objects.filter(
+            pk__in=location_ids, is_active=True
+        ).order_by().only('id', 'path'))
+        node_ids = {pk for location in locations for pk in location.path_ids}
+        active_ids = set(Location.objects.filter(
+            pk__in=node_ids, is_active=True
+        ).order_by().values_list('id', flat=True))
+        entries = cache.get_many([_entry_key(prefix, pk) for pk in active_ids])
+        if len(entries) != len(active_ids):
+            invalidate_location_rollups()
+            return
+
+        fresh = _own_rollups([location.pk for location in locations])
+        changed = set()
+        for location in locations:
+            own, _ = entries[_entry_key(prefix, location.pk)]
+            new = fresh.get(location.pk, _zero())
+            delta = [new_value - old_value for new_value, old_value in zip(new, own)]
+            if not any(delta):
+                continue
+
+            entries[_entry_key(prefix, location.pk)][0] = new
+            for node in location.path_ids:
+                if node in active_ids:
+                    _add(entries[_entry_key(prefix, node)][1], delta)
+                    changed.add(_entry_key(prefix, node))
+
+        if changed:
+            cache.set_many({key: entries[key] for key in changed}, ROLLUP_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+
+
+def serialize_rollup(values):
+    return dict(zip(ROLLUP_FIELDS, values))
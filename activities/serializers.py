@@ -1,10 +1,14 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from maintenance_api.fieldsets import SparseFieldsMixin
 from .models import (
     ActivityType, StandardQuestion, MaintenanceActivity,
     PartUsage, ActivityPhoto, ActivityAnswer
 )
 from parts.serializers import PartListSerializer
+from locations.models import Location
 from locations.serializers import LocationListSerializer
+from authentication.models import User
 from authentication.serializers import UserProfileSerializer
 
 
@@ -37,9 +41,24 @@ class ActivityTypeSerializer(serializers.ModelSerializer):
         ]
     
     def get_activities_count(self, obj):
+        # Usa a anotação da listagem quando presente
+        if hasattr(obj, 'activities_count'):
+            return obj.activities_count
         return obj.maintenanceactivity_set.count()
 
 
+class ActivityTypeDetailsSerializer(ActivityTypeSerializer):
+    """
+    Serializer do tipo de atividade embutido no detalhe da atividade
+    (sem ``activities_count``, que contaria todas as atividades do tipo)
+    """
+    class Meta(ActivityTypeSerializer.Meta):
+        fields = [
+            field for field in ActivityTypeSerializer.Meta.fields
+            if field != 'activities_count'
+        ]
+
+
 class ActivityPhotoSerializer(serializers.ModelSerializer):
     """
     Serializer para fotos das atividades
@@ -91,12 +110,12 @@ class ActivityAnswerSerializer(serializers.ModelSerializer):
         ]
 
 
-class MaintenanceActivitySerializer(serializers.ModelSerializer):
+class MaintenanceActivitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer completo para atividades de manutenção
     """
     technician_details = UserProfileSerializer(source='technician', read_only=True)
-    activity_type_details = ActivityTypeSerializer(source='activity_type', read_only=True)
+    activity_type_details = ActivityTypeDetailsSerializer(source='activity_type', read_only=True)
     location_details = LocationListSerializer(source='location', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     priority_display = serializers.CharField(source='get_priority_display', read_only=True)
@@ -113,11 +132,31 @@ class MaintenanceActivitySerializer(serializers.ModelSerializer):
             'location', 'location_details', 'title', 'description', 'status', 'status_display',
             'priority', 'priority_display', 'scheduled_date', 'started_at', 'completed_at',
             'estimated_duration', 'actual_duration', 'observations', 'parts_used', 'photos',
-            'answers', 'created_at', 'updated_at'
+            'answers', 'version', 'created_at', 'updated_at'
         ]
+        read_only_fields = ['version']
+        # Campos que leem outras tabelas e a consulta que cada um precisa
+        expandable_fields = {
+            'technician_details': lambda queryset: queryset.select_related('technician'),
+            'activity_type_details': lambda queryset: queryset.select_related(
+                'activity_type'
+            ).prefetch_related(
+                Prefetch('activity_type__questions', queryset=StandardQuestion.objects.order_by('order'))
+            ),
+            'location_details': lambda queryset: queryset.select_related('location'),
+            'parts_used': lambda queryset: queryset.prefetch_related(
+                Prefetch('parts_used', queryset=PartUsage.objects.select_related('part__category'))
+            ),
+            'photos': lambda queryset: queryset.prefetch_related(
+                Prefetch('photos', queryset=ActivityPhoto.objects.order_by('taken_at'))
+            ),
+            'answers': lambda queryset: queryset.prefetch_related(
+                Prefetch('answers', queryset=ActivityAnswer.objects.select_related('question'))
+            ),
+        }
 
 
-class MaintenanceActivityListSerializer(serializers.ModelSerializer):
+class MaintenanceActivityListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer simplificado para listagem
     """
@@ -134,6 +173,11 @@ class MaintenanceActivityListSerializer(serializers.ModelSerializer):
             'status', 'status_display', 'priority', 'priority_display',
             'scheduled_date', 'created_at'
         ]
+        expandable_fields = {
+            'technician_name': lambda queryset: queryset.select_related('technician'),
+            'activity_type_name': lambda queryset: queryset.select_related('activity_type'),
+            'location_name': lambda queryset: queryset.select_related('location'),
+        }
 
 
 class MaintenanceActivityCreateSerializer(serializers.ModelSerializer):
@@ -153,6 +197,112 @@ class MaintenanceActivityCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class BulkActivityItemSerializer(serializers.Serializer):
+    """
+    Serializer de um item da criação em lote
+
+    As referências são apenas IDs: a existência é conferida para o lote
+    inteiro de uma vez.
+    """
+    activity_type = serializers.IntegerField()
+    location = serializers.IntegerField()
+    technician = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField()
+    priority = serializers.ChoiceField(
+        choices=MaintenanceActivity.PRIORITY_CHOICES, default='medium'
+    )
+    scheduled_date = serializers.DateTimeField(required=False, allow_null=True)
+    estimated_duration = serializers.DurationField(required=False, allow_null=True)
+
+
+class BulkActivityCreateSerializer(serializers.Serializer):
+    """
+    Serializer para criação de atividades em lote
+    """
+    activities = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class BulkActivityUpdateSerializer(serializers.Serializer):
+    """
+    Serializer para reatribuir, repriorizar ou cancelar atividades em lote
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=1000
+    )
+    action = serializers.ChoiceField(choices=['reassign', 'reprioritize', 'cancel'])
+    technician = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(is_active=True),
+        required=False
+    )
+    priority = serializers.ChoiceField(
+        choices=MaintenanceActivity.PRIORITY_CHOICES, required=False
+    )
+    
+    def validate(self, attrs):
+        if attrs['action'] == 'reassign' and 'technician' not in attrs:
+            raise serializers.ValidationError({'technician': 'Obrigatório para reatribuir.'})
+        if attrs['action'] == 'reprioritize' and 'priority' not in attrs:
+            raise serializers.ValidationError({'priority': 'Obrigatório para repriorizar.'})
+        return attrs
+
+
+class SyncActivitySerializer(serializers.ModelSerializer):
+    """
+    Serializer plano da atividade para a sincronização (apenas ids nas relações)
+    """
+    class Meta:
+        model = MaintenanceActivity
+        fields = [
+            'id', 'technician', 'activity_type', 'location', 'plan', 'title',
+            'description', 'status', 'priority', 'scheduled_date', 'started_at',
+            'completed_at', 'estimated_duration', 'actual_duration',
+            'observations', 'version', 'created_at', 'updated_at'
+        ]
+
+
+class SyncLocationSerializer(serializers.ModelSerializer):
+    """
+    Serializer plano do local para a sincronização
+    """
+    class Meta:
+        model = Location
+        fields = [
+            'id', 'name', 'code', 'location_type', 'parent', 'description',
+            'is_active', 'updated_at'
+        ]
+
+
+class SyncActivityTypeSerializer(serializers.ModelSerializer):
+    """
+    Serializer plano do tipo de atividade para a sincronização
+    """
+    class Meta:
+        model = ActivityType
+        fields = [
+            'id', 'name', 'description', 'estimated_time', 'requires_parts',
+            'is_active', 'updated_at'
+        ]
+
+
+class SyncStandardQuestionSerializer(serializers.ModelSerializer):
+    """
+    Serializer plano da pergunta padrão para a sincronização
+    """
+    class Meta:
+        model = StandardQuestion
+        fields = [
+            'id', 'activity_type', 'question', 'question_type', 'choices',
+            'is_required', 'order', 'updated_at'
+        ]
+
+
 class ActivityStartSerializer(serializers.Serializer):
     """
     Serializer para iniciar uma atividade
@@ -179,16 +329,58 @@ class ActivityCompleteSerializer(serializers.Serializer):
         for answer in value:
             if 'question_id' not in answer:
                 raise serializers.ValidationError("question_id é obrigatório para cada resposta.")
+            answer['question_id'] = self._to_id(answer['question_id'], 'question_id')
         return value
     
     def validate_parts_used(self, value):
         """Valida as peças utilizadas"""
+        part_ids = set()
         for part_usage in value:
             if 'part_id' not in part_usage or 'quantity_used' not in part_usage:
                 raise serializers.ValidationError(
                     "part_id e quantity_used são obrigatórios para cada peça."
                 )
+            part_usage['part_id'] = self._to_id(part_usage['part_id'], 'part_id')
+            if part_usage['part_id'] in part_ids:
+                raise serializers.ValidationError(
+                    f"Peça {part_usage['part_id']} informada mais de uma vez."
+                )
+            part_ids.add(part_usage['part_id'])
+            
+            # Quantidade e custo como Decimal, como nos campos de PartUsage
+            quantity = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+            part_usage['quantity_used'] = quantity.run_validation(part_usage['quantity_used'])
+            if part_usage.get('unit_cost') is not None:
+                cost = serializers.DecimalField(max_digits=10, decimal_places=2)
+                part_usage['unit_cost'] = cost.run_validation(part_usage['unit_cost'])
         return value
+    
+    def _to_id(self, value, field):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(f"{field} inválido: {value}.")
+
+
+class JournalActionSerializer(serializers.Serializer):
+    """
+    Ação registrada offline no aplicativo
+    """
+    id = serializers.CharField(required=False, max_length=100)
+    type = serializers.ChoiceField(choices=['start', 'complete', 'cancel', 'answer', 'photo'])
+    activity = serializers.IntegerField()
+    data = serializers.DictField(required=False, default=dict)
+
+
+class JournalSerializer(serializers.Serializer):
+    """
+    Serializer para o diário de ações offline, na ordem em que foram feitas
+    """
+    actions = serializers.ListField(
+        child=JournalActionSerializer(),
+        allow_empty=False,
+        max_length=500
+    )
 
 
 class PhotoUploadSerializer(serializers.ModelSerializer):
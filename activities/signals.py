@@ -0,0 +1,93 @@
+"""
+Sinais das atividades de manutenção
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from locations.models import Location
+from .caching import bump_activities_version, bump_catalog_version
+from .counters import apply_counter_change, load_counter_fields
+from .models import ActivityType, MaintenanceActivity, PartUsage, StandardQuestion
+from .rollups import refresh_location_rollups
+from .sync import record_reassignments, record_tombstones
+
+
+@receiver(post_save, sender=MaintenanceActivity)
+@receiver(post_delete, sender=MaintenanceActivity)
+def activity_changed(sender, instance, **kwargs):
+    bump_activities_version()
+    location_ids = {instance.location_id, getattr(instance, '_loaded_location_id', None)}
+    location_ids.discard(None)
+    transaction.on_commit(lambda: refresh_location_rollups(location_ids))
+
+    # A contagem por tipo do catálogo só muda ao criar, excluir ou trocar o tipo
+    # (na criação ainda não há tipo carregado)
+    loaded_type_id = getattr(instance, '_loaded_activity_type_id', None)
+    if kwargs['signal'] is post_delete or instance.activity_type_id != loaded_type_id:
+        bump_catalog_version()
+    instance._loaded_activity_type_id = instance.activity_type_id
+
+
+@receiver(post_save, sender=ActivityType)
+@receiver(post_delete, sender=ActivityType)
+@receiver(post_save, sender=StandardQuestion)
+@receiver(post_delete, sender=StandardQuestion)
+def catalog_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(pre_save, sender=MaintenanceActivity)
+@receiver(pre_delete, sender=MaintenanceActivity)
+def remember_counter_fields(sender, instance, **kwargs):
+    # A diferença parte da linha no banco, travada até o commit: instâncias
+    # desatualizadas ou transições concorrentes não desviam os contadores
+    if not instance._state.adding:
+        instance._loaded_counter_fields = load_counter_fields(instance.pk, lock=True)
+
+
+@receiver(post_save, sender=MaintenanceActivity)
+def update_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    # Gravação parcial: os campos não gravados valem o que está no banco
+    fields = instance.counter_fields() if update_fields is None else None
+    fields = fields or load_counter_fields(instance.pk)
+    old_fields = None if created else getattr(instance, '_loaded_counter_fields', None)
+    apply_counter_change(old_fields, fields)
+    # Reatribuída: para o técnico anterior a atividade deixa de existir
+    if old_fields:
+        record_reassignments([(instance.pk, old_fields[0], fields[0])])
+    instance._loaded_counter_fields = fields
+
+
+@receiver(post_delete, sender=MaintenanceActivity)
+def update_counters_on_delete(sender, instance, **kwargs):
+    fields = getattr(instance, '_loaded_counter_fields', None) or instance.counter_fields()
+    apply_counter_change(fields, None)
+
+
+@receiver(post_delete, sender=MaintenanceActivity)
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=ActivityType)
+@receiver(post_delete, sender=StandardQuestion)
+def record_sync_tombstone(sender, instance, **kwargs):
+    model = {
+        MaintenanceActivity: 'activity',
+        Location: 'location',
+        ActivityType: 'activity_type',
+        StandardQuestion: 'question',
+    }[sender]
+    record_tombstones(model, [(instance.pk, getattr(instance, 'technician_id', None))])
+
+
+@receiver(post_save, sender=PartUsage)
+@receiver(post_delete, sender=PartUsage)
+def part_usage_changed(sender, instance, **kwargs):
+    activity_id = instance.activity_id
+
+    def refresh():
+        location_ids = MaintenanceActivity.objects.filter(
+            pk=activity_id
+        ).values_list('location_id', flat=True)
+        refresh_location_rollups(set(location_ids))
+
+    transaction.on_commit(refresh)
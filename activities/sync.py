@@ -0,0 +1,189 @@
+"""
+Sincronização incremental para o aplicativo offline
+
+O cliente guarda o ``token`` devolvido a cada sincronização e o envia na
+próxima: a resposta traz só as atividades, locais, tipos de atividade e
+perguntas criados ou alterados desde então (varredura pelos índices em
+``updated_at``) e os ids excluídos, registrados em ``SyncTombstone``.
+
+O token é assinado pelo servidor e guarda o instante de início da consulta
+anterior. A janela é recuada em ``SYNC_OVERLAP`` para cobrir transações que
+gravaram antes desse instante mas confirmaram depois (gravações em massa
+confirmam em lotes bem mais curtos); linhas repetidas são inofensivas, pois
+o cliente aplica tudo como upsert por id.
+
+Cada resposta traz no máximo ``SYNC_PAGE_SIZE`` linhas por modelo. Com
+``has_more`` o token devolvido é a continuação da mesma sincronização
+(cursor por modelo, em ``id`` na completa e em ``(updated_at, id)`` na
+incremental) e o cliente pede a página seguinte com ele, aplicando as
+páginas em ordem; as exclusões vêm só na primeira página.
+"""
+from datetime import datetime, timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from locations.models import Location
+from .models import ActivityType, MaintenanceActivity, StandardQuestion, SyncTombstone
+
+
+SYNC_TOKEN_SALT = 'activities.sync'
+SYNC_OVERLAP = timedelta(seconds=60)
+SYNC_PAGE_SIZE = 500
+# Exclusões mais antigas são removidas; tokens anteriores exigem sincronização completa
+SYNC_TOMBSTONE_RETENTION = timedelta(days=90)
+
+
+TOMBSTONE_KEYS = {
+    'activity': 'activities',
+    'location': 'locations',
+    'activity_type': 'activity_types',
+    'question': 'questions',
+}
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+def make_sync_token(user, issued_at, since=None, cursors=None):
+    """
+    Token da próxima requisição
+
+    Com ``cursors`` é a continuação da sincronização em curso, que começou
+    em ``issued_at`` com a janela ``since`` (``None`` na completa).
+    """
+    data = {'t': issued_at.isoformat(), 'u': user.pk}
+    if cursors:
+        data['s'] = since.isoformat() if since else None
+        data['c'] = cursors
+    return signing.dumps(data, salt=SYNC_TOKEN_SALT)
+
+
+def read_sync_token(token, user):
+    """
+    Valida assinatura e usuário do token
+
+    Retorna ``(since, issued_at, cursors)``: para um token final, o instante
+    guardado como ``since`` e os demais ``None``; para uma continuação, os
+    valores da sincronização em curso.
+    """
+    try:
+        data = signing.loads(token, salt=SYNC_TOKEN_SALT)
+        if data['u'] != user.pk:
+            raise ValueError
+        issued_at = datetime.fromisoformat(data['t'])
+        if 'c' not in data:
+            return issued_at, None, None
+        since = datetime.fromisoformat(data['s']) if data['s'] else None
+        cursors = dict(data['c'])
+        if not set(cursors) <= set(TOMBSTONE_KEYS.values()):
+            raise ValueError
+        return since, issued_at, cursors
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidSyncToken('Token de sincronização inválido.')
+
+
+def record_tombstones(model, rows):
+    """Registra exclusões; ``rows`` são pares ``(object_id, owner_id)``"""
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(model=model, object_id=object_id, owner_id=owner_id)
+        for object_id, owner_id in rows
+    ])
+
+
+def record_reassignments(changes):
+    """
+    Registra, para o técnico anterior, as atividades reatribuídas
+
+    ``changes`` são tuplas ``(activity_id, técnico anterior, técnico novo)``.
+    """
+    record_tombstones('activity', [
+        (activity_id, old_technician_id)
+        for activity_id, old_technician_id, new_technician_id in changes
+        if old_technician_id is not None and old_technician_id != new_technician_id
+    ])
+
+
+def prune_tombstones(now=None):
+    """Remove as exclusões fora do período de retenção"""
+    limit = (now or timezone.now()) - SYNC_TOMBSTONE_RETENTION
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=limit).delete()
+    return deleted
+
+
+def visible_activities(user):
+    activities = MaintenanceActivity.objects.all()
+    if not (user.is_supervisor or user.is_staff):
+        activities = activities.filter(technician=user)
+    return activities
+
+
+def _page(queryset, since, cursor, page_size):
+    """Uma página do modelo a partir do cursor; retorna ``(linhas, próximo cursor)``"""
+    if since is None:
+        queryset = queryset.order_by('id')
+        if cursor is not None:
+            queryset = queryset.filter(id__gt=cursor)
+    else:
+        queryset = queryset.filter(updated_at__gt=since - SYNC_OVERLAP).order_by('updated_at', 'id')
+        if cursor is not None:
+            updated_at = datetime.fromisoformat(cursor[0])
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=cursor[1])
+            )
+
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    last = rows[page_size - 1]
+    return rows[:page_size], last.pk if since is None else [last.updated_at.isoformat(), last.pk]
+
+
+def collect_changes(user, since=None, cursors=None, page_size=None):
+    """
+    Uma página das linhas alteradas desde ``since`` e os ids excluídos
+
+    Sem ``since`` é uma sincronização completa: tudo o que é visível e
+    nenhuma exclusão. ``cursors`` (modelo -> cursor) continua uma
+    sincronização em curso; só os modelos presentes ainda têm páginas.
+    Retorna ``(linhas, excluídos, cursores)``, com cursores vazios na
+    última página.
+    """
+    querysets = {
+        'activities': visible_activities(user),
+        'locations': Location.objects.all(),
+        'activity_types': ActivityType.objects.all(),
+        'questions': StandardQuestion.objects.all(),
+    }
+    page_size = page_size or SYNC_PAGE_SIZE
+    first_page = cursors is None
+    if first_page:
+        cursors = {key: None for key in querysets}
+
+    changes = {key: [] for key in querysets}
+    next_cursors = {}
+    for key, cursor in cursors.items():
+        changes[key], next_cursor = _page(querysets[key], since, cursor, page_size)
+        if next_cursor is not None:
+            next_cursors[key] = next_cursor
+
+    deleted = {key: [] for key in querysets}
+    if since is None or not first_page:
+        return changes, deleted, next_cursors
+
+    tombstones = SyncTombstone.objects.filter(deleted_at__gt=since - SYNC_OVERLAP)
+    if not (user.is_supervisor or user.is_staff):
+        tombstones = tombstones.filter(~Q(model='activity') | Q(owner_id=user.pk))
+    deleted_ids = {key: set() for key in querysets}
+    for model, object_id in tombstones.order_by().values_list('model', 'object_id'):
+        deleted_ids[TOMBSTONE_KEYS[model]].add(object_id)
+
+    # Atividade reatribuída e devolvida ao técnico na mesma janela: vale a
+    # linha (nesta página ou, aplicada depois da exclusão, nas seguintes)
+    deleted = {
+        key: sorted(ids - {row.pk for row in changes[key]})
+        for key, ids in deleted_ids.items()
+    }
+    return changes, deleted, next_cursors
@@ -1,3 +1,1189 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+import csv
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from locations.models import Location
+from parts.models import PartCategory, Part
+from .counters import counter_totals, verify_counters
+from .idempotency import IDEMPOTENCY_LEASE, IDEMPOTENCY_TTL
+from .models import (
+    ActivityType, StandardQuestion, MaintenanceActivity,
+    PartUsage, ActivityPhoto, ActivityAnswer, MaintenancePlan, IdempotencyRecord
+)
+from .pagination import KeysetPagination
+from .pivot import render_answer_pivot
+from . import plans
+from .plans import generate_all_plans, generate_plan_activities, plan_occurrences
+from .sync import SYNC_OVERLAP, make_sync_token
+from .transitions import apply_transition
+from . import rollups
+from .rollups import compute_location_rollups, get_location_rollups, serialize_rollup
+
+
+class LocationRollupsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=self.plant
+        )
+        self.equipment = Location.objects.create(
+            name='Prensa', code='EQ01', location_type='equipment', parent=self.sector
+        )
+        category = PartCategory.objects.create(name='Teste', description='Categoria de teste')
+        self.part = Part.objects.create(
+            code='TEST001',
+            name='Peça de Teste',
+            category=category,
+            minimum_stock=10,
+            current_stock=20
+        )
+
+    def create_activity(self, location, **kwargs):
+        return MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=self.activity_type,
+            location=location,
+            title='Atividade',
+            description='Teste',
+            **kwargs
+        )
+
+    def test_rollups_accumulate_up_the_tree(self):
+        """Testa totais por subárvore com custo de peças"""
+        critical = self.create_activity(self.equipment, priority='critical')
+        PartUsage.objects.create(
+            activity=critical, part=self.part, quantity_used=2, unit_cost=Decimal('10.00')
+        )
+        self.create_activity(self.sector, status='in_progress')
+        self.create_activity(self.sector, status='completed')
+
+        with self.assertNumQueries(2):
+            totals = compute_location_rollups()['totals']
+
+        self.assertEqual(serialize_rollup(totals[self.equipment.pk]), {
+            'pending': 1, 'in_progress': 0, 'critical': 1, 'parts_cost': Decimal('20'),
+        })
+        self.assertEqual(serialize_rollup(totals[self.plant.pk]), {
+            'pending': 1, 'in_progress': 1, 'critical': 1, 'parts_cost': Decimal('20'),
+        })
+
+    def test_inactive_locations_excluded(self):
+        """Testa totais sem locais desativados"""
+        self.create_activity(self.equipment)
+        self.create_activity(self.sector)
+        self.equipment.set_subtree_active(False)
+
+        totals = compute_location_rollups()['totals']
+        self.assertNotIn(self.equipment.pk, totals)
+        self.assertEqual(totals[self.plant.pk][0], 1)
+
+    def test_refresh_per_location(self):
+        """Testa atualização incremental só das chaves do local e dos ancestrais"""
+        activity = self.create_activity(self.equipment)
+        ids = [self.plant.pk, self.sector.pk, self.equipment.pk]
+        get_location_rollups(ids)
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(rollups, 'compute_location_rollups') as compute:
+            self.create_activity(self.sector)
+        compute.assert_not_called()
+        self.assertEqual(get_location_rollups(ids), {
+            self.plant.pk: [2, 0, 0, 0], self.sector.pk: [2, 0, 0, 0], self.equipment.pk: [1, 0, 0, 0],
+        })
+
+        # Outra atualização segura o lock: os totais são descartados e recalculados
+        prefix = rollups._key_prefix()
+        cache.add(f"{prefix}:lock", True)
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.status = 'completed'
+            activity.save()
+        self.assertNotEqual(rollups._key_prefix(), prefix)
+        self.assertEqual(get_location_rollups(ids)[self.plant.pk][0], 1)
+        cache.delete(f"{prefix}:lock")
+
+
+class ActivityStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='supervisor',
+            password='testpass123',
+            employee_id='SUP001',
+            shift='morning',
+            is_supervisor=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.activity_type = ActivityType.objects.create(name='Corretiva')
+        self.location = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        for status_value, priority in [('pending', 'high'), ('pending', 'low'), ('completed', 'high')]:
+            self.create_activity(status=status_value, priority=priority)
+
+    def create_activity(self, **kwargs):
+        return MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=self.activity_type,
+            location=self.location,
+            title='Atividade',
+            description='Teste',
+            **kwargs
+        )
+
+    def test_stats_single_query_and_invalidation(self):
+        """Testa estatísticas em uma consulta, cache e invalidação"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/activities/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['general']['total'], 3)
+        self.assertEqual(response.data['general']['pending'], 2)
+        self.assertEqual(response.data['by_priority'], {'low': 1, 'high': 2})
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/activities/stats/')
+
+        self.create_activity(status='in_progress')
+        response = self.client.get('/api/activities/stats/')
+        self.assertEqual(response.data['general']['in_progress'], 1)
+
+
+class ActivityCounterTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.location = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+
+    def create_activity(self, **kwargs):
+        return MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=self.activity_type,
+            location=self.location,
+            title='Atividade',
+            description='Teste',
+            **kwargs
+        )
+
+    def test_counters_follow_lifecycle(self):
+        """Testa contadores em criação, transições e exclusão"""
+        activity = self.create_activity(priority='high')
+        other = self.create_activity()
+
+        activity = MaintenanceActivity.objects.get(pk=activity.pk)
+        activity.status = 'in_progress'
+        activity.save()
+        activity.status = 'completed'
+        activity.completed_at = timezone.now()
+        activity.save()
+        MaintenanceActivity.objects.get(pk=other.pk).delete()
+
+        counts = counter_totals(self.user.id)
+        self.assertEqual(counts['total'], 1)
+        self.assertEqual(counts['completed'], 1)
+        self.assertEqual(counts['pending'], 0)
+        self.assertEqual(counts['priority_high'], 1)
+        self.assertEqual(counts['completed_this_month'], 1)
+        self.assertEqual(verify_counters(), [])
+
+    def test_stale_saves_keep_counters(self):
+        """Testa gravações de instâncias desatualizadas após transição concorrente"""
+        activity = self.create_activity()
+        stale = MaintenanceActivity.objects.get(pk=activity.pk)
+        self.assertTrue(apply_transition(MaintenanceActivity.objects.get(pk=activity.pk), 'start'))
+
+        # Mesmo objeto desatualizado gravado duas vezes (PATCH sem version)
+        stale.priority = 'high'
+        stale.save()
+        stale.save()
+        self.assertEqual(verify_counters(), [])
+
+        # Gravação parcial e exclusão de instância desatualizada
+        stale = MaintenanceActivity.objects.get(pk=activity.pk)
+        self.assertTrue(apply_transition(MaintenanceActivity.objects.get(pk=activity.pk), 'start'))
+        stale.title = 'Renomeada'
+        stale.save(update_fields=['title'])
+        self.assertEqual(verify_counters(), [])
+        self.assertEqual(counter_totals(self.user.id)['in_progress'], 1)
+        stale.delete()
+        self.assertEqual(counter_totals(self.user.id)['total'], 0)
+
+    def test_rebuild_fixes_drift(self):
+        """Testa reconstrução após atualização em massa sem sinais"""
+        self.create_activity()
+        MaintenanceActivity.objects.update(status='cancelled')
+        self.assertEqual(len(verify_counters()), 2)
+
+        call_command('rebuild_activity_counters', stdout=StringIO())
+        self.assertEqual(verify_counters(), [])
+        self.assertEqual(counter_totals(self.user.id)['cancelled'], 1)
+
+
+class ActivityCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='supervisor',
+            password='testpass123',
+            employee_id='SUP001',
+            shift='morning',
+            is_supervisor=True
+        )
+        self.client.force_authenticate(user=self.user)
+        activity_type = ActivityType.objects.create(name='Corretiva')
+        location = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        for index in range(7):
+            MaintenanceActivity.objects.create(
+                technician=self.user,
+                activity_type=activity_type,
+                location=location,
+                title=f'Atividade {index}',
+                description='Teste',
+                scheduled_date=timezone.now() if index % 2 else None
+            )
+        # Empates em created_at: o id desempata
+        MaintenanceActivity.objects.filter(id__lte=4).update(created_at=timezone.now())
+
+    def walk(self, url):
+        ids = []
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def expected_ids(self, ordering):
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        rows = MaintenanceActivity.objects.values_list('id', field)
+        present = sorted(
+            [row for row in rows if row[1] is not None],
+            key=lambda row: (row[1], row[0]), reverse=descending
+        )
+        nulls = sorted([row for row in rows if row[1] is None], reverse=descending)
+        # Nulos como maiores valores: no fim da ordem crescente, no início da decrescente
+        return [row[0] for row in (nulls + present if descending else present + nulls)]
+
+    @mock.patch.object(KeysetPagination, 'page_size', 3)
+    def test_cursor_walks_all_orderings(self):
+        """Testa cursores estáveis por (campo, id), inclusive com nulos"""
+        for ordering in ['-created_at', 'created_at', 'scheduled_date', '-scheduled_date', 'priority']:
+            ids, pages = self.walk(f'/api/activities/?pagination=cursor&ordering={ordering}')
+            self.assertEqual(ids, self.expected_ids(ordering), ordering)
+
+            # Voltando da última página chega na anterior
+            response = self.client.get(pages[-1]['previous'])
+            self.assertEqual(response.data['results'], pages[-2]['results'])
+
+    def test_page_number_mode_keeps_count(self):
+        """Testa que a paginação por página continua com total"""
+        response = self.client.get('/api/activities/')
+        self.assertEqual(response.data['count'], 7)
+
+    def test_invalid_cursor(self):
+        """Testa cursor inválido ou de outra ordenação"""
+        self.assertEqual(self.client.get('/api/activities/?cursor=abc').status_code, 404)
+
+
+class ActivityFilterTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='supervisor',
+            password='testpass123',
+            employee_id='SUP001',
+            shift='morning',
+            is_supervisor=True
+        )
+        self.other = User.objects.create_user(
+            username='tecnico',
+            password='testpass123',
+            employee_id='TEC001',
+            shift='night'
+        )
+        self.client.force_authenticate(user=self.user)
+        activity_type = ActivityType.objects.create(name='Corretiva')
+        plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=plant
+        )
+        line = Location.objects.create(name='Linha 1', code='LN01', location_type='line', parent=self.sector)
+        sibling = Location.objects.create(name='Setor B', code='SB01', location_type='sector', parent=plant)
+
+        def create(location, technician, status_value='pending'):
+            return MaintenanceActivity.objects.create(
+                technician=technician, activity_type=activity_type, location=location,
+                title=location.code, description='Teste', status=status_value
+            )
+        self.in_sector = create(self.sector, self.user)
+        self.in_line = create(line, self.other)
+        self.in_line_done = create(line, self.user, 'completed')
+        create(sibling, self.user)
+        create(plant, self.user)
+
+    def list_ids(self, **params):
+        response = self.client.get('/api/activities/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item['id'] for item in response.data['results'])
+
+    def test_location_subtree(self):
+        """Testa subárvore com descendentes, sem irmãos nem ancestrais"""
+        self.assertEqual(
+            self.list_ids(location_subtree=self.sector.pk),
+            [self.in_sector.pk, self.in_line.pk, self.in_line_done.pk]
+        )
+
+    def test_location_subtree_with_other_filters(self):
+        """Testa subárvore combinada com status e técnico"""
+        self.assertEqual(
+            self.list_ids(location_subtree=self.sector.pk, status='pending'),
+            [self.in_sector.pk, self.in_line.pk]
+        )
+        self.assertEqual(
+            self.list_ids(location_subtree=self.sector.pk, status='pending', technician=self.other.pk),
+            [self.in_line.pk]
+        )
+
+    def test_unknown_location_subtree(self):
+        """Testa local inexistente ou id não numérico com lista vazia"""
+        self.assertEqual(self.list_ids(location_subtree=999999), [])
+        self.assertEqual(self.list_ids(location_subtree='abc'), [])
+
+
+class ActivityDetailQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        activity_type = ActivityType.objects.create(name='Preventiva')
+        plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        equipment = Location.objects.create(
+            name='Prensa', code='EQ01', location_type='equipment', parent=plant
+        )
+        self.activity = MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=activity_type,
+            location=equipment,
+            title='Atividade',
+            description='Teste'
+        )
+        category = PartCategory.objects.create(name='Teste', description='Categoria de teste')
+        for index in range(3):
+            question = StandardQuestion.objects.create(
+                activity_type=activity_type, question=f'Pergunta {index}', question_type='text', order=index
+            )
+            ActivityAnswer.objects.create(activity=self.activity, question=question, answer_text='Ok')
+            part = Part.objects.create(
+                code=f'P{index}', name=f'Peça {index}', category=category,
+                minimum_stock=1, current_stock=10
+            )
+            PartUsage.objects.create(activity=self.activity, part=part, quantity_used=1)
+            ActivityPhoto.objects.create(
+                activity=self.activity, photo=f'activity_photos/{index}.jpg', photo_type='before'
+            )
+
+    def test_detail_query_budget(self):
+        """Testa o detalhe com número fixo de consultas"""
+        # Atividade com relacionados, perguntas, peças, fotos, respostas e caminho do local
+        with self.assertNumQueries(6):
+            response = self.client.get(f'/api/activities/{self.activity.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['activity_type_details']['questions']), 3)
+        self.assertNotIn('activities_count', response.data['activity_type_details'])
+        self.assertEqual(len(response.data['parts_used']), 3)
+        self.assertEqual(len(response.data['answers']), 3)
+        self.assertEqual(response.data['location_details']['full_path'], 'Planta > Prensa')
+
+    def test_sparse_fields_skip_prefetches(self):
+        """Testa ?fields= e ?expand= sem joins ou prefetches dos campos omitidos"""
+        url = f'/api/activities/{self.activity.pk}/'
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'title,status,technician_details'})
+        self.assertEqual(set(response.data), {'id', 'title', 'status', 'technician_details'})
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'expand': 'photos'})
+        self.assertIn('photos', response.data)
+        self.assertIn('observations', response.data)
+        self.assertNotIn('technician_details', response.data)
+        self.assertNotIn('answers', response.data)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/activities/', {'fields': 'title,location_name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'location_name'})
+
+
+class ActivityTypeCatalogTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.location = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        for name in ('Corretiva', 'Preventiva', 'Preditiva'):
+            activity_type = ActivityType.objects.create(name=name)
+            for index in range(2):
+                StandardQuestion.objects.create(
+                    activity_type=activity_type, question=f'Pergunta {index}',
+                    question_type='yes_no', order=index
+                )
+        self.activity_type = ActivityType.objects.get(name='Corretiva')
+
+    def get_catalog(self):
+        response = self.client.get('/api/activities/types/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item['name']: item for item in response.data['results']}
+
+    def test_catalog_queries_and_invalidation(self):
+        """Testa catálogo com consultas fixas, cache e invalidação"""
+        # Tipos anotados e perguntas; a paginação é feita sobre a lista em cache
+        with self.assertNumQueries(2):
+            catalog = self.get_catalog()
+        self.assertEqual(len(catalog['Corretiva']['questions']), 2)
+        self.assertEqual(catalog['Corretiva']['activities_count'], 0)
+
+        with self.assertNumQueries(0):
+            self.get_catalog()
+            # Parâmetros ignorados pela view não criam outra entrada no cache
+            response = self.client.get('/api/activities/types/', {'_': '123', 'x': '1'})
+        self.assertEqual(response.data['count'], len(catalog))
+
+        MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=self.activity_type,
+            location=self.location,
+            title='Atividade',
+            description='Teste'
+        )
+        self.assertEqual(self.get_catalog()['Corretiva']['activities_count'], 1)
+
+        StandardQuestion.objects.create(
+            activity_type=self.activity_type, question='Nova', question_type='text', order=2
+        )
+        self.assertEqual(len(self.get_catalog()['Corretiva']['questions']), 3)
+
+
+class CompleteActivityTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.location = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        category = PartCategory.objects.create(name='Teste', description='Categoria de teste')
+        self.questions = [
+            StandardQuestion.objects.create(
+                activity_type=self.activity_type, question=f'Pergunta {index}',
+                question_type='text', order=index
+            )
+            for index in range(3)
+        ]
+        self.parts = [
+            Part.objects.create(
+                code=f'P{index}', name=f'Peça {index}', category=category,
+                minimum_stock=1, current_stock=10
+            )
+            for index in range(3)
+        ]
+
+    def start_activity(self):
+        return MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=self.activity_type,
+            location=self.location,
+            title='Atividade',
+            description='Teste',
+            status='in_progress',
+            started_at=timezone.now()
+        )
+
+    def complete(self, count):
+        activity = self.start_activity()
+        payload = {
+            'answers': [
+                {'question_id': question.pk, 'answer_text': 'Ok'}
+                for question in self.questions[:count]
+            ],
+            'parts_used': [
+                {'part_id': part.pk, 'quantity_used': '2.5', 'unit_cost': '10.00'}
+                for part in self.parts[:count]
+            ],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/activities/{activity.pk}/complete/', payload, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return activity, len(queries)
+
+    def test_complete_is_batched(self):
+        """Testa finalização com consultas constantes e baixa de estoque"""
+        self.complete(1)  # Cria a linha de contadores das concluídas
+        _, single = self.complete(1)
+        activity, many = self.complete(3)
+        self.assertEqual(single, many)
+
+        self.assertEqual(activity.answers.count(), 3)
+        self.assertEqual(activity.parts_used.count(), 3)
+        self.parts[0].refresh_from_db()
+        self.parts[2].refresh_from_db()
+        self.assertEqual(self.parts[0].current_stock, Decimal('2.5'))
+        self.assertEqual(self.parts[2].current_stock, Decimal('7.5'))
+
+    def test_complete_rejects_unknown_part(self):
+        """Testa que peça inexistente não grava nada"""
+        activity = self.start_activity()
+        response = self.client.post(f'/api/activities/{activity.pk}/complete/', {
+            'answers': [{'question_id': self.questions[0].pk, 'answer_text': 'Ok'}],
+            'parts_used': [{'part_id': 9999, 'quantity_used': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        activity.refresh_from_db()
+        self.assertEqual(activity.status, 'in_progress')
+        self.assertFalse(activity.answers.exists())
+
+
+class ActivityTransitionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.activity = MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=ActivityType.objects.create(name='Preventiva'),
+            location=Location.objects.create(name='Planta', code='PL01', location_type='plant'),
+            title='Atividade',
+            description='Teste'
+        )
+
+    def test_concurrent_start_only_one_wins(self):
+        """Testa que apenas um de dois dispositivos inicia a atividade"""
+        first = MaintenanceActivity.objects.get(pk=self.activity.pk)
+        second = MaintenanceActivity.objects.get(pk=self.activity.pk)
+
+        self.assertTrue(apply_transition(first, 'start'))
+        self.assertFalse(apply_transition(second, 'start'))
+
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.status, 'in_progress')
+        self.assertEqual(self.activity.version, first.version)
+        self.assertEqual(verify_counters(), [])
+
+    def test_cancel_endpoint(self):
+        """Testa cancelamento e conflito de status"""
+        response = self.client.post(f'/api/activities/{self.activity.pk}/cancel/', {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['activity']['status'], 'cancelled')
+
+        response = self.client.post(f'/api/activities/{self.activity.pk}/start/', {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(counter_totals(self.user.id)['cancelled'], 1)
+
+    def test_patch_with_stale_version(self):
+        """Testa PATCH com versão desatualizada"""
+        url = f'/api/activities/{self.activity.pk}/'
+        version = self.client.get(url).data['version']
+
+        response = self.client.patch(url, {'title': 'Nova', 'version': version}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], version + 1)
+
+        response = self.client.patch(url, {'title': 'Antiga', 'version': version}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.title, 'Nova')
+
+
+class BulkActivityTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.supervisor = User.objects.create_user(
+            username='supervisor',
+            password='testpass123',
+            employee_id='SUP001',
+            shift='morning',
+            is_supervisor=True
+        )
+        self.technician = User.objects.create_user(
+            username='tecnico',
+            password='testpass123',
+            employee_id='TEC001',
+            shift='night'
+        )
+        self.client.force_authenticate(user=self.supervisor)
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.locations = [
+            Location.objects.create(name=f'Máquina {index}', code=f'M{index}', location_type='equipment')
+            for index in range(5)
+        ]
+
+    def bulk_create(self, count):
+        items = [
+            {
+                'activity_type': self.activity_type.pk,
+                'location': self.locations[index % 5].pk,
+                'technician': self.technician.pk,
+                'title': f'Preventiva {index}',
+                'description': 'Plano semanal',
+                'priority': 'low',
+            }
+            for index in range(count)
+        ]
+        return self.client.post('/api/activities/bulk/', {'activities': items}, format='json')
+
+    def test_bulk_create_reports_per_item(self):
+        """Testa criação em lote com erros por item e consultas constantes"""
+        self.bulk_create(1)  # Cria a linha de contadores do técnico
+        with CaptureQueriesContext(connection) as single:
+            self.bulk_create(1)
+        with CaptureQueriesContext(connection) as many:
+            self.bulk_create(20)
+        self.assertEqual(len(single), len(many))
+
+        response = self.client.post('/api/activities/bulk/', {'activities': [
+            {'activity_type': self.activity_type.pk, 'location': self.locations[0].pk,
+             'title': 'Ok', 'description': 'Ok'},
+            {'activity_type': 9999, 'location': self.locations[0].pk,
+             'title': 'Tipo inválido', 'description': 'Erro'},
+            {'location': self.locations[0].pk, 'description': 'Sem título'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertIn('id', response.data['results'][0])
+        self.assertIn('activity_type', response.data['results'][1]['errors'])
+        self.assertIn('title', response.data['results'][2]['errors'])
+        self.assertEqual(
+            MaintenanceActivity.objects.get(pk=response.data['results'][0]['id']).technician,
+            self.supervisor
+        )
+        self.assertEqual(verify_counters(), [])
+
+    def test_bulk_update(self):
+        """Testa reatribuição e cancelamento em lote apenas de atividades em aberto"""
+        ids = [result['id'] for result in self.bulk_create(4).data['results']]
+        MaintenanceActivity.objects.filter(pk=ids[0]).update(status='completed')
+        call_command('rebuild_activity_counters', stdout=StringIO())
+
+        response = self.client.post('/api/activities/bulk-update/', {
+            'ids': ids + [9999], 'action': 'reassign', 'technician': self.supervisor.pk
+        }, format='json')
+        self.assertEqual(response.data, {'updated': ids[1:], 'skipped': [ids[0], 9999]})
+
+        response = self.client.post('/api/activities/bulk-update/', {
+            'ids': ids, 'action': 'cancel'
+        }, format='json')
+        self.assertEqual(response.data['updated'], ids[1:])
+        self.assertEqual(
+            MaintenanceActivity.objects.filter(technician=self.supervisor, status='cancelled').count(), 3
+        )
+        self.assertEqual(verify_counters(), [])
+
+    def test_bulk_requires_supervisor(self):
+        """Testa que técnicos não usam as operações em lote"""
+        self.client.force_authenticate(user=self.technician)
+        response = self.bulk_create(1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class MaintenancePlanTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=self.plant
+        )
+        for index in range(3):
+            Location.objects.create(
+                name=f'Prensa {index}', code=f'EQ{index}', location_type='equipment', parent=self.sector
+            )
+        self.plan = MaintenancePlan.objects.create(
+            name='Lubrificação semanal',
+            activity_type=self.activity_type,
+            location=self.plant,
+            location_type='equipment',
+            technician=self.user,
+            interval_count=1,
+            interval_unit='week',
+            start_date=timezone.now() + timedelta(hours=1)
+        )
+
+    def test_generation_is_idempotent(self):
+        """Testa geração das ocorrências apenas uma vez por local e data"""
+        out = StringIO()
+        call_command('generate_maintenance_plans', days=28, stdout=out)
+        # 4 semanas x 3 equipamentos
+        self.assertEqual(MaintenanceActivity.objects.filter(plan=self.plan).count(), 12)
+
+        self.assertEqual(generate_all_plans(horizon_days=28)[0][1:], (12, 0))
+        self.assertEqual(generate_all_plans(horizon_days=35)[0][1:], (15, 3))
+        self.assertEqual(counter_totals(self.user.id)['pending'], 15)
+        self.assertEqual(verify_counters(), [])
+
+    def test_generation_in_batches(self):
+        """Testa geração em lotes com transação própria por lote"""
+        start = timezone.now()
+        with mock.patch('activities.plans._create_batch', wraps=plans._create_batch) as create_batch:
+            result = generate_plan_activities(self.plan, start, start + timedelta(days=28), batch_size=5)
+        self.assertEqual(result, (12, 12))
+        self.assertEqual(create_batch.call_count, 3)
+        self.assertEqual(counter_totals(self.user.id)['pending'], 12)
+        self.assertEqual(verify_counters(), [])
+
+    def test_monthly_occurrences_keep_day(self):
+        """Testa recorrência mensal sem deriva do dia"""
+        self.plan.interval_unit = 'month'
+        self.plan.start_date = timezone.make_aware(datetime(2026, 1, 31, 8, 0))
+        occurrences = plan_occurrences(
+            self.plan,
+            timezone.make_aware(datetime(2026, 2, 1)),
+            timezone.make_aware(datetime(2026, 5, 31, 23, 59))
+        )
+        self.assertEqual([value.day for value in occurrences], [28, 31, 30, 31])
+
+
+class SyncTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.supervisor = User.objects.create_user(
+            username='supervisor',
+            password='testpass123',
+            employee_id='SUP001',
+            shift='morning',
+            is_supervisor=True
+        )
+        self.technician = User.objects.create_user(
+            username='tecnico',
+            password='testpass123',
+            employee_id='TEC001',
+            shift='night'
+        )
+        self.client.force_authenticate(user=self.technician)
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.question = StandardQuestion.objects.create(
+            activity_type=self.activity_type, question='Ok?', question_type='yes_no'
+        )
+        self.location = Location.objects.create(name='Prensa', code='EQ01', location_type='equipment')
+        self.activities = [
+            MaintenanceActivity.objects.create(
+                technician=self.technician,
+                activity_type=self.activity_type,
+                location=self.location,
+                title=f'Atividade {index}',
+                description='Teste'
+            )
+            for index in range(3)
+        ]
+
+    def sync(self, token=None):
+        params = {'token': token} if token else {}
+        return self.client.get('/api/activities/sync/', params)
+
+    def test_full_then_delta_sync(self):
+        """Testa sincronização completa e incremental com exclusões"""
+        response = self.sync()
+        self.assertTrue(response.data['full'])
+        self.assertEqual(len(response.data['activities']), 3)
+        self.assertEqual(len(response.data['questions']), 1)
+
+        # Token de um instante em que nada mais tinha mudado
+        token = make_sync_token(self.technician, timezone.now() + SYNC_OVERLAP)
+        response = self.sync(token)
+        self.assertFalse(response.data['full'])
+        self.assertEqual(response.data['activities'], [])
+        self.assertEqual(response.data['locations'], [])
+
+        changed, deleted, reassigned = self.activities
+        changed.title = 'Alterada'
+        changed.save()
+        deleted_id, question_id = deleted.pk, self.question.pk
+        deleted.delete()
+        self.client.force_authenticate(user=self.supervisor)
+        self.client.post('/api/activities/bulk-update/', {
+            'ids': [reassigned.pk], 'action': 'reassign', 'technician': self.supervisor.pk
+        }, format='json')
+        self.question.delete()
+        self.client.force_authenticate(user=self.technician)
+
+        response = self.sync(token)
+        self.assertEqual([row['id'] for row in response.data['activities']], [changed.pk])
+        self.assertEqual(response.data['deleted']['activities'], sorted([deleted_id, reassigned.pk]))
+        self.assertEqual(response.data['deleted']['questions'], [question_id])
+        self.assertEqual(response.data['activity_types'], [])
+
+    def test_paged_sync(self):
+        """Testa páginas completas e incrementais com token de continuação"""
+        def sync_all(token=None):
+            pages = []
+            while True:
+                response = self.sync(token)
+                pages.append(response.data)
+                token = response.data['token']
+                if not response.data['has_more']:
+                    return pages, token
+
+        with mock.patch('activities.sync.SYNC_PAGE_SIZE', 2):
+            pages, token = sync_all()
+            self.assertEqual(len(pages), 2)
+            self.assertTrue(all(page['full'] for page in pages))
+            self.assertEqual(
+                [row['id'] for page in pages for row in page['activities']],
+                [activity.pk for activity in self.activities]
+            )
+
+            for activity in self.activities:
+                activity.title = 'Alterada'
+                activity.save()
+            deleted_id = self.question.pk
+            self.question.delete()
+
+            # O token final recua SYNC_OVERLAP: as três aparecem de novo, uma vez cada
+            pages, _ = sync_all(token)
+        self.assertEqual(len(pages), 2)
+        self.assertFalse(pages[0]['full'])
+        ids = [row['id'] for page in pages for row in page['activities']]
+        self.assertEqual(sorted(ids), [activity.pk for activity in self.activities])
+        self.assertEqual(pages[0]['deleted']['questions'], [deleted_id])
+        self.assertEqual(pages[1]['deleted']['questions'], [])
+
+    def test_invalid_token(self):
+        """Testa rejeição de token adulterado ou de outro usuário"""
+        self.assertEqual(self.sync('abc').status_code, status.HTTP_400_BAD_REQUEST)
+        token = make_sync_token(self.supervisor, timezone.now())
+        self.assertEqual(self.sync(token).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ActivityJournalTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.question = StandardQuestion.objects.create(
+            activity_type=self.activity_type, question='Vazamento?', question_type='yes_no'
+        )
+        self.location = Location.objects.create(name='Prensa', code='EQ01', location_type='equipment')
+        self.activity, self.cancelled = [
+            MaintenanceActivity.objects.create(
+                technician=self.user,
+                activity_type=self.activity_type,
+                location=self.location,
+                title=f'Atividade {index}',
+                description='Teste',
+                status=status_value
+            )
+            for index, status_value in enumerate(['pending', 'cancelled'])
+        ]
+
+    def test_replay_resolves_conflicts(self):
+        """Testa reprodução do diário com duplicatas, conflitos e respostas"""
+        answer = {'question_id': self.question.pk, 'answer_boolean': False}
+        response = self.client.post('/api/activities/journal/', {'actions': [
+            {'id': 'a1', 'type': 'start', 'activity': self.activity.pk},
+            {'id': 'a2', 'type': 'answer', 'activity': self.activity.pk, 'data': answer},
+            {'id': 'a3', 'type': 'start', 'activity': self.cancelled.pk},
+            {'id': 'a4', 'type': 'complete', 'activity': self.activity.pk,
+             'data': {'answers': [{**answer, 'answer_boolean': True}]}},
+            {'id': 'a5', 'type': 'start', 'activity': self.activity.pk},
+            {'id': 'a6', 'type': 'answer', 'activity': 9999, 'data': answer},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(result['id'], result['status']) for result in response.data['results']],
+            [('a1', 'applied'), ('a2', 'applied'), ('a3', 'conflict'),
+             ('a4', 'applied'), ('a5', 'duplicate'), ('a6', 'not_found')]
+        )
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.status, 'completed')
+        self.assertIn(
+            {'id': self.activity.pk, 'status': 'completed', 'version': self.activity.version},
+            response.data['activities']
+        )
+        self.assertTrue(self.activity.answers.get().answer_boolean)
+        self.assertEqual(verify_counters(), [])
+
+    def test_replay_multipart_photo(self):
+        """Testa foto enviada no mesmo multipart do diário"""
+        gif = (
+            b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04'
+            b'\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+        )
+        actions = [{'id': 'x1', 'type': 'photo', 'activity': self.activity.pk,
+                    'data': {'file': 'photo_0', 'photo_type': 'before'}}]
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            responses = [
+                self.client.post('/api/activities/journal/', {
+                    'actions': json.dumps(actions),
+                    'photo_0': SimpleUploadedFile('antes.gif', gif, content_type='image/gif'),
+                })
+                for _ in range(2)
+            ]
+        # O reenvio do mesmo diário não duplica a foto
+        self.assertEqual(responses[0].data['results'][0]['status'], 'applied')
+        self.assertEqual(responses[1].data['results'][0]['status'], 'duplicate')
+        self.assertEqual(self.activity.photos.count(), 1)
+
+
+class IdempotencyKeyTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.activity_type = ActivityType.objects.create(name='Preventiva')
+        self.location = Location.objects.create(name='Prensa', code='EQ01', location_type='equipment')
+        self.data = {
+            'activity_type': self.activity_type.pk,
+            'location': self.location.pk,
+            'title': 'Troca de óleo',
+            'description': 'Teste',
+        }
+
+    def create(self, key, **changes):
+        return self.client.post(
+            '/api/activities/', {**self.data, **changes}, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_response(self):
+        """Testa que a repetição devolve a resposta guardada sem criar outra atividade"""
+        first = self.create('chave-1')
+        retry = self.create('chave-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(MaintenanceActivity.objects.count(), 1)
+
+        self.assertEqual(self.create('chave-1', title='Outra').status_code, 422)
+        self.assertEqual(self.create('chave-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(MaintenanceActivity.objects.count(), 2)
+
+    def test_retried_complete_and_expiry(self):
+        """Testa finalização repetida e chave expirada"""
+        activity = MaintenanceActivity.objects.create(
+            technician=self.user,
+            activity_type=self.activity_type,
+            location=self.location,
+            title='Atividade',
+            description='Teste',
+            status='in_progress'
+        )
+        url = f'/api/activities/{activity.pk}/complete/'
+        first = self.client.post(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='fim')
+        retry = self.client.post(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='fim')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data, first.data)
+
+        IdempotencyRecord.objects.update(created_at=timezone.now() - IDEMPOTENCY_TTL)
+        expired = self.client.post(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='fim')
+        self.assertEqual(expired.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+    def test_abandoned_claim_is_reclaimed(self):
+        """Testa reserva em processamento (409) e retomada após IDEMPOTENCY_LEASE"""
+        self.create('chave-1')
+        # Simula processo encerrado antes de guardar a resposta
+        IdempotencyRecord.objects.update(status_code=None, response=None)
+        self.assertEqual(self.create('chave-1').status_code, status.HTTP_409_CONFLICT)
+
+        IdempotencyRecord.objects.update(created_at=timezone.now() - IDEMPOTENCY_LEASE)
+        self.assertEqual(self.create('chave-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.create('chave-1')['Idempotent-Replayed'], 'true')
+        self.assertEqual(MaintenanceActivity.objects.count(), 2)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+
+class ActivityExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.supervisor = User.objects.create_user(
+            username='supervisor',
+            password='testpass123',
+            employee_id='SUP001',
+            shift='morning',
+            first_name='Ana',
+            last_name='Souza',
+            is_supervisor=True
+        )
+        self.technician = User.objects.create_user(
+            username='tecnico',
+            password='testpass123',
+            employee_id='TEC001',
+            shift='night'
+        )
+        self.client.force_authenticate(user=self.supervisor)
+        activity_type = ActivityType.objects.create(name='Preventiva')
+        location = Location.objects.create(name='Prensa', code='EQ01', location_type='equipment')
+        category = PartCategory.objects.create(name='Teste', description='Categoria de teste')
+        parts = [
+            Part.objects.create(
+                code=f'P{index}', name=f'Peça {index}', category=category,
+                minimum_stock=1, current_stock=10
+            )
+            for index in range(2)
+        ]
+        self.activities = [
+            MaintenanceActivity.objects.create(
+                technician=technician,
+                activity_type=activity_type,
+                location=location,
+                title=f'Atividade {index}',
+                description='Teste',
+                status='completed' if index == 0 else 'pending'
+            )
+            for index, technician in enumerate([self.supervisor, self.technician, self.technician])
+        ]
+        for part in parts:
+            PartUsage.objects.create(
+                activity=self.activities[0], part=part, quantity_used=2, unit_cost=Decimal('1.50')
+            )
+
+    def export(self, **params):
+        response = self.client.get('/api/activities/export/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_with_filters(self):
+        """Testa exportação CSV com nomes, custo de peças e filtros da listagem"""
+        rows = list(csv.DictReader(StringIO(self.export())))
+        self.assertEqual([int(row['id']) for row in rows], [activity.pk for activity in self.activities])
+        self.assertEqual(rows[0]['technician_name'], 'Ana Souza')
+        self.assertEqual(rows[0]['location_name'], 'Prensa')
+        self.assertEqual(rows[0]['parts_cost'], '6.00')
+        self.assertEqual(rows[1]['parts_cost'], '')
+
+        rows = list(csv.DictReader(StringIO(self.export(status='pending', search='Atividade 2'))))
+        self.assertEqual([int(row['id']) for row in rows], [self.activities[2].pk])
+
+        self.client.force_authenticate(user=self.technician)
+        lines = self.export(output='ndjson').splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [self.activities[1].pk, self.activities[2].pk]
+        )
+
+    def test_export_command(self):
+        """Testa o comando de exportação em NDJSON"""
+        out = StringIO()
+        call_command('export_activities', export_format='ndjson', status='completed', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['activity_type'], 'Preventiva')
+
+
+class ChecklistPivotTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.activity_type = ActivityType.objects.create(name='Inspeção de Motor')
+        self.temperature, self.noise, self.notes = [
+            StandardQuestion.objects.create(
+                activity_type=self.activity_type, question=text, question_type=question_type, order=index
+            )
+            for index, (text, question_type) in enumerate([
+                ('Temperatura do motor', 'number'), ('Ruído anormal?', 'yes_no'), ('Observações', 'text')
+            ])
+        ]
+        location = Location.objects.create(name='Motor', code='MT01', location_type='equipment')
+        self.activities = [
+            MaintenanceActivity.objects.create(
+                technician=self.user,
+                activity_type=self.activity_type,
+                location=location,
+                title=f'Inspeção {index}',
+                description='Teste'
+            )
+            for index in range(5)
+        ]
+        for index, activity in enumerate(self.activities[:4]):
+            ActivityAnswer.objects.create(
+                activity=activity, question=self.temperature, answer_number=Decimal('70.5') + index
+            )
+        ActivityAnswer.objects.create(activity=self.activities[1], question=self.noise, answer_boolean=False)
+        ActivityAnswer.objects.create(activity=self.activities[3], question=self.notes, answer_text='Ok, sem folga')
+
+    def test_wide_rows_across_blocks(self):
+        """Testa uma linha por atividade e uma coluna tipada por pergunta, em vários blocos"""
+        lines = render_answer_pivot(self.activity_type, MaintenanceActivity.objects.all(), block_size=2)
+        rows = list(csv.DictReader(StringIO(''.join(lines))))
+
+        temperature = f'q{self.temperature.pk}_temperatura-do-motor'
+        noise = f'q{self.noise.pk}_ruido-anormal'
+        notes = f'q{self.notes.pk}_observacoes'
+        self.assertEqual([int(row['activity_id']) for row in rows], [a.pk for a in self.activities])
+        self.assertEqual([row[temperature] for row in rows], ['70.50', '71.50', '72.50', '73.50', ''])
+        self.assertEqual([row[noise] for row in rows], ['', 'false', '', '', ''])
+        self.assertEqual(rows[3][notes], 'Ok, sem folga')
+
+        response = self.client.get(f'/api/activities/types/{self.activity_type.pk}/answers-export/')
+        self.assertEqual(b''.join(response.streaming_content).decode(), ''.join(
+            render_answer_pivot(self.activity_type, MaintenanceActivity.objects.all())
+        ))
+        response = self.client.get('/api/activities/types/9999/answers-export/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,71 @@
+"""
+Transições de status das atividades com UPDATE condicional
+
+Cada transição é um ``UPDATE ... WHERE id = ? AND status = ?`` (com os
+demais campos dos contadores como estavam na leitura): se outro
+dispositivo mudou a atividade antes, nenhuma linha é afetada e a
+transição perde, sem sobrescrever nada. Como ``QuerySet.update`` não
+dispara sinais, contadores, cache e totais por local são atualizados aqui.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import bump_activities_version
+from .counters import apply_counter_change
+from .models import MaintenanceActivity
+from .rollups import refresh_location_rollups
+
+
+TRANSITIONS = {
+    'start': {'from': ('pending',), 'to': 'in_progress', 'timestamp': 'started_at'},
+    'complete': {'from': ('in_progress',), 'to': 'completed', 'timestamp': 'completed_at'},
+    'cancel': {'from': ('pending', 'in_progress'), 'to': 'cancelled', 'timestamp': None},
+}
+
+
+def can_transition(activity, name):
+    """Verifica se o status atual da atividade permite a transição"""
+    return activity.status in TRANSITIONS[name]['from']
+
+
+def apply_transition(activity, name, **changes):
+    """
+    Executa a transição ``name`` (``start``, ``complete`` ou ``cancel``)
+
+    ``changes`` são campos extras gravados no mesmo UPDATE (ex.:
+    ``observations``). Retorna ``True`` se a transição venceu; nesse caso a
+    instância é atualizada em memória, inclusive ``version``.
+    """
+    rule = TRANSITIONS[name]
+    if not can_transition(activity, name):
+        return False
+
+    now = timezone.now()
+    values = {'status': rule['to'], 'updated_at': now, **changes}
+    if rule['timestamp']:
+        values[rule['timestamp']] = now
+    if name == 'complete' and activity.started_at:
+        values['actual_duration'] = now - activity.started_at
+
+    old_fields = activity.counter_fields()
+    with transaction.atomic():
+        won = MaintenanceActivity.objects.filter(
+            pk=activity.pk,
+            status=activity.status,
+            technician_id=activity.technician_id,
+            priority=activity.priority,
+        ).update(version=F('version') + 1, **values)
+        if not won:
+            return False
+
+        for field, value in values.items():
+            setattr(activity, field, value)
+        activity.version += 1
+        activity._loaded_counter_fields = activity.counter_fields()
+        apply_counter_change(old_fields, activity._loaded_counter_fields)
+
+    bump_activities_version()
+    location_ids = {activity.location_id}
+    transaction.on_commit(lambda: refresh_location_rollups(location_ids))
+    return True
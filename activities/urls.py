@@ -4,17 +4,28 @@ from . import views
 urlpatterns = [
     # Tipos de atividade
     path('types/', views.ActivityTypeListView.as_view(), name='activity-type-list'),
+    path('types/<int:type_id>/answers-export/', views.export_checklist_answers,
+         name='activity-type-answers-export'),
     
     # CRUD de atividades
     path('', views.MaintenanceActivityListCreateView.as_view(), name='activity-list'),
     path('<int:pk>/', views.MaintenanceActivityDetailView.as_view(), name='activity-detail'),
+    path('bulk/', views.bulk_create_activities, name='activity-bulk-create'),
+    path('bulk-update/', views.bulk_update_activities, name='activity-bulk-update'),
     
     # Ações em atividades
     path('<int:activity_id>/start/', views.start_activity, name='start-activity'),
     path('<int:activity_id>/complete/', views.complete_activity, name='complete-activity'),
+    path('<int:activity_id>/cancel/', views.cancel_activity, name='cancel-activity'),
     path('<int:activity_id>/upload-photo/', views.upload_photo, name='upload-photo'),
     
     # Estatísticas e relatórios
     path('stats/', views.activity_stats, name='activity-stats'),
     path('my-activities/', views.my_activities, name='my-activities'),
+    path('location-rollups/', views.location_rollups, name='location-rollups'),
+    path('export/', views.export_activities, name='activity-export'),
+    
+    # Sincronização do aplicativo offline
+    path('sync/', views.sync_changes, name='activity-sync'),
+    path('journal/', views.replay_activity_journal, name='activity-journal'),
 ]
@@ -1,30 +1,84 @@
+import json
+
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, Prefetch
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.text import slugify
 from datetime import timedelta
-from .models import (
-    ActivityType, StandardQuestion, MaintenanceActivity,
-    PartUsage, ActivityPhoto, ActivityAnswer
+from locations.models import Location
+from maintenance_api.fieldsets import apply_field_plans, selected_fields
+from .models import ActivityType, StandardQuestion, MaintenanceActivity
+from .bulk import create_activities, update_activities
+from .caching import get_cached_activities, get_cached_catalog
+from .export import EXPORT_FORMATS, render_export
+from .filters import ACTIVITY_SEARCH_FIELDS, filter_activities, search_activities
+from .completion import missing_references, save_answers, save_parts_used
+from .idempotency import idempotent, run_idempotent
+from .journal import replay_journal
+from .counters import counter_totals, month_of
+from .pagination import ActivityPagination
+from .pivot import render_answer_pivot
+from .sync import (
+    InvalidSyncToken, SYNC_TOMBSTONE_RETENTION, collect_changes, make_sync_token, read_sync_token
+)
+from .transitions import apply_transition, can_transition
+from .rollups import (
+    compute_location_rollups, get_location_rollups, serialize_rollup, ROLLUP_FIELDS
 )
 from .serializers import (
     ActivityTypeSerializer, StandardQuestionSerializer,
     MaintenanceActivitySerializer, MaintenanceActivityListSerializer,
     MaintenanceActivityCreateSerializer, ActivityStartSerializer,
     ActivityCompleteSerializer, PhotoUploadSerializer,
-    PartUsageSerializer, ActivityPhotoSerializer
+    PartUsageSerializer, ActivityPhotoSerializer,
+    BulkActivityCreateSerializer, BulkActivityUpdateSerializer, JournalSerializer,
+    SyncActivitySerializer, SyncLocationSerializer,
+    SyncActivityTypeSerializer, SyncStandardQuestionSerializer
 )
 
 
+def with_details(queryset, selected=None):
+    """
+    Plano de consultas do ``MaintenanceActivitySerializer``: todo o payload
+    do detalhe (ou só os campos ``selected``) em um número fixo de consultas
+    """
+    return apply_field_plans(queryset, MaintenanceActivitySerializer, selected)
+
+
+def conflict_response():
+    """Resposta para alteração concorrente de outro dispositivo"""
+    return Response(
+        {'error': 'Atividade alterada por outro dispositivo. Atualize e tente novamente.'}, 
+        status=status.HTTP_409_CONFLICT
+    )
+
+
 class ActivityTypeListView(generics.ListAPIView):
     """
     Lista tipos de atividade
     """
-    queryset = ActivityType.objects.filter(is_active=True)
     serializer_class = ActivityTypeSerializer
     permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ActivityType.objects.filter(is_active=True).annotate(
+            activities_count=Count('maintenanceactivity')
+        ).prefetch_related(
+            Prefetch('questions', queryset=StandardQuestion.objects.order_by('order'))
+        ).order_by('name')
+    
+    def list(self, request, *args, **kwargs):
+        # Catálogo pequeno e lido por todos os clientes: a lista inteira fica em
+        # cache numa única chave e a página (com os links) é montada por requisição
+        types = get_cached_catalog(
+            'types', lambda: list(self.get_serializer(self.get_queryset(), many=True).data)
+        )
+        return self.get_paginated_response(self.paginate_queryset(types))
 
 
 class MaintenanceActivityListCreateView(generics.ListCreateAPIView):
@@ -33,38 +87,31 @@ class MaintenanceActivityListCreateView(generics.ListCreateAPIView):
     """
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'location__name']
+    search_fields = ACTIVITY_SEARCH_FIELDS
     ordering_fields = ['created_at', 'scheduled_date', 'priority', 'status']
     ordering = ['-created_at']
+    pagination_class = ActivityPagination
     
     def get_queryset(self):
-        user = self.request.user
-        queryset = MaintenanceActivity.objects.all()
-        
-        # Filtros por parâmetro
-        status_filter = self.request.query_params.get('status')
-        priority_filter = self.request.query_params.get('priority')
-        technician_filter = self.request.query_params.get('technician')
-        
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        if priority_filter:
-            queryset = queryset.filter(priority=priority_filter)
-        
-        if technician_filter:
-            queryset = queryset.filter(technician_id=technician_filter)
-        
-        # Se não for supervisor, mostra apenas suas atividades
-        if not (user.is_supervisor or user.is_staff):
-            queryset = queryset.filter(technician=user)
+        queryset = filter_activities(
+            MaintenanceActivity.objects.all(), self.request.query_params, self.request.user
+        )
         
-        return queryset.select_related('technician', 'activity_type', 'location')
+        # Joins apenas para os nomes pedidos (?fields= / ?expand=)
+        serializer_class = self.get_serializer_class()
+        return apply_field_plans(
+            queryset, serializer_class, selected_fields(self.request, serializer_class)
+        )
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return MaintenanceActivityCreateSerializer
         return MaintenanceActivityListSerializer
+    
+    def create(self, request, *args, **kwargs):
+        # Repetições com a mesma Idempotency-Key não criam outra atividade
+        create = super().create
+        return run_idempotent(request, lambda: create(request, *args, **kwargs))
 
 
 class MaintenanceActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -82,7 +129,28 @@ class MaintenanceActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
         if not (user.is_supervisor or user.is_staff):
             queryset = queryset.filter(technician=user)
         
-        return queryset
+        return with_details(queryset, selected_fields(self.request, self.serializer_class))
+    
+    def update(self, request, *args, **kwargs):
+        """
+        Com ``version`` no corpo, só grava se a atividade ainda estiver nessa
+        versão; caso contrário responde 409 com a versão atual
+        """
+        expected = request.data.get('version')
+        if expected is None:
+            return super().update(request, *args, **kwargs)
+        
+        with transaction.atomic():
+            # Trava a linha até o fim da gravação para a versão não mudar no meio
+            current = self.get_queryset().select_for_update(of=('self',)).filter(
+                pk=kwargs['pk']
+            ).values_list('version', flat=True).first()
+            if current is not None and str(current) != str(expected):
+                return Response({
+                    'error': 'Atividade alterada por outro dispositivo. Atualize e tente novamente.',
+                    'version': current
+                }, status=status.HTTP_409_CONFLICT)
+            return super().update(request, *args, **kwargs)
 
 
 @api_view(['POST'])
@@ -100,13 +168,13 @@ def start_activity(request, activity_id):
         )
     
     # Verifica se o usuário pode iniciar esta atividade
-    if not (request.user == activity.technician or request.user.is_supervisor):
+    if not (request.user.id == activity.technician_id or request.user.is_supervisor):
         return Response(
             {'error': 'Você não tem permissão para iniciar esta atividade.'}, 
             status=status.HTTP_403_FORBIDDEN
         )
     
-    if activity.status != 'pending':
+    if not can_transition(activity, 'start'):
         return Response(
             {'error': f'Atividade não pode ser iniciada. Status atual: {activity.get_status_display()}'}, 
             status=status.HTTP_400_BAD_REQUEST
@@ -114,12 +182,13 @@ def start_activity(request, activity_id):
     
     serializer = ActivityStartSerializer(data=request.data)
     if serializer.is_valid():
-        activity.status = 'in_progress'
-        activity.started_at = timezone.now()
+        changes = {}
         if serializer.validated_data.get('observations'):
-            activity.observations = serializer.validated_data['observations']
-        activity.save()
+            changes['observations'] = serializer.validated_data['observations']
+        if not apply_transition(activity, 'start', **changes):
+            return conflict_response()
         
+        activity = with_details(MaintenanceActivity.objects.all()).get(id=activity.id)
         return Response({
             'success': True,
             'message': 'Atividade iniciada com sucesso.',
@@ -131,9 +200,78 @@ def start_activity(request, activity_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def complete_activity(request, activity_id):
     """
     Finaliza uma atividade
+    
+    Respostas, peças utilizadas e baixa de estoque são gravadas em uma única
+    transação, com um número fixo de consultas.
+    """
+    with transaction.atomic():
+        try:
+            activity = MaintenanceActivity.objects.get(id=activity_id)
+        except MaintenanceActivity.DoesNotExist:
+            return Response(
+                {'error': 'Atividade não encontrada.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Verifica permissão
+        if not (request.user.id == activity.technician_id or request.user.is_supervisor):
+            return Response(
+                {'error': 'Você não tem permissão para finalizar esta atividade.'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if not can_transition(activity, 'complete'):
+            return Response(
+                {'error': f'Atividade não pode ser finalizada. Status atual: {activity.get_status_display()}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = ActivityCompleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        answers_data = serializer.validated_data.get('answers', [])
+        parts_data = serializer.validated_data.get('parts_used', [])
+        
+        # Confere perguntas e peças em uma consulta cada
+        missing_questions, missing_parts = missing_references(answers_data, parts_data)
+        if missing_questions or missing_parts:
+            return Response({
+                'error': 'Perguntas ou peças não encontradas.',
+                'questions': missing_questions,
+                'parts': missing_parts,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Finaliza a atividade (UPDATE condicional): se outro dispositivo
+        # mudou o status antes, nada é gravado. A duração real é calculada
+        # na transição e os totais por local são atualizados após o commit,
+        # já incluindo as peças gravadas abaixo
+        changes = {}
+        if serializer.validated_data.get('observations'):
+            changes['observations'] = serializer.validated_data['observations']
+        if not apply_transition(activity, 'complete', **changes):
+            return conflict_response()
+        
+        save_answers(activity, answers_data)
+        save_parts_used(activity, parts_data)
+    
+    activity = with_details(MaintenanceActivity.objects.all()).get(id=activity.id)
+    return Response({
+        'success': True,
+        'message': 'Atividade finalizada com sucesso.',
+        'activity': MaintenanceActivitySerializer(activity, context={'request': request}).data
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cancel_activity(request, activity_id):
+    """
+    Cancela uma atividade pendente ou em andamento
     """
     try:
         activity = MaintenanceActivity.objects.get(id=activity_id)
@@ -144,69 +282,30 @@ def complete_activity(request, activity_id):
         )
     
     # Verifica permissão
-    if not (request.user == activity.technician or request.user.is_supervisor):
+    if not (request.user.id == activity.technician_id or request.user.is_supervisor):
         return Response(
-            {'error': 'Você não tem permissão para finalizar esta atividade.'}, 
+            {'error': 'Você não tem permissão para cancelar esta atividade.'}, 
             status=status.HTTP_403_FORBIDDEN
         )
     
-    if activity.status != 'in_progress':
+    if not can_transition(activity, 'cancel'):
         return Response(
-            {'error': f'Atividade não pode ser finalizada. Status atual: {activity.get_status_display()}'}, 
+            {'error': f'Atividade não pode ser cancelada. Status atual: {activity.get_status_display()}'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    serializer = ActivityCompleteSerializer(data=request.data)
+    serializer = ActivityStartSerializer(data=request.data)
     if serializer.is_valid():
-        # Finaliza a atividade
-        activity.status = 'completed'
-        activity.completed_at = timezone.now()
-        
-        # Calcula duração real
-        if activity.started_at:
-            activity.actual_duration = activity.completed_at - activity.started_at
-        
+        changes = {}
         if serializer.validated_data.get('observations'):
-            activity.observations = serializer.validated_data['observations']
-        
-        activity.save()
-        
-        # Salva respostas
-        answers_data = serializer.validated_data.get('answers', [])
-        for answer_data in answers_data:
-            ActivityAnswer.objects.update_or_create(
-                activity=activity,
-                question_id=answer_data['question_id'],
-                defaults={
-                    'answer_text': answer_data.get('answer_text', ''),
-                    'answer_number': answer_data.get('answer_number'),
-                    'answer_boolean': answer_data.get('answer_boolean'),
-                }
-            )
-        
-        # Salva peças utilizadas
-        parts_data = serializer.validated_data.get('parts_used', [])
-        for part_data in parts_data:
-            PartUsage.objects.create(
-                activity=activity,
-                part_id=part_data['part_id'],
-                quantity_used=part_data['quantity_used'],
-                unit_cost=part_data.get('unit_cost'),
-                observations=part_data.get('observations', '')
-            )
-            
-            # Atualiza estoque da peça
-            from parts.models import Part
-            try:
-                part = Part.objects.get(id=part_data['part_id'])
-                part.current_stock -= part_data['quantity_used']
-                part.save()
-            except Part.DoesNotExist:
-                pass
+            changes['observations'] = serializer.validated_data['observations']
+        if not apply_transition(activity, 'cancel', **changes):
+            return conflict_response()
         
+        activity = with_details(MaintenanceActivity.objects.all()).get(id=activity.id)
         return Response({
             'success': True,
-            'message': 'Atividade finalizada com sucesso.',
+            'message': 'Atividade cancelada com sucesso.',
             'activity': MaintenanceActivitySerializer(activity, context={'request': request}).data
         })
     
@@ -215,6 +314,197 @@ def complete_activity(request, activity_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+def bulk_create_activities(request):
+    """
+    Cria atividades em lote (planejamento de preventivas)
+    
+    Corpo: ``{"activities": [{activity_type, location, title, description,
+    priority, scheduled_date, estimated_duration, technician}]}``. Itens
+    inválidos são reportados por índice e não impedem os demais.
+    """
+    user = request.user
+    if not (user.is_supervisor or user.is_staff):
+        return Response(
+            {'error': 'Apenas supervisores podem criar atividades em lote.'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    serializer = BulkActivityCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = create_activities(serializer.validated_data['activities'], user)
+    created = sum(1 for result in results if 'id' in result)
+    return Response({
+        'created': created,
+        'errors': len(results) - created,
+        'results': results
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_update_activities(request):
+    """
+    Reatribui, muda a prioridade ou cancela atividades em aberto em lote
+    
+    Corpo: ``{"ids": [...], "action": "reassign" | "reprioritize" | "cancel",
+    "technician": id, "priority": "..."}``.
+    """
+    user = request.user
+    if not (user.is_supervisor or user.is_staff):
+        return Response(
+            {'error': 'Apenas supervisores podem alterar atividades em lote.'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    serializer = BulkActivityUpdateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    technician = data.get('technician')
+    result = update_activities(
+        data['ids'],
+        data['action'],
+        technician_id=technician.id if technician else None,
+        priority=data.get('priority')
+    )
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def replay_activity_journal(request):
+    """
+    Reproduz as ações feitas offline em uma única requisição
+    
+    Corpo: ``{"actions": [{"id": "...", "type": "start" | "complete" |
+    "cancel" | "answer" | "photo", "activity": id, "data": {...}}]}``, na
+    ordem em que foram feitas. Com fotos, o envio é multipart: ``actions``
+    vai como JSON e cada ação de foto informa em ``data.file`` o campo do
+    arquivo. Ações com ``id`` já aplicado voltam como ``duplicate``.
+    """
+    data = request.data
+    if isinstance(data.get('actions'), str):
+        try:
+            data = {'actions': json.loads(data['actions'])}
+        except ValueError:
+            return Response(
+                {'error': 'actions deve ser uma lista JSON.'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    serializer = JournalSerializer(data=data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    results, activities = replay_journal(
+        request.user, serializer.validated_data['actions'], request.FILES
+    )
+    return Response({'results': results, 'activities': activities})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_activities(request):
+    """
+    Exportação completa das atividades em fluxo
+    
+    Aceita os mesmos filtros da listagem (status, priority, technician,
+    location_subtree e search). Parâmetro opcional output: csv (padrão) ou
+    ndjson; o nome "format" é reservado pelo DRF.
+    """
+    export_format = request.GET.get('output', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {'error': f'Formato inválido. Formatos válidos: {list(EXPORT_FORMATS)}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    activities = filter_activities(MaintenanceActivity.objects.all(), request.GET, request.user)
+    activities = search_activities(activities, request.GET.get('search'))
+    
+    content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv; charset=utf-8'
+    response = StreamingHttpResponse(render_export(activities, export_format), content_type=content_type)
+    filename = f'atividades_{timezone.localdate():%Y%m%d}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_checklist_answers(request, type_id):
+    """
+    Respostas do checklist de um tipo de atividade em formato largo (CSV)
+    
+    Uma linha por atividade e uma coluna por pergunta padrão. Aceita os
+    mesmos filtros da listagem de atividades.
+    """
+    try:
+        activity_type = ActivityType.objects.get(id=type_id)
+    except ActivityType.DoesNotExist:
+        return Response(
+            {'error': 'Tipo de atividade não encontrado.'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    activities = filter_activities(MaintenanceActivity.objects.all(), request.GET, request.user)
+    activities = search_activities(activities, request.GET.get('search'))
+    
+    response = StreamingHttpResponse(
+        render_answer_pivot(activity_type, activities), content_type='text/csv; charset=utf-8'
+    )
+    filename = f'respostas_{slugify(activity_type.name)}_{timezone.localdate():%Y%m%d}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Sincronização incremental do aplicativo offline
+    
+    Parâmetros opcionais:
+    - token: token da sincronização anterior; sem ele (ou expirado) a
+      resposta é completa (``full``) e o cliente substitui os dados locais
+    
+    Com ``has_more`` o token devolvido busca a próxima página da mesma
+    sincronização.
+    """
+    user = request.user
+    # Capturado antes das consultas: o próximo token cobre o que mudar durante elas
+    now = timezone.now()
+    
+    since, issued_at, cursors = None, None, None
+    token = request.GET.get('token')
+    if token:
+        try:
+            since, issued_at, cursors = read_sync_token(token, user)
+        except InvalidSyncToken as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if cursors is None and since < now - SYNC_TOMBSTONE_RETENTION:
+            since = None  # Exclusões desse período já foram removidas
+    if cursors is None:
+        issued_at = now
+    
+    changes, deleted, cursors = collect_changes(user, since, cursors)
+    return Response({
+        'full': since is None,
+        'has_more': bool(cursors),
+        'token': make_sync_token(user, issued_at, since, cursors),
+        'activities': SyncActivitySerializer(changes['activities'], many=True).data,
+        'locations': SyncLocationSerializer(changes['locations'], many=True).data,
+        'activity_types': SyncActivityTypeSerializer(changes['activity_types'], many=True).data,
+        'questions': SyncStandardQuestionSerializer(changes['questions'], many=True).data,
+        'deleted': deleted,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
 def upload_photo(request, activity_id):
     """
     Upload de foto para uma atividade
@@ -255,40 +545,38 @@ def activity_stats(request):
     """
     user = request.user
     
-    # Filtros base
-    queryset = MaintenanceActivity.objects.all()
+    # Técnicos veem apenas as próprias atividades
+    technician_id = None
+    scope = 'all'
     if not (user.is_supervisor or user.is_staff):
-        queryset = queryset.filter(technician=user)
-    
-    # Contadores por status
-    stats = {
-        'total': queryset.count(),
-        'pending': queryset.filter(status='pending').count(),
-        'in_progress': queryset.filter(status='in_progress').count(),
-        'completed': queryset.filter(status='completed').count(),
-        'cancelled': queryset.filter(status='cancelled').count(),
-    }
-    
-    # Estatísticas do mês atual
-    current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    monthly_stats = {
-        'created_this_month': queryset.filter(created_at__gte=current_month).count(),
-        'completed_this_month': queryset.filter(
-            status='completed',
-            completed_at__gte=current_month
-        ).count(),
-    }
-    
-    # Atividades por prioridade
-    priority_stats = dict(
-        queryset.values('priority').annotate(count=Count('id')).values_list('priority', 'count')
-    )
+        technician_id = user.id
+        scope = f'technician:{user.id}'
     
-    return Response({
-        'general': stats,
-        'monthly': monthly_stats,
-        'by_priority': priority_stats,
-    })
+    current_month = month_of(timezone.now())
+    
+    def build():
+        # Contadores pré-agregados: não percorre a tabela de atividades
+        counts = counter_totals(technician_id)
+        priorities = [choice[0] for choice in MaintenanceActivity.PRIORITY_CHOICES]
+    
+        return {
+            'general': {
+                key: counts[key]
+                for key in ('total', 'pending', 'in_progress', 'completed', 'cancelled')
+            },
+            'monthly': {
+                'created_this_month': counts['created_this_month'],
+                'completed_this_month': counts['completed_this_month'],
+            },
+            # Atividades por prioridade (apenas as que possuem atividades)
+            'by_priority': {
+                priority: counts[f'priority_{priority}']
+                for priority in priorities
+                if counts[f'priority_{priority}']
+            },
+        }
+    
+    return Response(get_cached_activities(f'stats:{scope}:{current_month:%Y-%m}', build))
 
 
 @api_view(['GET'])
@@ -311,3 +599,61 @@ def my_activities(request):
         'activities': serializer.data,
         'total': activities.count()
     })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def location_rollups(request):
+    """
+    Totais de atividades abertas, críticas e custo de peças por subárvore de locais
+    
+    Parâmetros opcionais:
+    - root: ID do local raiz da subárvore
+    - fresh: recalcula em vez de usar o snapshot em cache
+    """
+    user = request.user
+    if not (user.is_supervisor or user.is_staff):
+        return Response(
+            {'error': 'Apenas supervisores podem ver os totais por local.'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    locations = Location.objects.filter(is_active=True)
+    
+    root_id = request.GET.get('root')
+    if root_id:
+        root_path = Location.objects.filter(
+            id=root_id if root_id.isdigit() else None, is_active=True
+        ).order_by().values_list('path', flat=True).first()
+        if root_path is None:
+            return Response(
+                {'error': 'Local não encontrado.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        locations = locations.filter(path__startswith=root_path)
+    
+    rows = list(locations.order_by('path').values_list(
+        'id', 'name', 'code', 'location_type', 'parent_id'
+    ))
+    if request.GET.get('fresh') in ('1', 'true'):
+        totals = compute_location_rollups()['totals']
+    else:
+        totals = get_location_rollups([row[0] for row in rows])
+    
+    empty = [0] * len(ROLLUP_FIELDS)
+    rollups = [
+        {
+            'id': pk,
+            'name': name,
+            'code': code,
+            'location_type': location_type,
+            'parent': parent_id,
+            **serialize_rollup(totals.get(pk, empty)),
+        }
+        for pk, name, code, location_type, parent_id in rows
+    ]
+    
+    return Response({
+        'count': len(rollups),
+        'locations': rollups
+    })
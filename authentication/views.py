@@ -80,17 +80,13 @@ def user_stats(request):
     user = request.user
     
     # Importação aqui para evitar dependência circular
-    from activities.models import MaintenanceActivity
+    from activities.counters import counter_totals
     
-    activities_count = MaintenanceActivity.objects.filter(technician=user).count()
-    completed_activities = MaintenanceActivity.objects.filter(
-        technician=user, 
-        status='completed'
-    ).count()
-    pending_activities = MaintenanceActivity.objects.filter(
-        technician=user, 
-        status='pending'
-    ).count()
+    # Contadores pré-agregados, em uma única consulta
+    counts = counter_totals(technician_id=user.id)
+    activities_count = counts['total']
+    completed_activities = counts['completed']
+    pending_activities = counts['pending']
     
     return Response({
         'user': UserProfileSerializer(user).data,
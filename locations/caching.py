@@ -0,0 +1,71 @@
+"""
+Cache versionado das respostas da hierarquia de locais
+
+Um contador de versão é incrementado após qualquer escrita em ``Location``.
+As respostas em cache e os ETags derivam dessa versão, então uma escrita
+invalida tudo de uma vez sem precisar apagar chaves.
+
+O contador fica no banco (``HierarchyVersion``), não no cache: com vários
+processos e ``LocMemCache``, todos veem a escrita feita em qualquer um. O
+incremento acontece na transação da escrita, então a versão nova só
+aparece junto com os dados confirmados.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+HIERARCHY_VERSION_ID = 1
+HIERARCHY_CACHE_TIMEOUT = 60 * 60  # 1 hora
+
+
+def _version_rows():
+    # Importado aqui: models usa este módulo ao gravar locais
+    from .models import HierarchyVersion
+    return HierarchyVersion.objects.filter(pk=HIERARCHY_VERSION_ID)
+
+
+def _create_version():
+    from .models import HierarchyVersion
+    try:
+        with transaction.atomic():
+            # Baseada no relógio para não repetir versões (e ETags) de outro banco
+            HierarchyVersion.objects.create(pk=HIERARCHY_VERSION_ID, version=int(time.time() * 1000))
+    except IntegrityError:
+        pass  # Criada por outro processo
+
+
+def get_hierarchy_version():
+    """Retorna a versão atual da hierarquia de locais (uma consulta)"""
+    version = _version_rows().values_list('version', flat=True).first()
+    if version is None:
+        _create_version()
+        version = _version_rows().values_list('version', flat=True).first()
+    return version
+
+
+def bump_hierarchy_version():
+    """Invalida os dados em cache da hierarquia de locais"""
+    if not _version_rows().update(version=F('version') + 1):
+        _create_version()
+
+
+def hierarchy_etag(request, *args, **kwargs):
+    """
+    ETag para ``django.views.decorators.http.etag``: combina a versão da
+    hierarquia com a URL, sem montar a resposta.
+    """
+    path_hash = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+    return f"{get_hierarchy_version()}-{path_hash}"
+
+
+def get_cached_hierarchy(name, build):
+    """
+    Retorna os dados em cache para a versão atual da hierarquia,
+    montando-os com ``build()`` quando ausentes.
+    """
+    key = f"locations:{name}:{get_hierarchy_version()}"
+    return cache.get_or_set(key, build, HIERARCHY_CACHE_TIMEOUT)
@@ -0,0 +1,246 @@
+"""
+Importação em massa de hierarquias de locais (CSV ou NDJSON)
+
+As linhas são lidas em fluxo, os códigos dos pais são resolvidos em memória
+(no próprio arquivo ou no banco) e os locais são inseridos nível a nível com
+``bulk_create`` em lotes, de modo que todo pai é gravado antes dos filhos.
+As regras de hierarquia valem para o lote inteiro e os erros são reportados
+por linha; linhas com erro (e seus descendentes) não são importadas.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+from django.db.models import CharField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from .caching import bump_hierarchy_version
+from .models import Location, PATH_SEPARATOR
+
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_FIELDS = ('code', 'name', 'location_type', 'parent_code', 'description')
+VALID_TYPES = {choice[0] for choice in Location.LOCATION_TYPES}
+# Limites das colunas, validados antes do INSERT (o PostgreSQL recusa o lote)
+MAX_LENGTHS = {
+    field: Location._meta.get_field(field).max_length
+    for field in ('code', 'name')
+}
+PATH_MAX_LENGTH = Location._meta.get_field('path').max_length
+PATH_TOO_LONG = f'Caminho materializado excede {PATH_MAX_LENGTH} caracteres (hierarquia profunda demais).'
+LOOKUP_CHUNK_SIZE = 1000
+
+
+class ImportRow:
+    """
+    Linha do arquivo de importação
+    """
+    __slots__ = ('line', 'code', 'name', 'location_type', 'parent_code', 'description')
+
+    def __init__(self, line, data):
+        self.line = line
+        for field in IMPORT_FIELDS:
+            value = data.get(field)
+            setattr(self, field, str(value).strip() if value is not None else '')
+
+
+def detect_format(filename):
+    """Deduz o formato pela extensão do arquivo"""
+    if filename.lower().endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return 'csv'
+
+
+def read_rows(stream, file_format):
+    """
+    Lê as linhas de um arquivo texto ou binário sem carregá-lo inteiro
+
+    Gera ``(número da linha, dicionário)``; linhas NDJSON inválidas geram
+    ``(número da linha, None)``.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        yield line_number, data if isinstance(data, dict) else None
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class PathTooLong(Exception):
+    """Caminho gerado no INSERT maior que o previsto na validação"""
+    def __init__(self, row):
+        super().__init__(row.code)
+        self.row = row
+
+
+def _in_cycle(row, batch):
+    """Verifica se a linha participa de um ciclo de códigos dentro do arquivo"""
+    seen = set()
+    code = row.parent_code
+    while code in batch and code not in seen:
+        if code == row.code:
+            return True
+        seen.add(code)
+        code = batch[code].parent_code
+    return False
+
+
+def import_locations(rows, batch_size=1000, dry_run=False):
+    """
+    Importa locais a partir de ``(linha, dicionário)``
+
+    Retorna ``{'valid': int, 'created': int, 'errors': [{'line', 'code', 'error'}]}``;
+    com ``dry_run`` apenas valida e não grava nada.
+    """
+    errors = []
+    batch = {}
+
+    def fail(row, message):
+        errors.append({'line': row.line, 'code': row.code, 'error': message})
+
+    # 1. Validação de cada linha
+    for line, data in rows:
+        if data is None:
+            errors.append({'line': line, 'code': '', 'error': 'Linha inválida.'})
+            continue
+
+        row = ImportRow(line, data)
+        too_long = [field for field, limit in MAX_LENGTHS.items() if len(getattr(row, field)) > limit]
+        if not row.code or not row.name:
+            fail(row, 'code e name são obrigatórios.')
+        elif too_long:
+            fail(row, '; '.join(
+                f'{field} deve ter no máximo {MAX_LENGTHS[field]} caracteres.' for field in too_long
+            ))
+        elif row.location_type not in VALID_TYPES:
+            fail(row, f'Tipo inválido: {row.location_type}.')
+        elif row.code in batch:
+            fail(row, f'Código duplicado no arquivo (linha {batch[row.code].line}).')
+        elif row.parent_code == row.code:
+            fail(row, 'Não é possível criar referência circular.')
+        else:
+            batch[row.code] = row
+
+    # 2. Códigos já cadastrados e pais existentes no banco
+    existing = {}
+    lookup_codes = set(batch) | {row.parent_code for row in batch.values() if row.parent_code}
+    for chunk in _chunks(lookup_codes, LOOKUP_CHUNK_SIZE):
+        for code, pk, location_type, path, depth in Location.objects.filter(
+            code__in=chunk
+        ).order_by().values_list('code', 'id', 'location_type', 'path', 'depth'):
+            existing[code] = (pk, location_type, path, depth)
+
+    for code in [code for code in batch if code in existing]:
+        fail(batch.pop(code), 'Código já cadastrado.')
+
+    # 3. Ordem topológica a partir dos locais cujo pai já existe
+    children = {}
+    level = []
+    for row in batch.values():
+        if not row.parent_code or row.parent_code in existing:
+            level.append(row)
+        elif row.parent_code in batch:
+            children.setdefault(row.parent_code, []).append(row)
+        else:
+            fail(row, f'Local pai não encontrado: {row.parent_code}.')
+
+    # Os IDs só existem após o INSERT: o tamanho do caminho é estimado com a
+    # maior largura possível dos IDs novos
+    max_pk = Location.objects.order_by().aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    id_width = len(str(max_pk + len(batch)))
+
+    levels = []
+    parent_types = {code: info[1] for code, info in existing.items()}
+    path_lengths = {code: len(info[2]) for code, info in existing.items()}
+    while level:
+        valid = []
+        for row in level:
+            parent_type = parent_types.get(row.parent_code)
+            if parent_type == 'component' and row.location_type != 'component':
+                fail(row, 'Componentes só podem ter outros componentes como filhos.')
+                continue
+            path_length = path_lengths.get(row.parent_code, len(PATH_SEPARATOR)) + id_width + 1
+            if path_length > PATH_MAX_LENGTH:
+                fail(row, PATH_TOO_LONG)
+                continue
+            parent_types[row.code] = row.location_type
+            path_lengths[row.code] = path_length
+            valid.append(row)
+        levels.append(valid)
+        level = [child for row in valid for child in children.pop(row.code, [])]
+
+    # Filhos nunca alcançados: pai com erro ou ciclo dentro do arquivo
+    for pending in children.values():
+        for row in pending:
+            if _in_cycle(row, batch):
+                fail(row, 'Não é possível criar referência circular.')
+            else:
+                fail(row, f'Local pai com erro: {row.parent_code}.')
+
+    valid_count = sum(len(valid) for valid in levels)
+    errors.sort(key=lambda error: error['line'])
+    result = {'valid': valid_count, 'created': 0, 'errors': errors}
+    if dry_run or not valid_count:
+        return result
+
+    # 4. Inserção nível a nível: pais sempre antes dos filhos
+    paths = {code: (info[0], info[2], info[3]) for code, info in existing.items()}
+    parent_path = Location.objects.filter(pk=OuterRef('parent_id')).order_by().values('path')
+    try:
+        with transaction.atomic():
+            for valid in levels:
+                for chunk in _chunks(valid, batch_size):
+                    parents = [paths.get(row.parent_code) for row in chunk]
+                    objs = [
+                        Location(
+                            code=row.code,
+                            name=row.name,
+                            location_type=row.location_type,
+                            description=row.description,
+                            parent_id=parent[0] if parent else None,
+                            depth=parent[2] + 1 if parent else 0,
+                        )
+                        for row, parent in zip(chunk, parents)
+                    ]
+                    Location.objects.bulk_create(objs, batch_size=batch_size)
+
+                    for row, parent, obj in zip(chunk, parents, objs):
+                        obj.path = f"{parent[1] if parent else PATH_SEPARATOR}{obj.pk}{PATH_SEPARATOR}"
+                        if len(obj.path) > PATH_MAX_LENGTH:
+                            # IDs além da estimativa (lacunas na sequência): desfaz o lote
+                            raise PathTooLong(row)
+                        paths[row.code] = (obj.pk, obj.path, obj.depth)
+
+                    # O caminho depende do ID gerado no INSERT: um UPDATE por lote
+                    Location.objects.filter(pk__in=[obj.pk for obj in objs]).update(path=Concat(
+                        Coalesce(Subquery(parent_path), Value(PATH_SEPARATOR)),
+                        Cast('id', CharField()),
+                        Value(PATH_SEPARATOR),
+                    ))
+    except PathTooLong as exc:
+        fail(exc.row, f'{PATH_TOO_LONG} Nenhum local foi importado.')
+        errors.sort(key=lambda error: error['line'])
+        result['valid'] = 0
+        return result
+
+    bump_hierarchy_version()
+    result['created'] = valid_count
+    return result
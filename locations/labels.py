@@ -0,0 +1,185 @@
+"""
+Geração em lote de etiquetas QR para locais
+
+Cada etiqueta é um PNG com o QR code ``LOCATION:<código>:<nome>`` e o texto
+do local. As imagens ficam em cache no disco, nomeadas pelo hash do
+conteúdo, e só as ausentes são renderizadas (em paralelo num pool de
+processos no comando ``generate_location_labels``). O PDF é gravado em
+blocos de páginas, então só um bloco de folhas fica em memória por vez.
+"""
+import hashlib
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+
+LABEL_FORMATS = ('zip', 'pdf')
+LABEL_RENDER_VERSION = 1  # Incrementar ao mudar o layout invalida o cache
+LABEL_SIZE = (400, 480)
+LABEL_CACHE_DIR = os.path.join(settings.MEDIA_ROOT, 'location_labels')
+
+# Folha A4 a 150 dpi com 3 x 3 etiquetas
+SHEET_SIZE = (1240, 1754)
+SHEET_GRID = (3, 3)
+# Folhas montadas em memória antes de gravar no PDF (~6,5 MB cada)
+SHEET_PAGES_PER_WRITE = 8
+
+# Máximo de etiquetas por requisição na API (renderizadas no próprio
+# processo, ~20 ms cada); subárvores maiores vão pelo comando
+LABEL_REQUEST_LIMIT = 500
+
+# Abaixo disso renderizar no próprio processo sai mais barato que subir o pool
+MIN_POOL_LABELS = 32
+
+
+def label_payload(code, name):
+    """Conteúdo do QR code de um local"""
+    return f"LOCATION:{code}:{name}"
+
+
+def safe_label_name(code):
+    """Código utilizável como nome de arquivo (sem separadores de caminho)"""
+    name = re.sub(r'[^A-Za-z0-9._-]+', '_', code).strip('._')
+    return name or 'local'
+
+
+def label_hash(code, name):
+    content = f"{LABEL_RENDER_VERSION}|{code}|{name}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def render_label(code, name):
+    """Renderiza a etiqueta de um local e retorna os bytes do PNG"""
+    qr = qrcode.QRCode(border=2, box_size=10)
+    qr.add_data(label_payload(code, name))
+    qr.make(fit=True)
+    qr_image = qr.make_image(fill_color='black', back_color='white').get_image().convert('RGB')
+    qr_image = qr_image.resize((LABEL_SIZE[0], LABEL_SIZE[0]), Image.NEAREST)
+
+    label = Image.new('RGB', LABEL_SIZE, 'white')
+    label.paste(qr_image, (0, 0))
+
+    draw = ImageDraw.Draw(label)
+    center = LABEL_SIZE[0] // 2
+    draw.text((center, LABEL_SIZE[0] + 22), code, fill='black',
+              font=ImageFont.load_default(size=32), anchor='mm')
+    draw.text((center, LABEL_SIZE[0] + 58), name[:40], fill='black',
+              font=ImageFont.load_default(size=22), anchor='mm')
+
+    buffer = io.BytesIO()
+    label.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _render_to_cache(item):
+    code, name, path = item
+    data = render_label(code, name)
+    # Grava em arquivo temporário e renomeia: leitores nunca veem PNG parcial
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def render_labels(locations, workers=None):
+    """
+    Garante as etiquetas em cache para ``(código, nome)`` e retorna os
+    caminhos dos PNGs na mesma ordem
+    """
+    os.makedirs(LABEL_CACHE_DIR, exist_ok=True)
+
+    paths = []
+    missing = []
+    for code, name in locations:
+        path = os.path.join(LABEL_CACHE_DIR, f"{label_hash(code, name)}.png")
+        paths.append(path)
+        if not os.path.exists(path):
+            missing.append((code, name, path))
+
+    if len(missing) >= MIN_POOL_LABELS and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_render_to_cache, missing, chunksize=16))
+    else:
+        for item in missing:
+            _render_to_cache(item)
+
+    return paths
+
+
+def write_zip(locations, paths, output):
+    """Grava em ``output`` um ZIP com um PNG por local, nomeado pelo código"""
+    used = set()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for (code, name), path in zip(locations, paths):
+            entry = safe_label_name(code)
+            suffix = 1
+            while entry in used:
+                suffix += 1
+                entry = f"{safe_label_name(code)}_{suffix}"
+            used.add(entry)
+            archive.write(path, f"{entry}.png")
+
+
+def _sheet_pages(paths):
+    columns, rows = SHEET_GRID
+    cell_width = SHEET_SIZE[0] // columns
+    cell_height = SHEET_SIZE[1] // rows
+    per_page = columns * rows
+
+    for start in range(0, len(paths), per_page):
+        page = Image.new('RGB', SHEET_SIZE, 'white')
+        for index, path in enumerate(paths[start:start + per_page]):
+            with Image.open(path) as label:
+                x = (index % columns) * cell_width + (cell_width - LABEL_SIZE[0]) // 2
+                y = (index // columns) * cell_height + (cell_height - LABEL_SIZE[1]) // 2
+                page.paste(label, (x, y))
+        yield page
+
+
+def write_sheet(paths, output):
+    """
+    Grava em ``output`` (aberto para leitura e escrita) um PDF de várias
+    páginas com as etiquetas em grade para impressão
+
+    As folhas são montadas e gravadas em blocos de ``SHEET_PAGES_PER_WRITE``;
+    os blocos seguintes entram como atualização incremental do PDF.
+    """
+    pages = _sheet_pages(paths)
+    first = True
+    while True:
+        chunk = [page for _, page in zip(range(SHEET_PAGES_PER_WRITE), pages)]
+        if not chunk:
+            break
+        chunk[0].save(
+            output, format='PDF', save_all=True, append_images=chunk[1:],
+            resolution=150, append=not first
+        )
+        first = False
+
+    if first:
+        Image.new('RGB', SHEET_SIZE, 'white').save(output, format='PDF', resolution=150)
+
+
+def build_labels(locations, label_format, workers=None, output=None):
+    """
+    Gera o arquivo de etiquetas (``zip`` ou ``pdf``) para ``(código, nome)``
+
+    Com ``output`` (arquivo binário aberto em ``w+b``) grava nele; sem,
+    retorna os bytes.
+    """
+    locations = list(locations)
+    paths = render_labels(locations, workers=workers)
+
+    target = output if output is not None else io.BytesIO()
+    if label_format == 'pdf':
+        write_sheet(paths, target)
+    else:
+        write_zip(locations, paths, target)
+    return None if output is not None else target.getvalue()
@@ -0,0 +1,59 @@
+"""
+Comando Django para gerar etiquetas QR de uma subárvore de locais
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from locations.labels import LABEL_FORMATS, build_labels, safe_label_name
+from locations.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Gerar etiquetas QR (ZIP de PNGs ou PDF) para um local e seus descendentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'location',
+            type=str,
+            help='Código do local raiz'
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=LABEL_FORMATS,
+            default='zip',
+            help='ZIP com um PNG por local ou PDF para impressão'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Arquivo de saída (padrão: etiquetas_<código>.<formato>)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processos para renderização (padrão: número de CPUs)'
+        )
+        parser.add_argument(
+            '--include-inactive',
+            action='store_true',
+            help='Incluir locais inativos'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            root = Location.objects.only('id', 'path').get(code=options['location'])
+        except Location.DoesNotExist:
+            raise CommandError(f"❌ Local não encontrado: {options['location']}")
+
+        locations = Location.objects.filter(path__startswith=root.path)
+        if not options['include_inactive']:
+            locations = locations.filter(is_active=True)
+        locations = list(locations.order_by('path').values_list('code', 'name'))
+
+        self.stdout.write(f'🏷️  Gerando {len(locations)} etiquetas...')
+        output = options['output'] or f"etiquetas_{safe_label_name(options['location'])}.{options['format']}"
+        with open(output, 'w+b') as f:
+            build_labels(locations, options['format'], workers=options['workers'], output=f)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Etiquetas salvas em {output}'))
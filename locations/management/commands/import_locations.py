@@ -0,0 +1,63 @@
+"""
+Comando Django para importação em massa de locais (CSV ou NDJSON)
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from locations.importer import IMPORT_FORMATS, detect_format, import_locations, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Importar hierarquia de locais a partir de CSV ou NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            type=str,
+            help='Arquivo com as colunas code, name, location_type, parent_code e description'
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=IMPORT_FORMATS,
+            help='Formato do arquivo (padrão: deduzido pela extensão)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Quantidade de locais por INSERT'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas valida o arquivo, sem gravar'
+        )
+
+    def handle(self, *args, **options):
+        file_path = options['file']
+        file_format = options['format'] or detect_format(file_path)
+
+        self.stdout.write(f'🔄 Importando locais de {file_path} ({file_format})...')
+
+        try:
+            with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+                result = import_locations(
+                    read_rows(f, file_format),
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run']
+                )
+        except OSError as e:
+            raise CommandError(f'❌ Não foi possível ler o arquivo: {e}')
+
+        for error in result['errors']:
+            self.stdout.write(
+                self.style.WARNING(f"⚠️  Linha {error['line']} ({error['code']}): {error['error']}")
+            )
+
+        if options['dry_run']:
+            self.stdout.write(f"📋 {result['valid']} locais válidos, {len(result['errors'])} erros")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {result['created']} locais importados, {len(result['errors'])} erros")
+        )
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    """Calcula path/depth de todos os locais existentes em memória"""
+    Location = apps.get_model('locations', 'Location')
+    children = {}
+    for pk, parent_id in Location.objects.order_by().values_list('pk', 'parent_id'):
+        children.setdefault(parent_id, []).append(pk)
+
+    updates = []
+    stack = [(pk, '/', 0) for pk in children.get(None, [])]
+    while stack:
+        pk, parent_path, depth = stack.pop()
+        path = f"{parent_path}{pk}/"
+        updates.append(Location(pk=pk, path=path, depth=depth))
+        stack.extend((child, path, depth + 1) for child in children.get(pk, []))
+
+    Location.objects.bulk_update(updates, ['path', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nível'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Caminho Materializado'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0003_location_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HierarchyVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão da Hierarquia',
+                'verbose_name_plural': 'Versão da Hierarquia',
+            },
+        ),
+    ]
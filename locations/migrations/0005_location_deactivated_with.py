@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_deactivated_with(apps, schema_editor):
+    """Locais inativos: desativados junto com o ancestral inativo mais alto em sequência"""
+    Location = apps.get_model('locations', 'Location')
+    cascades = {}
+    updates = []
+    for pk, parent_id in Location.objects.filter(is_active=False).order_by('depth').values_list(
+        'pk', 'parent_id'
+    ):
+        cascades[pk] = cascades.get(parent_id, pk)
+        updates.append(Location(pk=pk, deactivated_with_id=cascades[pk]))
+
+    Location.objects.bulk_update(updates, ['deactivated_with'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0004_hierarchy_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='deactivated_with',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='locations.location', verbose_name='Desativado Junto Com'),
+        ),
+        migrations.RunPython(populate_deactivated_with, migrations.RunPython.noop),
+    ]
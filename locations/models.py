@@ -1,10 +1,59 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+from .caching import bump_hierarchy_version
+
+
+PATH_SEPARATOR = '/'
+
+
+class LocationQuerySet(models.QuerySet):
+    """
+    Consultas de hierarquia baseadas em CTE recursiva sobre ``parent_id``
+    (SQLite e PostgreSQL), independentes do caminho materializado.
+    """
+    def _hierarchy_cte(self, location, join, include_self):
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        sql = (
+            f"WITH RECURSIVE hierarchy(id, parent_id) AS ("
+            f"SELECT id, parent_id FROM {table} WHERE id = %s "
+            f"UNION "
+            f"SELECT l.id, l.parent_id FROM {table} l JOIN hierarchy h ON {join}"
+            f") SELECT id FROM hierarchy"
+        )
+        pk = getattr(location, 'pk', location)
+        params = [pk]
+        if not include_self:
+            sql += " WHERE id <> %s"
+            params.append(pk)
+        return self.filter(pk__in=RawSQL(sql, params))
+    
+    def with_children_count(self):
+        """Anota ``children_count`` com a quantidade de filhos ativos"""
+        return self.annotate(
+            children_count=models.Count('children', filter=models.Q(children__is_active=True))
+        )
+
+    def ancestors_of(self, location, include_self=False):
+        """Ancestrais de um local (ID ou instância) em uma única consulta"""
+        return self._hierarchy_cte(location, 'l.id = h.parent_id', include_self)
+    
+    def descendants_of(self, location, include_self=False):
+        """Descendentes de um local (ID ou instância) em uma única consulta"""
+        return self._hierarchy_cte(location, 'l.parent_id = h.id', include_self)
 
 
 class Location(models.Model):
     """
     Modelo para estrutura hierárquica de locais
     Ex: Fábrica > Setor > Equipamento > Componente
+    
+    A hierarquia é indexada por caminho materializado: ``path`` guarda os IDs
+    da raiz até o próprio local (ex: ``/1/5/12/``) e ``depth`` o nível. Ambos
+    são mantidos em ``save()`` e permitem buscar ancestrais e descendentes
+    com uma única consulta indexada.
     """
     LOCATION_TYPES = [
         ('plant', 'Planta/Fábrica'),
@@ -22,8 +71,17 @@ class Location(models.Model):
                               related_name='children', verbose_name="Local Pai")
     description = models.TextField(blank=True, verbose_name="Descrição")
     is_active = models.BooleanField(default=True, verbose_name="Ativo")
+    # Local cuja desativação desativou este (ele mesmo, se desativado diretamente)
+    deactivated_with = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                         related_name='+', editable=False,
+                                         verbose_name="Desativado Junto Com")
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False,
+                            verbose_name="Caminho Materializado")
+    depth = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nível")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    objects = LocationQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Local"
@@ -33,39 +91,154 @@ class Location(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda o pai carregado para detectar re-parenting em save()
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.__dict__.pop('_full_path', None)
+        parent_changed = (
+            self._state.adding
+            or not self.path
+            or self.parent_id != getattr(self, '_loaded_parent_id', None)
+        )
+        if not parent_changed:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                parent_path, parent_depth = self._parent_path()
+                super().save(*args, **kwargs)
+                self._move_subtree(parent_path, parent_depth)
+        bump_hierarchy_version()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_hierarchy_version()
+        return result
+    
+    def _parent_path(self):
+        """Retorna (path, depth) do pai, validando referência circular"""
+        if not self.parent_id:
+            return PATH_SEPARATOR, -1
+    
+        parent_path, parent_depth = Location.objects.filter(
+            pk=self.parent_id
+        ).values_list('path', 'depth').get()
+    
+        if self.pk and (self.parent_id == self.pk or
+                        f"{PATH_SEPARATOR}{self.pk}{PATH_SEPARATOR}" in parent_path):
+            raise ValueError("Não é possível criar referência circular.")
+        return parent_path, parent_depth
+    
+    def _move_subtree(self, parent_path, parent_depth):
+        """Grava path/depth do local e reescreve o prefixo dos descendentes"""
+        old_path, old_depth = self.path, self.depth
+        new_path = f"{parent_path}{self.pk}{PATH_SEPARATOR}"
+        new_depth = parent_depth + 1
+    
+        Location.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+    
+        if old_path and old_path != new_path:
+            Location.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+    
+        self.path, self.depth = new_path, new_depth
+        self._loaded_parent_id = self.parent_id
+    
+    @property
+    def path_ids(self):
+        """IDs da raiz até o próprio local, extraídos do caminho materializado"""
+        return [int(pk) for pk in self.path.strip(PATH_SEPARATOR).split(PATH_SEPARATOR) if pk]
+    
+    @property
+    def ancestor_ids(self):
+        """IDs dos ancestrais, da raiz até o pai"""
+        return self.path_ids[:-1]
+    
     @property
     def full_path(self):
         """Retorna o caminho completo do local"""
-        path = [self.name]
-        parent = self.parent
-        while parent:
-            path.insert(0, parent.name)
-            parent = parent.parent
-        return " > ".join(path)
+        if not hasattr(self, '_full_path'):
+            prefetch_full_paths([self])
+        return self._full_path
     
     @property
     def level(self):
         """Retorna o nível hierárquico do local"""
-        level = 0
-        parent = self.parent
-        while parent:
-            level += 1
-            parent = parent.parent
-        return level
+        return self.depth
     
     def get_descendants(self):
         """Retorna todos os descendentes do local"""
-        descendants = []
-        for child in self.children.all():
-            descendants.append(child)
-            descendants.extend(child.get_descendants())
-        return descendants
+        return Location.objects.filter(
+            path__startswith=self.path
+        ).exclude(pk=self.pk).order_by('path')
+    
+    def set_subtree_active(self, is_active):
+        """
+        Ativa ou desativa o local e a subárvore com um único UPDATE
+        (atômico por si só). Retorna o número de locais alterados.
+        
+        A desativação marca os locais que ela desativou; a reativação volta
+        só esses, e descendentes já desativados antes continuam inativos.
+        """
+        subtree = Location.objects.filter(path__startswith=self.path)
+        if is_active:
+            cascade_id = Location.objects.filter(pk=self.pk).order_by().values_list(
+                'deactivated_with', flat=True
+            ).first() or self.pk
+            affected = subtree.filter(
+                models.Q(pk=self.pk) | models.Q(deactivated_with=cascade_id), is_active=False
+            ).update(is_active=True, deactivated_with=None, updated_at=timezone.now())
+        else:
+            affected = subtree.filter(is_active=True).update(
+                is_active=False, deactivated_with=self.pk, updated_at=timezone.now()
+            )
+        self.is_active = is_active
+        bump_hierarchy_version()
+        return affected
     
     def get_ancestors(self):
-        """Retorna todos os ancestrais do local"""
-        ancestors = []
-        parent = self.parent
-        while parent:
-            ancestors.append(parent)
-            parent = parent.parent
-        return ancestors
+        """Retorna todos os ancestrais do local (do pai até a raiz)"""
+        return Location.objects.filter(pk__in=self.ancestor_ids).order_by('-depth')
+
+
+class HierarchyVersion(models.Model):
+    """
+    Versão da hierarquia de locais, em uma única linha
+
+    Fica no banco, compartilhada entre os processos; o cache de cada
+    processo guarda só os dados montados para cada versão.
+    """
+    version = models.BigIntegerField(default=0, verbose_name="Versão")
+    
+    class Meta:
+        verbose_name = "Versão da Hierarquia"
+        verbose_name_plural = "Versão da Hierarquia"
+        
+    def __str__(self):
+        return str(self.version)
+
+
+def prefetch_full_paths(locations):
+    """
+    Preenche o ``full_path`` de vários locais com uma única consulta
+    pelos nomes de todos os ancestrais envolvidos.
+    """
+    locations = [location for location in locations if not hasattr(location, '_full_path')]
+    ancestor_ids = {pk for location in locations for pk in location.ancestor_ids}
+    
+    names = {}
+    if ancestor_ids:
+        names = dict(
+            Location.objects.filter(pk__in=ancestor_ids).order_by().values_list('pk', 'name')
+        )
+    
+    for location in locations:
+        path = [names[pk] for pk in location.ancestor_ids if pk in names]
+        path.append(location.name)
+        location._full_path = " > ".join(path)
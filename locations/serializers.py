@@ -1,8 +1,20 @@
 from rest_framework import serializers
-from .models import Location
+from maintenance_api.fieldsets import SparseFieldsMixin
+from .models import Location, prefetch_full_paths
 
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationPathListSerializer(serializers.ListSerializer):
+    """
+    Carrega o ``full_path`` de todos os itens com uma única consulta
+    """
+    def to_representation(self, data):
+        locations = list(data.all() if hasattr(data, 'all') else data)
+        if 'full_path' in self.child.fields:
+            prefetch_full_paths(locations)
+        return super().to_representation(locations)
+
+
+class LocationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer para locais
     """
@@ -19,31 +31,31 @@ class LocationSerializer(serializers.ModelSerializer):
             'parent', 'parent_name', 'description', 'full_path', 'level',
             'children_count', 'is_active', 'created_at', 'updated_at'
         ]
+        list_serializer_class = LocationPathListSerializer
+        # Campos que leem outras linhas e a consulta que cada um precisa
+        # (o full_path é carregado pelo LocationPathListSerializer)
+        expandable_fields = {
+            'parent_name': lambda queryset: queryset.select_related('parent'),
+            'full_path': lambda queryset: queryset,
+            'children_count': lambda queryset: queryset.with_children_count(),
+        }
+    
+    def validate_parent(self, value):
+        # Evita referência circular ao mover um local para dentro da própria subárvore
+        if value and self.instance and self.instance.pk in value.path_ids:
+            raise serializers.ValidationError(
+                "Não é possível criar referência circular."
+            )
+        return value
     
     def get_children_count(self, obj):
+        # Usa a anotação de LocationQuerySet.with_children_count() quando presente
+        if hasattr(obj, 'children_count'):
+            return obj.children_count
         return obj.children.filter(is_active=True).count()
 
 
-class LocationTreeSerializer(serializers.ModelSerializer):
-    """
-    Serializer para árvore de locais (com filhos)
-    """
-    children = serializers.SerializerMethodField()
-    location_type_display = serializers.CharField(source='get_location_type_display', read_only=True)
-    
-    class Meta:
-        model = Location
-        fields = [
-            'id', 'name', 'code', 'location_type', 'location_type_display',
-            'description', 'is_active', 'children'
-        ]
-    
-    def get_children(self, obj):
-        children = obj.children.filter(is_active=True).order_by('name')
-        return LocationTreeSerializer(children, many=True).data
-
-
-class LocationListSerializer(serializers.ModelSerializer):
+class LocationListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer simplificado para listagem
     """
@@ -56,6 +68,10 @@ class LocationListSerializer(serializers.ModelSerializer):
             'id', 'name', 'code', 'location_type', 'location_type_display',
             'full_path', 'is_active'
         ]
+        list_serializer_class = LocationPathListSerializer
+        expandable_fields = {
+            'full_path': lambda queryset: queryset,
+        }
 
 
 class LocationCreateSerializer(serializers.ModelSerializer):
@@ -1,3 +1,432 @@
+import io
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from .importer import import_locations
+from . import labels
+from .models import Location
+from .tree import build_location_tree
+
+
+class LocationHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=self.plant
+        )
+        self.line = Location.objects.create(
+            name='Linha 1', code='LN01', location_type='line', parent=self.sector
+        )
+        self.equipment = Location.objects.create(
+            name='Prensa', code='EQ01', location_type='equipment', parent=self.line
+        )
+
+    def test_path_and_depth_on_create(self):
+        """Testa caminho materializado de novos locais"""
+        self.assertEqual(self.plant.path, f'/{self.plant.pk}/')
+        self.assertEqual(self.equipment.depth, 3)
+        self.assertEqual(
+            self.equipment.path_ids,
+            [self.plant.pk, self.sector.pk, self.line.pk, self.equipment.pk]
+        )
+
+    def test_ancestors_and_descendants(self):
+        """Testa ancestrais e descendentes com uma consulta cada"""
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(self.equipment.get_ancestors()),
+                [self.line, self.sector, self.plant]
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                set(self.sector.get_descendants()),
+                {self.line, self.equipment}
+            )
+
+    def test_cte_ancestors_and_descendants(self):
+        """Testa ancestrais e descendentes via CTE recursiva"""
+        with self.assertNumQueries(1):
+            ancestors = list(Location.objects.ancestors_of(self.equipment).order_by('depth'))
+        self.assertEqual(ancestors, [self.plant, self.sector, self.line])
+
+        descendants = Location.objects.descendants_of(self.sector.pk, include_self=True).order_by('pk')
+        self.assertEqual(set(descendants), {self.sector, self.line, self.equipment})
+
+    def test_full_path(self):
+        """Testa caminho completo por nome"""
+        location = Location.objects.get(pk=self.equipment.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(location.full_path, 'Planta > Setor A > Linha 1 > Prensa')
+
+    def test_reparent_moves_subtree(self):
+        """Testa re-parenting atualizando toda a subárvore"""
+        other = Location.objects.create(name='Planta 2', code='PL02', location_type='plant')
+        line = Location.objects.get(pk=self.line.pk)
+        line.parent = other
+        line.save()
+
+        equipment = Location.objects.get(pk=self.equipment.pk)
+        self.assertEqual(equipment.path_ids, [other.pk, self.line.pk, self.equipment.pk])
+        self.assertEqual(equipment.depth, 2)
+        self.assertEqual(equipment.full_path, 'Planta 2 > Linha 1 > Prensa')
+
+    def test_set_subtree_active(self):
+        """Testa desativação e reativação da subárvore em um UPDATE"""
+        # Um UPDATE da subárvore e outro da versão da hierarquia
+        with self.assertNumQueries(2):
+            affected = self.sector.set_subtree_active(False)
+        self.assertEqual(affected, 3)
+        self.assertFalse(Location.objects.filter(path__startswith=self.sector.path, is_active=True).exists())
+        self.assertTrue(Location.objects.get(pk=self.plant.pk).is_active)
+
+        self.assertEqual(self.sector.set_subtree_active(True), 3)
+        self.assertEqual(Location.objects.filter(is_active=True).count(), 4)
+
+    def test_reparent_under_descendant_fails(self):
+        """Testa bloqueio de referência circular"""
+        sector = Location.objects.get(pk=self.sector.pk)
+        sector.parent = self.equipment
+        with self.assertRaises(ValueError):
+            sector.save()
+
+
+class LocationActivationApiTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=self.plant
+        )
+        self.line = Location.objects.create(
+            name='Linha 1', code='LN01', location_type='line', parent=self.sector
+        )
+        Location.objects.create(name='Prensa', code='EQ01', location_type='equipment', parent=self.line)
+
+    def active_codes(self):
+        return set(Location.objects.filter(is_active=True).order_by().values_list('code', flat=True))
+
+    def test_delete_deactivates_subtree(self):
+        """Testa DELETE (204) com soft delete da subárvore e contagem no cabeçalho"""
+        response = self.client.delete(f'/api/locations/{self.sector.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response['Affected-Count'], '3')
+        self.assertEqual(self.active_codes(), {'PL01'})
+
+        response = self.client.get(f'/api/locations/{self.sector.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reactivate_subtree(self):
+        """Testa reativação do local e de todos os descendentes"""
+        self.client.delete(f'/api/locations/{self.sector.pk}/')
+
+        response = self.client.post(f'/api/locations/{self.sector.pk}/reactivate/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['affected_count'], 3)
+        self.assertEqual(self.active_codes(), {'PL01', 'SA01', 'LN01', 'EQ01'})
+
+    def test_reactivate_keeps_earlier_deactivations(self):
+        """Testa reativação só dos locais desativados junto com o local"""
+        self.client.delete(f'/api/locations/{self.line.pk}/')
+        self.client.delete(f'/api/locations/{self.sector.pk}/')
+
+        response = self.client.post(f'/api/locations/{self.sector.pk}/reactivate/')
+        self.assertEqual(response.data['affected_count'], 1)
+        self.assertEqual(self.active_codes(), {'PL01', 'SA01'})
+
+        response = self.client.post(f'/api/locations/{self.line.pk}/reactivate/')
+        self.assertEqual(response.data['affected_count'], 2)
+        self.assertEqual(self.active_codes(), {'PL01', 'SA01', 'LN01', 'EQ01'})
+
+    def test_reactivate_with_inactive_parent(self):
+        """Testa bloqueio da reativação com o pai inativo"""
+        self.client.delete(f'/api/locations/{self.sector.pk}/')
+
+        response = self.client.post(f'/api/locations/{self.line.pk}/reactivate/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
+        self.assertEqual(self.active_codes(), {'PL01'})
+
+
+class LocationTreeBuilderTestCase(TestCase):
+    def setUp(self):
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector_b = Location.objects.create(
+            name='Setor B', code='SB01', location_type='sector', parent=self.plant
+        )
+        self.sector_a = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=self.plant
+        )
+        self.line = Location.objects.create(
+            name='Linha 1', code='LN01', location_type='line', parent=self.sector_a
+        )
+        Location.objects.create(
+            name='Inativo', code='IN01', location_type='line', parent=self.sector_b, is_active=False
+        )
+
+    def test_full_tree_single_query(self):
+        """Testa montagem da árvore completa com uma consulta"""
+        with self.assertNumQueries(1):
+            tree = build_location_tree()
+        self.assertEqual(len(tree), 1)
+        sectors = tree[0]['children']
+        self.assertEqual([node['name'] for node in sectors], ['Setor A', 'Setor B'])
+        self.assertEqual(sectors[0]['children'][0]['code'], 'LN01')
+        self.assertEqual(sectors[1]['children'], [])
+
+    def test_subtree_with_max_depth(self):
+        """Testa subárvore limitada por profundidade"""
+        tree = build_location_tree(root=self.plant, max_depth=1)
+        self.assertEqual(len(tree[0]['children']), 2)
+        self.assertEqual(tree[0]['children'][0]['children'], [])
+
+        tree = build_location_tree(root=self.sector_a)
+        self.assertEqual(tree[0]['id'], self.sector_a.pk)
+        self.assertEqual(tree[0]['children'][0]['id'], self.line.pk)
+
+
+class LocationTreeCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        Location.objects.create(name='Planta', code='PL01', location_type='plant')
+
+    def test_conditional_get(self):
+        """Testa ETag e 304 na árvore de locais"""
+        response = self.client.get('/api/locations/tree/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Só a leitura da versão compartilhada
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/locations/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_version_shared_between_processes(self):
+        """Testa versão no banco: cache local vazio (outro processo) mantém o ETag"""
+        etag = self.client.get('/api/locations/tree/')['ETag']
+        cache.clear()
+        response = self.client.get('/api/locations/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Escrita vista por todos os processos, sem depender do cache
+        Location.objects.get(code='PL01').save()
+        response = self.client.get('/api/locations/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_write_invalidates_tree(self):
+        """Testa invalidação do cache após alterar a hierarquia"""
+        etag = self.client.get('/api/locations/tree/')['ETag']
+        Location.objects.create(name='Planta 2', code='PL02', location_type='plant')
+
+        response = self.client.get('/api/locations/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['tree']), 2)
+
+
+class LocationImportTestCase(TestCase):
+    def setUp(self):
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+
+    def rows(self, *rows):
+        return [
+            (line, dict(zip(('code', 'name', 'location_type', 'parent_code'), row)))
+            for line, row in enumerate(rows, start=2)
+        ]
+
+    def test_import_in_topological_order(self):
+        """Testa importação com filhos antes dos pais no arquivo"""
+        result = import_locations(self.rows(
+            ('EQ01', 'Prensa', 'equipment', 'LN01'),
+            ('LN01', 'Linha 1', 'line', 'SA01'),
+            ('SA01', 'Setor A', 'sector', 'PL01'),
+        ))
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['errors'], [])
+
+        equipment = Location.objects.get(code='EQ01')
+        self.assertEqual(equipment.depth, 3)
+        self.assertEqual(equipment.full_path, 'Planta > Setor A > Linha 1 > Prensa')
+        self.assertIn(equipment, self.plant.get_descendants())
+
+    def test_import_reports_errors_per_row(self):
+        """Testa validação das regras de hierarquia no lote"""
+        result = import_locations(self.rows(
+            ('CP01', 'Motor', 'component', 'PL01'),
+            ('EQ01', 'Prensa', 'equipment', 'CP01'),
+            ('A1', 'Ciclo A', 'area', 'A2'),
+            ('A2', 'Ciclo B', 'area', 'A1'),
+            ('PL01', 'Duplicado', 'plant', ''),
+            ('XX01', 'Sem pai', 'area', 'NOPE'),
+        ))
+        self.assertEqual(result['created'], 1)
+        errors = {error['code']: error['error'] for error in result['errors']}
+        self.assertEqual(set(errors), {'EQ01', 'A1', 'A2', 'PL01', 'XX01'})
+        self.assertIn('circular', errors['A1'])
+        self.assertIn('Componentes', errors['EQ01'])
+
+    def test_import_rejects_paths_too_long(self):
+        """Testa limite do caminho materializado em hierarquia profunda"""
+        rows = [('AR00', 'Área 0', 'area', 'PL01')] + [
+            (f'AR{index:02d}', f'Área {index}', 'area', f'AR{index - 1:02d}')
+            for index in range(1, 100)
+        ]
+        result = import_locations(self.rows(*rows))
+
+        self.assertGreater(result['created'], 0)
+        self.assertEqual(result['created'] + len(result['errors']), 100)
+        self.assertIn('Caminho materializado', result['errors'][0]['error'])
+        self.assertTrue(all('pai com erro' in error['error'] for error in result['errors'][1:]))
+        longest = max(len(path) for path in Location.objects.order_by().values_list('path', flat=True))
+        self.assertLessEqual(longest, 255)
+
+    def test_import_rejects_values_too_long(self):
+        """Testa limites de tamanho de code e name antes de gravar"""
+        result = import_locations(self.rows(
+            ('C' * 51, 'Código longo', 'area', 'PL01'),
+            ('AR01', 'N' * 201, 'area', 'PL01'),
+            ('AR02', 'Área 2', 'area', 'PL01'),
+        ))
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['line'] for error in result['errors']], [2, 3])
+        self.assertIn('code deve ter no máximo 50', result['errors'][0]['error'])
+        self.assertIn('name deve ter no máximo 200', result['errors'][1]['error'])
+
+
+class LocationQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='SA01', location_type='sector', parent=self.plant
+        )
+        for index in range(10):
+            Location.objects.create(
+                name=f'Equipamento {index}', code=f'EQ{index:02d}',
+                location_type='equipment', parent=self.sector
+            )
+
+    def test_list_constant_queries(self):
+        """Testa listagem com número constante de consultas"""
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/locations/')
+        self.assertEqual(response.data['count'], 12)
+
+    def test_detail_uses_annotations(self):
+        """Testa detalhe com children_count anotado e pai via select_related"""
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/locations/{self.sector.pk}/')
+        self.assertEqual(response.data['children_count'], 10)
+        self.assertEqual(response.data['parent_name'], 'Planta')
+        self.assertEqual(response.data['full_path'], 'Planta > Setor A')
+
+    def test_sparse_fields(self):
+        """Testa ?fields= e ?expand= sem o caminho e a contagem de filhos"""
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/locations/', {'fields': 'name,code'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'code'})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/locations/{self.sector.pk}/', {'expand': 'parent_name'})
+        self.assertEqual(response.data['parent_name'], 'Planta')
+        self.assertNotIn('children_count', response.data)
+        self.assertNotIn('full_path', response.data)
+
+
+class LocationLabelsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            employee_id='TEST001',
+            shift='morning'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.plant = Location.objects.create(name='Planta', code='PL01', location_type='plant')
+        self.sector = Location.objects.create(
+            name='Setor A', code='../SA01', location_type='sector', parent=self.plant
+        )
+        Location.objects.create(
+            name='Linha 1', code='LN01', location_type='line', parent=self.sector
+        )
+        Location.objects.create(name='Planta 2', code='PL02', location_type='plant')
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(labels, 'LABEL_CACHE_DIR', cache_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, location, **params):
+        response = self.client.get(f'/api/locations/{location.pk}/labels/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def test_zip_with_subtree(self):
+        """Testa ZIP com um PNG por local da subárvore e nomes saneados"""
+        response, content = self.download(self.plant)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('etiquetas_PL01.zip', response['Content-Disposition'])
+
+        names = zipfile.ZipFile(io.BytesIO(content)).namelist()
+        self.assertEqual(sorted(names), ['LN01.png', 'PL01.png', 'SA01.png'])
+
+        response, _ = self.download(self.sector)
+        self.assertIn('etiquetas_SA01.zip', response['Content-Disposition'])
+
+    def test_pdf_output(self):
+        """Testa PDF com as etiquetas em folhas"""
+        with mock.patch.object(labels, 'SHEET_GRID', (1, 1)), \
+                mock.patch.object(labels, 'SHEET_PAGES_PER_WRITE', 2):
+            response, content = self.download(self.plant, output='pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        # Três folhas gravadas em dois blocos
+        self.assertIn(b'/Count 3', content)
+
+    def test_reuses_cached_labels(self):
+        """Testa que a segunda requisição não renderiza de novo"""
+        self.download(self.plant)
+        with mock.patch.object(labels, 'render_label', wraps=labels.render_label) as render:
+            self.download(self.plant)
+        render.assert_not_called()
+
+    def test_errors(self):
+        """Testa local inexistente, formato inválido e subárvore grande demais"""
+        response = self.client.get('/api/locations/999999/labels/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(f'/api/locations/{self.plant.pk}/labels/', {'output': 'tar'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-# Create your tests here.
+        with mock.patch('locations.views.LABEL_REQUEST_LIMIT', 2):
+            response = self.client.get(f'/api/locations/{self.plant.pk}/labels/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('generate_location_labels', response.data['error'])
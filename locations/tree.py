@@ -0,0 +1,78 @@
+"""
+Montagem da árvore de locais em memória
+
+Todos os locais ativos (ou apenas uma subárvore) são carregados com uma única
+consulta sobre o caminho materializado e encadeados em nós compactos, sem
+consultas por nó.
+"""
+from .models import Location
+
+
+LOCATION_TYPE_DISPLAY = dict(Location.LOCATION_TYPES)
+
+TREE_FIELDS = ('id', 'name', 'code', 'location_type', 'description', 'is_active', 'parent_id')
+
+
+class TreeNode:
+    """
+    Nó compacto da árvore de locais
+    """
+    __slots__ = TREE_FIELDS + ('children',)
+
+    def __init__(self, id, name, code, location_type, description, is_active, parent_id):
+        self.id = id
+        self.name = name
+        self.code = code
+        self.location_type = location_type
+        self.description = description
+        self.is_active = is_active
+        self.parent_id = parent_id
+        self.children = []
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'code': self.code,
+            'location_type': self.location_type,
+            'location_type_display': LOCATION_TYPE_DISPLAY.get(self.location_type, self.location_type),
+            'description': self.description,
+            'is_active': self.is_active,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+def build_location_tree(root=None, max_depth=None):
+    """
+    Retorna a árvore de locais ativos como lista de dicionários
+
+    ``root`` limita a árvore à subárvore de um local e ``max_depth`` ao
+    número de níveis abaixo das raízes (0 retorna apenas as raízes).
+    """
+    queryset = Location.objects.filter(is_active=True)
+    base_depth = 0
+
+    if root is not None:
+        queryset = queryset.filter(path__startswith=root.path)
+        base_depth = root.depth
+
+    if max_depth is not None:
+        queryset = queryset.filter(depth__lte=base_depth + max_depth)
+
+    rows = queryset.order_by('depth', 'name').values_list(*TREE_FIELDS)
+
+    nodes = {}
+    roots = []
+    for row in rows:
+        node = TreeNode(*row)
+        is_root = node.id == root.id if root is not None else node.parent_id is None
+        if is_root:
+            roots.append(node)
+        elif node.parent_id in nodes:
+            nodes[node.parent_id].children.append(node)
+        else:
+            # Pai inativo: a subárvore fica oculta
+            continue
+        nodes[node.id] = node
+
+    return [node.to_dict() for node in roots]
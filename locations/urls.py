@@ -10,6 +10,9 @@ urlpatterns = [
     path('tree/', views.location_tree, name='location-tree'),
     path('<int:location_id>/children/', views.location_children, name='location-children'),
     path('<int:location_id>/path/', views.location_path, name='location-path'),
+    path('<int:location_id>/reactivate/', views.reactivate_location, name='location-reactivate'),
+    path('<int:location_id>/labels/', views.location_labels, name='location-labels'),
     path('type/<str:location_type>/', views.locations_by_type, name='locations-by-type'),
     path('search/', views.location_search, name='location-search'),
+    path('import/', views.location_import, name='location-import'),
 ]
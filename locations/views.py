@@ -1,15 +1,23 @@
+import tempfile
+
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
-from .models import Location
+from django.http import FileResponse
+from django.views.decorators.http import etag
+from maintenance_api.fieldsets import apply_field_plans, selected_fields
+from .models import Location, prefetch_full_paths
 from .serializers import (
     LocationSerializer,
-    LocationTreeSerializer,
     LocationListSerializer,
     LocationCreateSerializer
 )
+from .tree import build_location_tree
+from .caching import hierarchy_etag, get_cached_hierarchy
+from .importer import IMPORT_FORMATS, detect_format, import_locations, read_rows
+from .labels import LABEL_FORMATS, LABEL_REQUEST_LIMIT, build_labels, safe_label_name
 
 
 class LocationListCreateView(generics.ListCreateAPIView):
@@ -27,6 +35,12 @@ class LocationListCreateView(generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return LocationCreateSerializer
         return LocationListSerializer
+    
+    def get_queryset(self):
+        serializer_class = self.get_serializer_class()
+        return apply_field_plans(
+            super().get_queryset(), serializer_class, selected_fields(self.request, serializer_class)
+        )
 
 
 class LocationDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -37,33 +51,100 @@ class LocationDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = LocationSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_queryset(self):
+        # Join do pai e contagem de filhos apenas se pedidos (?fields= / ?expand=)
+        return apply_field_plans(
+            super().get_queryset(), LocationSerializer, selected_fields(self.request, LocationSerializer)
+        )
+    
     def perform_destroy(self, instance):
-        # Soft delete
-        instance.is_active = False
-        instance.save()
-        
-        # Desativa também todos os filhos
-        descendants = instance.get_descendants()
-        for descendant in descendants:
-            descendant.is_active = False
-            descendant.save()
+        # Soft delete do local e de todos os descendentes em um único UPDATE
+        self.affected_count = instance.set_subtree_active(False)
+    
+    def destroy(self, request, *args, **kwargs):
+        # Mantém o 204 sem corpo; a quantidade desativada vai no cabeçalho
+        response = super().destroy(request, *args, **kwargs)
+        response['Affected-Count'] = str(self.affected_count)
+        return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def reactivate_location(request, location_id):
+    """
+    Reativa um local e todos os seus descendentes
+    """
+    try:
+        location = Location.objects.get(id=location_id)
+    except Location.DoesNotExist:
+        return Response(
+            {'error': 'Local não encontrado.'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    if location.parent_id and not location.parent.is_active:
+        return Response(
+            {'error': 'Não é possível reativar um local com o local pai inativo.'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    affected = location.set_subtree_active(True)
+    
+    return Response({
+        'success': True,
+        'message': 'Local reativado com sucesso.',
+        'affected_count': affected
+    })
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag(hierarchy_etag)
 def location_tree(request):
     """
     Retorna a árvore completa de locais
+    
+    Parâmetros opcionais:
+    - root: ID do local raiz da subárvore
+    - max_depth: número de níveis abaixo da raiz
+    
+    A resposta fica em cache até a próxima alteração da hierarquia e
+    responde 304 a requisições condicionais (If-None-Match).
     """
-    # Pega apenas os locais raiz (sem parent)
-    root_locations = Location.objects.filter(
-        parent__isnull=True, 
-        is_active=True
-    ).order_by('name')
+    root_id = request.GET.get('root')
+    max_depth = request.GET.get('max_depth')
     
-    serializer = LocationTreeSerializer(root_locations, many=True)
+    try:
+        root_id = int(root_id) if root_id else None
+        max_depth = int(max_depth) if max_depth else None
+    except ValueError:
+        return Response(
+            {'error': 'root e max_depth devem ser números inteiros.'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if max_depth is not None and max_depth < 0:
+        return Response(
+            {'error': 'max_depth não pode ser negativo.'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    root = None
+    if root_id is not None:
+        try:
+            root = Location.objects.only('id', 'path', 'depth').get(id=root_id, is_active=True)
+        except Location.DoesNotExist:
+            return Response(
+                {'error': 'Local não encontrado.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    tree = get_cached_hierarchy(
+        f'tree:{root_id}:{max_depth}',
+        lambda: build_location_tree(root=root, max_depth=max_depth)
+    )
     return Response({
-        'tree': serializer.data
+        'tree': tree
     })
 
 
@@ -74,20 +155,23 @@ def location_children(request, location_id):
     Retorna os filhos de um local específico
     """
     try:
-        location = Location.objects.get(id=location_id, is_active=True)
+        location = Location.objects.select_related('parent').with_children_count().get(
+            id=location_id, is_active=True
+        )
     except Location.DoesNotExist:
         return Response(
             {'error': 'Local não encontrado.'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    children = location.children.filter(is_active=True).order_by('name')
+    children = list(location.children.filter(is_active=True).order_by('name'))
+    prefetch_full_paths([location, *children])
     serializer = LocationListSerializer(children, many=True)
     
     return Response({
         'parent': LocationSerializer(location).data,
         'children': serializer.data,
-        'count': children.count()
+        'count': len(serializer.data)
     })
 
 
@@ -97,19 +181,28 @@ def location_path(request, location_id):
     """
     Retorna o caminho completo até um local
     """
-    try:
-        location = Location.objects.get(id=location_id, is_active=True)
-    except Location.DoesNotExist:
+    # Monta o caminho completo (da raiz para o atual) em uma única consulta
+    path = list(
+        Location.objects.ancestors_of(location_id, include_self=True)
+        .with_children_count()
+        .order_by('depth')
+    )
+    
+    if not path or path[-1].pk != location_id or not path[-1].is_active:
         return Response(
             {'error': 'Local não encontrado.'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Monta o caminho completo
-    path = [location]
-    path.extend(location.get_ancestors())
-    path.reverse()  # Do raiz para o atual
+    # O caminho de cada nível é prefixo do breadcrumb e o pai é o nível anterior
+    names = []
+    for index, ancestor in enumerate(path):
+        names.append(ancestor.name)
+        ancestor._full_path = " > ".join(names)
+        if index:
+            ancestor.parent = path[index - 1]
     
+    location = path[-1]
     serializer = LocationListSerializer(path, many=True)
     return Response({
         'path': serializer.data,
@@ -119,6 +212,7 @@ def location_path(request, location_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag(hierarchy_etag)
 def locations_by_type(request, location_type):
     """
     Lista locais por tipo
@@ -131,16 +225,18 @@ def locations_by_type(request, location_type):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    locations = Location.objects.filter(
-        location_type=location_type, 
-        is_active=True
-    ).order_by('name')
+    def build():
+        locations = Location.objects.filter(
+            location_type=location_type, 
+            is_active=True
+        ).order_by('name')
+        return list(LocationListSerializer(locations, many=True).data)
     
-    serializer = LocationListSerializer(locations, many=True)
+    locations = get_cached_hierarchy(f'type:{location_type}', build)
     return Response({
         'type': location_type,
-        'count': locations.count(),
-        'locations': serializer.data
+        'count': len(locations),
+        'locations': locations
     })
 
 
@@ -153,6 +249,7 @@ def location_search(request):
     query = request.GET.get('q', '')
     location_type = request.GET.get('type', '')
     parent_id = request.GET.get('parent', '')
+    subtree_id = request.GET.get('subtree', '')
     
     locations = Location.objects.filter(is_active=True)
     
@@ -169,9 +266,98 @@ def location_search(request):
     if parent_id:
         locations = locations.filter(parent_id=parent_id)
     
+    if subtree_id.isdigit():
+        locations = locations.descendants_of(int(subtree_id), include_self=True)
+    
+    # Ordenação explícita: a ordenação padrão por 'parent' entra em loop no self-FK
+    locations = locations.order_by('name')
     serializer = LocationListSerializer(locations[:50], many=True)  # Limita a 50 resultados
     return Response({
         'query': query,
         'count': locations.count(),
         'locations': serializer.data
     })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def location_import(request):
+    """
+    Importação em massa de locais a partir de um arquivo CSV ou NDJSON
+    
+    Campos: file (obrigatório), format (csv/ndjson) e dry_run (apenas valida)
+    """
+    user = request.user
+    if not (user.is_supervisor or user.is_staff):
+        return Response(
+            {'error': 'Apenas supervisores podem importar locais.'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response(
+            {'error': 'Envie o arquivo no campo "file".'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    file_format = request.data.get('format') or detect_format(upload.name)
+    if file_format not in IMPORT_FORMATS:
+        return Response(
+            {'error': f'Formato inválido. Formatos válidos: {list(IMPORT_FORMATS)}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+    result = import_locations(read_rows(upload, file_format), dry_run=dry_run)
+    
+    return Response({
+        'success': not result['errors'],
+        'dry_run': dry_run,
+        **result
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def location_labels(request, location_id):
+    """
+    Etiquetas QR de um local e de toda a sua subárvore
+    
+    Parâmetro opcional output: zip (PNGs) ou pdf (folha para impressão).
+    O nome "format" é reservado pelo DRF para a negociação de conteúdo.
+    """
+    label_format = request.GET.get('output', 'zip')
+    if label_format not in LABEL_FORMATS:
+        return Response(
+            {'error': f'Formato inválido. Formatos válidos: {list(LABEL_FORMATS)}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        location = Location.objects.only('id', 'code', 'path').get(id=location_id, is_active=True)
+    except Location.DoesNotExist:
+        return Response(
+            {'error': 'Local não encontrado.'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    locations = list(Location.objects.filter(
+        path__startswith=location.path, is_active=True
+    ).order_by('path').values_list('code', 'name')[:LABEL_REQUEST_LIMIT + 1])
+    if len(locations) > LABEL_REQUEST_LIMIT:
+        return Response(
+            {'error': f'Subárvore com mais de {LABEL_REQUEST_LIMIT} locais. '
+                      f'Use o comando generate_location_labels {location.code}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Renderiza no próprio processo e entrega o arquivo temporário em partes
+    output = tempfile.TemporaryFile()
+    build_labels(locations, label_format, workers=1, output=output)
+    output.seek(0)
+    content_type = 'application/pdf' if label_format == 'pdf' else 'application/zip'
+    return FileResponse(
+        output, as_attachment=True, content_type=content_type,
+        filename=f'etiquetas_{safe_label_name(location.code)}.{label_format}'
+    )
@@ -0,0 +1,42 @@
+"""
+Contadores de versão para invalidação de cache
+
+Cada conjunto de dados em cache tem um contador; as chaves incluem a versão
+atual, então incrementá-lo invalida todas as entradas de uma vez sem
+precisar apagá-las (as antigas expiram pelo timeout).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _initial_version():
+    # Baseado no relógio para não repetir versões (e ETags) após limpar o cache
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """Retorna a versão atual do contador ``key``"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Incrementa a versão imediatamente e de novo após o commit, para que
+    leituras concorrentes não guardem em cache dados ainda não confirmados
+    sob a versão nova.
+    """
+    _increment_version(key)
+    transaction.on_commit(lambda: _increment_version(key))
+
+
+def _increment_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
@@ -0,0 +1,65 @@
+"""
+Seleção de campos (``?fields=``) e expansão (``?expand=``) nas respostas
+
+``?fields=id,title,status`` devolve apenas esses campos. Os campos
+expansíveis (declarados em ``Meta.expandable_fields``) são os que leem
+outras tabelas; ``?expand=photos,answers`` escolhe quais deles incluir
+(``?expand=`` vazio não inclui nenhum). Sem os parâmetros a resposta é a
+completa de sempre.
+
+Cada campo expansível informa como preparar o queryset (``select_related``,
+``prefetch_related`` ou anotação), então joins e prefetches só acontecem
+para o que foi pedido. A seleção vale apenas para leituras: gravações
+continuam validando e respondendo com todos os campos.
+"""
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+def _parse(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def selected_fields(request, serializer_class):
+    """Campos pedidos na requisição, ou ``None`` para todos"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if 'fields' not in params and 'expand' not in params:
+        return None
+
+    names = set(serializer_class.Meta.fields)
+    expandable = set(getattr(serializer_class.Meta, 'expandable_fields', {}))
+    selected = names if 'fields' not in params else _parse(params['fields']) & names
+    if 'expand' in params:
+        selected = (selected - expandable) | (_parse(params['expand']) & expandable)
+    # O id sempre acompanha, para o cliente casar as linhas
+    return selected | {'id'}
+
+
+def apply_field_plans(queryset, serializer_class, selected=None):
+    """Aplica ao queryset apenas a preparação dos campos expansíveis selecionados"""
+    for name, plan in getattr(serializer_class.Meta, 'expandable_fields', {}).items():
+        if selected is None or name in selected:
+            queryset = plan(queryset)
+    return queryset
+
+
+class SparseFieldsMixin:
+    """
+    Serializer que respeita ``?fields=`` e ``?expand=``
+
+    Só o serializer da resposta é filtrado; quando usado embutido em outro
+    (como ``location_details``), devolve todos os campos.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+        selected = selected_fields(self.context.get('request'), type(self))
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
@@ -89,6 +89,20 @@ DATABASES = {
 }
 
 
+# Cache
+# LocMemCache é por processo; com vários workers em produção use um backend
+# compartilhado (ex: Redis) para que a invalidação alcance todos eles.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'maintenance-api',
+        # Os totais por local usam uma chave por local
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 